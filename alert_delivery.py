@@ -0,0 +1,231 @@
+"""
+alert_delivery.py
+
+Asynchronous alert delivery: a bounded queue and worker pool per channel,
+retries with exponential backoff, and reused SMTP/HTTP connections.
+Enqueuing never blocks the monitoring loop; a full queue drops the alert
+and counts it.
+"""
+
+import queue
+import random
+import smtplib
+import threading
+import time
+
+import requests
+
+
+class DeliveryStats:
+    """Counters and latency summary for one channel (thread-safe)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retries = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def add(self, field: str, n: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def record_delivery(self, latency: float):
+        with self._lock:
+            self.delivered += 1
+            self.latency_total += latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            mean = self.latency_total / self.delivered if self.delivered else 0.0
+            return {
+                'enqueued': self.enqueued,
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'dropped': self.dropped,
+                'retries': self.retries,
+                'latency_mean_ms': mean * 1000.0,
+                'latency_max_ms': self.latency_max * 1000.0
+            }
+
+
+class SMTPTransport:
+    """
+    Sends email.message objects, keeping one SMTP connection open per
+    worker thread and reconnecting only when the server drops it.
+    """
+
+    def __init__(self, email_config: dict):
+        self.config = email_config
+        self._local = threading.local()
+
+    def _connect(self):
+        cfg = self.config
+        server = smtplib.SMTP(cfg['smtp_server'], cfg['smtp_port'], timeout=cfg.get('timeout', 10))
+        if cfg.get('starttls', True):
+            server.starttls()
+        if cfg.get('password'):
+            server.login(cfg['sender'], cfg['password'])
+        return server
+
+    def send(self, msg):
+        server = getattr(self._local, 'server', None)
+        if server is None:
+            server = self._local.server = self._connect()
+        try:
+            server.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Idle connection closed by the server: reconnect once
+            self.close_thread()
+            server = self._local.server = self._connect()
+            server.send_message(msg)
+        except smtplib.SMTPException:
+            # Rejected by the server (recipients, sender, data); the
+            # connection is still good and resending wouldn't help
+            raise
+        except OSError:
+            # Timeout or other socket error: the session state is unknown
+            self.close_thread()
+            raise
+
+    def close_thread(self):
+        server = getattr(self._local, 'server', None)
+        self._local.server = None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+
+
+class WebhookTransport:
+    """POSTs JSON payloads over a pooled keep-alive session."""
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def send(self, payload: dict):
+        response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close_thread(self):
+        pass
+
+
+class DeliveryChannel:
+    """
+    Bounded queue + worker threads for one transport.
+
+    Args:
+        name: Channel name used in stats ('email', 'slack', ...)
+        transport: Object with send(item) and close_thread()
+        workers: Worker threads draining the queue
+        queue_size: Items held before new alerts are dropped
+        max_retries: Attempts after the first failure
+        backoff_base: First retry delay in seconds (doubles each attempt)
+        backoff_max: Upper bound on a single retry delay
+    """
+
+    _STOP = object()
+
+    def __init__(self, name: str, transport, workers: int = 1, queue_size: int = 1000,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.name = name
+        self.transport = transport
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = DeliveryStats()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"alert-{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def enqueue(self, item) -> bool:
+        """Hand an item to the workers. Never blocks; False if dropped."""
+        try:
+            self._queue.put_nowait((time.perf_counter(), item))
+        except queue.Full:
+            self.stats.add('dropped')
+            return False
+        self.stats.add('enqueued')
+        return True
+
+    def _work(self):
+        while True:
+            entry = self._queue.get()
+            if entry is self._STOP:
+                self.transport.close_thread()
+                self._queue.task_done()
+                return
+            queued_at, item = entry
+            self._deliver(queued_at, item)
+            self._queue.task_done()
+
+    def _deliver(self, queued_at: float, item):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.transport.send(item)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.stats.add('failed')
+                    print(f"  [✗ {self.name} delivery failed after {attempt + 1} attempts: {e}]")
+                    return
+                self.stats.add('retries')
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+            else:
+                self.stats.record_delivery(time.perf_counter() - queued_at)
+                return
+
+    def join(self):
+        """Block until everything queued so far has been handled."""
+        self._queue.join()
+
+    def close(self, timeout: float = 5.0):
+        """Stop the workers once the queue drains, waiting at most timeout seconds overall."""
+        deadline = time.monotonic() + timeout
+        for _ in self._workers:
+            try:
+                self._queue.put(self._STOP, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                # Workers aren't keeping up; they are daemon threads, leave them
+                return
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+
+
+class AlertDelivery:
+    """Channel registry used by AlertManager."""
+
+    def __init__(self):
+        self.channels = {}
+
+    def add_channel(self, name: str, transport, **options) -> DeliveryChannel:
+        channel = DeliveryChannel(name, transport, **options)
+        self.channels[name] = channel
+        return channel
+
+    def submit(self, name: str, item) -> bool:
+        return self.channels[name].enqueue(item)
+
+    def stats(self) -> dict:
+        return {name: ch.stats.snapshot() for name, ch in self.channels.items()}
+
+    def join(self):
+        for channel in self.channels.values():
+            channel.join()
+
+    def close(self):
+        for channel in self.channels.values():
+            channel.close()
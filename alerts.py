@@ -4,12 +4,100 @@ alerts.py
 Send alerts via email or Slack when RED alert is triggered.
 """
 
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from collections import OrderedDict
+import threading
+import time
 import requests
 from datetime import datetime
 
+from alert_delivery import AlertDelivery, SMTPTransport, WebhookTransport
+
+
+def _fmt(value, spec: str) -> str:
+    """Format a metric for an alert body; 'N/A' when it is missing"""
+    return 'N/A' if value is None else format(value, spec)
+
+
+class AlertDeduplicator:
+    """
+    Cooldown tracking keyed by (org, agent, level).
+    
+    Keys live in an OrderedDict ordered by last fire time, so the check is
+    O(1) and expired keys are evicted from the front as time moves on.
+    Memory is bounded by the keys that fired within one cooldown window
+    (and by max_keys as a hard cap).
+    """
+    
+    def __init__(self, cooldown_seconds: float = 300, max_keys: int = 100_000):
+        self.cooldown_seconds = cooldown_seconds
+        self.max_keys = max_keys
+        self._last = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _evict(self, now: float):
+        last = self._last
+        while last:
+            key, fired = next(iter(last.items()))
+            if now - fired <= self.cooldown_seconds and len(last) <= self.max_keys:
+                break
+            last.popitem(last=False)
+    
+    def ready(self, key, cooldown_seconds: float = None, now: float = None) -> bool:
+        """True if key is outside its cooldown (does not record anything)"""
+        now = time.monotonic() if now is None else now
+        cooldown = self.cooldown_seconds if cooldown_seconds is None else cooldown_seconds
+        with self._lock:
+            fired = self._last.get(key)
+        return fired is None or now - fired > cooldown
+    
+    def allow(self, key, now: float = None) -> bool:
+        """Check and record in one step: True means send"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._evict(now)
+            fired = self._last.get(key)
+            if fired is not None and now - fired <= self.cooldown_seconds:
+                return False
+            self._last[key] = now
+            self._last.move_to_end(key)
+            return True
+    
+    def __len__(self):
+        return len(self._last)
+
+
+class DigestBatcher:
+    """
+    Coalesces alerts raised within window_seconds of the first pending one
+    into a single flush(alerts) call.
+    """
+    
+    def __init__(self, window_seconds: float, flush):
+        self.window_seconds = window_seconds
+        self._flush = flush
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+    
+    def add(self, alert: dict):
+        with self._lock:
+            self._pending.append(alert)
+            if self._timer is None:
+                self._timer = threading.Timer(self.window_seconds, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        with self._lock:
+            alerts, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if alerts:
+            self._flush(alerts)
+
 
 class AlertManager:
     """
@@ -34,51 +122,132 @@ class AlertManager:
                     'slack': {
                         'enabled': True,
                         'webhook_url': 'https://hooks.slack.com/services/...'
+                    },
+                    'delivery': {
+                        'async': True,      # False = send on caller thread
+                        'workers': 1,       # per channel
+                        'queue_size': 1000,
+                        'max_retries': 3,
+                        'backoff_base': 0.5
+                    },
+                    'cooldown_seconds': 300,    # per (org, agent, level)
+                    'digest': {
+                        'window_seconds': 30    # 0 = send every alert alone
                     }
                 }
         """
         self.config = config or {}
-        self.last_alert_time = {}
+        self.dedup = AlertDeduplicator(self.config.get('cooldown_seconds', 300))
+        self.delivery = None
+        
+        window = self.config.get('digest', {}).get('window_seconds', 0)
+        self.digest = DigestBatcher(window, self._dispatch) if window > 0 else None
         
-    def should_send_alert(self, alert_level: str, cooldown_seconds: int = 300) -> bool:
+        delivery_config = dict(self.config.get('delivery', {}))
+        if delivery_config.pop('async', True):
+            self.delivery = AlertDelivery()
+            if self.config.get('email', {}).get('enabled'):
+                self.delivery.add_channel(
+                    'email', SMTPTransport(self.config['email']), **delivery_config
+                )
+            if self.config.get('slack', {}).get('enabled'):
+                self.delivery.add_channel(
+                    'slack', WebhookTransport(self.config['slack']['webhook_url']),
+                    **delivery_config
+                )
+        
+    def should_send_alert(self, alert_level: str, cooldown_seconds: int = 300,
+                          org=None, agent=None) -> bool:
         """
-        Check if enough time has passed since last alert.
-        Prevents alert spam.
+        Check if enough time has passed since last alert for this
+        (org, agent, level). Prevents alert spam.
         """
-        if alert_level not in self.last_alert_time:
-            return True
-        
-        elapsed = (datetime.now() - self.last_alert_time[alert_level]).total_seconds()
-        return elapsed > cooldown_seconds
+        return self.dedup.ready((org, agent, alert_level), cooldown_seconds)
     
-    def send_alert(self, alert_level: str, message: str, metrics: dict = None):
+    def send_alert(self, alert_level: str, message: str, metrics: dict = None,
+                   org=None, agent=None):
         """
         Send alert through configured channels.
         """
-        if not self.should_send_alert(alert_level):
-            print(f"  [Alert cooldown active for {alert_level}]")
+        if not self.dedup.allow((org, agent, alert_level)):
+            print(f"  [Alert cooldown active for {alert_level} {org or ''}/{agent or ''}]")
             return
         
-        self.last_alert_time[alert_level] = datetime.now()
+        alert = {
+            'alert_level': alert_level,
+            'message': message,
+            'metrics': metrics or {},
+            'org': org,
+            'agent': agent,
+            'time': datetime.now()
+        }
+        
+        if self.digest:
+            self.digest.add(alert)
+        else:
+            self._dispatch([alert])
+    
+    def _dispatch(self, alerts: list):
+        """Send one message per channel: the alert itself or a digest"""
+        if len(alerts) == 1:
+            a = alerts[0]
+            build_email = lambda: self._build_email(a['alert_level'], a['message'], a['metrics'])
+            build_slack = lambda: self._build_slack_payload(a['alert_level'], a['message'], a['metrics'])
+        else:
+            build_email = lambda: self._build_digest_email(alerts)
+            build_slack = lambda: self._build_digest_slack_payload(alerts)
         
         # Email
         if self.config.get('email', {}).get('enabled'):
             try:
-                self._send_email(alert_level, message, metrics)
-                print(f"  [✓ Email alert sent]")
+                msg = build_email()
+                if self.delivery:
+                    if not self.delivery.submit('email', msg):
+                        print(f"  [✗ Email queue full, alert dropped]")
+                else:
+                    transport = SMTPTransport(self.config['email'])
+                    try:
+                        transport.send(msg)
+                    finally:
+                        transport.close_thread()
+                    print(f"  [✓ Email alert sent]")
             except Exception as e:
                 print(f"  [✗ Email failed: {e}]")
         
         # Slack
         if self.config.get('slack', {}).get('enabled'):
             try:
-                self._send_slack(alert_level, message, metrics)
-                print(f"  [✓ Slack alert sent]")
+                payload = build_slack()
+                if self.delivery:
+                    if not self.delivery.submit('slack', payload):
+                        print(f"  [✗ Slack queue full, alert dropped]")
+                else:
+                    response = requests.post(self.config['slack']['webhook_url'], json=payload)
+                    response.raise_for_status()
+                    print(f"  [✓ Slack alert sent]")
             except Exception as e:
                 print(f"  [✗ Slack failed: {e}]")
     
-    def _send_email(self, alert_level: str, message: str, metrics: dict):
-        """Send email alert"""
+    def delivery_stats(self) -> dict:
+        """Per-channel enqueue/delivery/drop counters and latency"""
+        return self.delivery.stats() if self.delivery else {}
+    
+    def flush(self):
+        """Send any pending digest, then wait for queued deliveries"""
+        if self.digest:
+            self.digest.flush()
+        if self.delivery:
+            self.delivery.join()
+    
+    def close(self):
+        """Drain queues and stop delivery workers"""
+        if self.digest:
+            self.digest.flush()
+        if self.delivery:
+            self.delivery.close()
+    
+    def _build_email(self, alert_level: str, message: str, metrics: dict) -> MIMEMultipart:
+        """Build email alert message"""
         email_config = self.config['email']
         
         msg = MIMEMultipart()
@@ -95,26 +264,20 @@ Time: {datetime.now().isoformat()}
 Message: {message}
 
 System Metrics:
-- Coherence: {metrics.get('coherence', 'N/A'):.3f}
-- Recovery Margin: {metrics.get('margin', 'N/A'):.3f}
-- CPU: {metrics.get('cpu_usage', 'N/A'):.1f}%
-- Memory: {metrics.get('mem_usage', 'N/A'):.1f}%
+- Coherence: {_fmt(metrics.get('coherence'), '.3f')}
+- Recovery Margin: {_fmt(metrics.get('margin'), '.3f')}
+- CPU: {_fmt(metrics.get('cpu_usage'), '.1f')}%
+- Memory: {_fmt(metrics.get('mem_usage'), '.1f')}%
 
 ---
 Recovery Watchdog v0.1.0
 """
         
         msg.attach(MIMEText(body, 'plain'))
-        
-        with smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port']) as server:
-            server.starttls()
-            server.login(email_config['sender'], email_config['password'])
-            server.send_message(msg)
+        return msg
     
-    def _send_slack(self, alert_level: str, message: str, metrics: dict):
-        """Send Slack alert"""
-        slack_config = self.config['slack']
-        
+    def _build_slack_payload(self, alert_level: str, message: str, metrics: dict) -> dict:
+        """Build Slack webhook payload"""
         color = {
             'GREEN': 'good',
             'YELLOW': 'warning',
@@ -129,22 +292,22 @@ Recovery Watchdog v0.1.0
                 "fields": [
                     {
                         "title": "Coherence",
-                        "value": f"{metrics.get('coherence', 0):.3f}",
+                        "value": _fmt(metrics.get('coherence'), '.3f'),
                         "short": True
                     },
                     {
                         "title": "Recovery Margin",
-                        "value": f"{metrics.get('margin', 0):.3f}",
+                        "value": _fmt(metrics.get('margin'), '.3f'),
                         "short": True
                     },
                     {
                         "title": "CPU Usage",
-                        "value": f"{metrics.get('cpu_usage', 0):.1f}%",
+                        "value": f"{_fmt(metrics.get('cpu_usage'), '.1f')}%",
                         "short": True
                     },
                     {
                         "title": "Memory Usage",
-                        "value": f"{metrics.get('mem_usage', 0):.1f}%",
+                        "value": f"{_fmt(metrics.get('mem_usage'), '.1f')}%",
                         "short": True
                     }
                 ],
@@ -152,9 +315,60 @@ Recovery Watchdog v0.1.0
                 "ts": int(datetime.now().timestamp())
             }]
         }
+        return payload
+    
+    def _digest_lines(self, alerts: list) -> list:
+        lines = []
+        for a in alerts:
+            source = '/'.join(str(x) for x in (a['org'], a['agent']) if x is not None) or 'local'
+            coherence = a['metrics'].get('coherence')
+            c_str = f" C={coherence:.3f}" if coherence is not None else ''
+            lines.append(
+                f"[{a['alert_level']}] {source}{c_str} "
+                f"{a['time'].strftime('%H:%M:%S')} - {a['message']}"
+            )
+        return lines
+    
+    def _digest_counts(self, alerts: list) -> str:
+        counts = {}
+        for a in alerts:
+            counts[a['alert_level']] = counts.get(a['alert_level'], 0) + 1
+        return ', '.join(f"{n} {level}" for level, n in sorted(counts.items()))
+    
+    def _build_digest_email(self, alerts: list) -> MIMEMultipart:
+        """Build one email summarizing several alerts"""
+        email_config = self.config['email']
+        worst = 'RED' if any(a['alert_level'] == 'RED' for a in alerts) else alerts[0]['alert_level']
+        
+        msg = MIMEMultipart()
+        msg['From'] = email_config['sender']
+        msg['To'] = ', '.join(email_config['recipients'])
+        msg['Subject'] = f"[{worst}] Recovery Watchdog: {len(alerts)} alerts ({self._digest_counts(alerts)})"
         
-        response = requests.post(slack_config['webhook_url'], json=payload)
-        response.raise_for_status()
+        body = "Recovery Watchdog Alert Digest\n\n" + "\n".join(self._digest_lines(alerts))
+        body += "\n\n---\nRecovery Watchdog v0.1.0\n"
+        
+        msg.attach(MIMEText(body, 'plain'))
+        return msg
+    
+    def _build_digest_slack_payload(self, alerts: list) -> dict:
+        """Build one Slack message summarizing several alerts"""
+        worst = 'RED' if any(a['alert_level'] == 'RED' for a in alerts) else alerts[0]['alert_level']
+        color = {
+            'GREEN': 'good',
+            'YELLOW': 'warning',
+            'RED': 'danger'
+        }.get(worst, 'danger')
+        
+        return {
+            "attachments": [{
+                "color": color,
+                "title": f"Recovery Watchdog: {len(alerts)} alerts ({self._digest_counts(alerts)})",
+                "text": "\n".join(self._digest_lines(alerts)),
+                "footer": "Recovery Watchdog v0.1.0",
+                "ts": int(datetime.now().timestamp())
+            }]
+        }
 
 
 # Example usage
@@ -189,4 +403,7 @@ if __name__ == "__main__":
             'mem_usage': 87.3
         }
     )
+    alert_manager.flush()
+    print(f"Delivery stats: {alert_manager.delivery_stats()}")
+    alert_manager.close()
     print("Test complete")
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+archive_metrics.py
+
+Export sealed daily columnar partitions and run fleet reports on them.
+
+    python archive_metrics.py export --days 7
+    python archive_metrics.py report --org 1 --start 2026-09-01 --end 2026-09-30
+"""
+
+import argparse
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from src.archive import Archive, export_day
+from src.models import open_database
+
+
+def cmd_export(args):
+    db = open_database()
+    today = datetime.now(timezone.utc).date()
+    days = [date.fromisoformat(args.day)] if args.day else [
+        today - timedelta(days=i) for i in range(args.days, 0, -1)
+    ]
+
+    for day in days:
+        written = export_day(db, day, args.root, force=args.force)
+        print(f"{day}: {len(written)} partition(s)")
+
+
+def cmd_report(args):
+    archive = Archive(args.root)
+    start = date.fromisoformat(args.start) if args.start else None
+    end = date.fromisoformat(args.end) if args.end else None
+
+    hourly = archive.hourly_coherence(args.org, start, end)
+    print("=" * 60)
+    print(f"ORGANIZATION {args.org}: {len(archive.partitions(args.org, start, end))} day(s)")
+    print("=" * 60)
+    if len(hourly['hour']):
+        worst = np.argsort(hourly['min_c'])[:args.top]
+        print("Lowest hourly coherence:")
+        for i in worst:
+            hour = datetime.fromtimestamp(hourly['hour'][i], timezone.utc)
+            print(f"  {hourly['agent_id'][i]} {hour:%Y-%m-%d %H}:00 "
+                  f"min C={hourly['min_c'][i]:.3f} mean C={hourly['mean_c'][i]:.3f}")
+
+    print()
+    print("Time at alert level (hours):")
+    for agent_id, levels in sorted(archive.alert_time(args.org, start, end).items()):
+        summary = "  ".join(f"{level}={seconds / 3600:.1f}" for level, seconds in levels.items() if seconds)
+        print(f"  {agent_id}  {summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar metrics archive")
+    parser.add_argument('--root', default='archive', help="Archive directory")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    export = sub.add_parser('export', help="Seal past days into partitions")
+    export.add_argument('--days', type=int, default=1, help="Export the last N complete days")
+    export.add_argument('--day', help="Export a single day (YYYY-MM-DD)")
+    export.add_argument('--force', action='store_true', help="Rewrite existing partitions")
+    export.set_defaults(func=cmd_export)
+
+    report = sub.add_parser('report', help="Hourly coherence and alert-time report")
+    report.add_argument('--org', required=True)
+    report.add_argument('--start')
+    report.add_argument('--end')
+    report.add_argument('--top', type=int, default=10)
+    report.set_defaults(func=cmd_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
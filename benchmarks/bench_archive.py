@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+bench_archive.py
+
+Hourly mean/min coherence per agent and time-at-alert-level totals over a
+multi-day history: SQL aggregates on the `metrics` table versus the
+memory-mapped columnar archive (src/archive.py).
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from src.archive import Archive, export_day
+from src.models import Database
+
+LEVELS = np.array(["GREEN", "YELLOW", "RED"], dtype=object)
+
+HOURLY_SQL = """
+    SELECT m.agent_id, strftime('%Y-%m-%d %H', m.timestamp) AS hour,
+           AVG(m.coherence), MIN(m.coherence), COUNT(*)
+    FROM metrics m JOIN agents a ON a.agent_id = m.agent_id
+    WHERE a.organization_id = ?
+    GROUP BY m.agent_id, hour
+"""
+
+ALERT_TIME_SQL = """
+    SELECT agent_id, alert_level, SUM(held) FROM (
+        SELECT m.agent_id, m.alert_level,
+               MIN(COALESCE(
+                   strftime('%s', LEAD(m.timestamp) OVER (PARTITION BY m.agent_id ORDER BY m.timestamp))
+                   - strftime('%s', m.timestamp), 0), 300) AS held
+        FROM metrics m JOIN agents a ON a.agent_id = m.agent_id
+        WHERE a.organization_id = ?
+    )
+    GROUP BY agent_id, alert_level
+"""
+
+
+def populate(db, org_id, agents, days, interval, seed=42):
+    """Insert `days` of samples every `interval` seconds for each agent"""
+    rng = np.random.default_rng(seed)
+    agent_ids = db.register_agents(org_id, [f"host-{i:04d}" for i in range(agents)])
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    steps = days * 86400 // interval
+
+    conn = sqlite3.connect(db.db_path)
+    for agent_id in agent_ids:
+        C = np.clip(0.8 + np.cumsum(rng.normal(0, 0.01, steps)), 0.0, 1.0)
+        levels = LEVELS[np.where(C <= 0.6, 2, np.where(C < 0.66, 1, 0))]
+        stamps = [(start + timedelta(seconds=i * interval)).strftime('%Y-%m-%d %H:%M:%S') for i in range(steps)]
+        conn.executemany("""
+            INSERT INTO metrics (agent_id, timestamp, coherence, recovery_margin, alert_level,
+                                 cpu_usage, mem_usage, error_rate)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (agent_id, ts, c, max(0.0, (c - 0.6) / 0.6), level, 30.0, 50.0, 0.001)
+            for ts, c, level in zip(stamps, C.tolist(), levels.tolist())
+        ])
+    conn.commit()
+    conn.close()
+    return start.date(), steps * agents
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL vs columnar archive aggregates")
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between samples")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="recovery-archive-") as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        org = db.create_organization("bench")
+        first_day, rows = populate(db, org['id'], args.agents, args.days, args.interval)
+        print(f"{rows:,} samples ({args.agents} agents x {args.days} days @ {args.interval}s)")
+
+        root = os.path.join(tmp, "archive")
+        export_s, _ = timed(lambda: [
+            export_day(db, first_day + timedelta(days=d), root) for d in range(args.days)
+        ])
+        print(f"export: {export_s:.2f}s ({rows / export_s:,.0f} samples/s)")
+
+        archive = Archive(root)
+        conn = sqlite3.connect(db.db_path)
+        cases = [
+            ("hourly mean/min C",
+             lambda: conn.execute(HOURLY_SQL, (org['id'],)).fetchall(),
+             lambda: archive.hourly_coherence(org['id'])),
+            ("alert-time totals",
+             lambda: conn.execute(ALERT_TIME_SQL, (org['id'],)).fetchall(),
+             lambda: archive.alert_time(org['id'])),
+        ]
+
+        print(f"{'query':<20} {'sql s':>9} {'archive s':>10} {'speedup':>9}")
+        for name, sql, columnar in cases:
+            sql_s, sql_rows = timed(sql)
+            arc_s, arc_result = timed(columnar)
+            if 'hour' in arc_result and len(arc_result['hour']) != len(sql_rows):
+                raise SystemExit(f"FAIL: {name}: {len(arc_result['hour'])} groups vs {len(sql_rows)} from SQL")
+            print(f"{name:<20} {sql_s:>9.3f} {arc_s:>10.3f} {sql_s / arc_s:>8.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
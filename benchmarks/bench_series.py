@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+bench_series.py
+
+Offline replay speed: detect_series() over a whole series versus the
+per-step RecoveryDebtDetector.update loop (with slope and RED hysteresis
+tracked the way the sidecar does it). Also checks both give identical
+margins, alerts, slopes, run lengths and trigger step.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from recovery.detector import ALERT_LEVELS, RecoveryDebtDetector
+from recovery.series import detect_series
+
+
+def make_series(steps, seed=42):
+    """Slowly degrading coherence with noise, plus a stress factor."""
+    rng = np.random.default_rng(seed)
+    drift = np.linspace(0.95, 0.55, steps)
+    C = np.clip(drift + rng.normal(0.0, 0.05, steps), 0.0, 1.0)
+    beta = 0.8 + rng.random(steps) * 0.6
+    return C, beta
+
+
+def streaming(detector, C, beta, red_threshold=0.01, red_count_limit=5):
+    n = len(C)
+    margins = np.empty(n)
+    alerts = np.empty(n, dtype=np.uint8)
+    slope = np.empty(n)
+    red_run = np.empty(n, dtype=np.int64)
+    code = {label: i for i, label in enumerate(ALERT_LEVELS)}
+    trigger = -1
+    prev = None
+    red = 0
+
+    for i, (c, b) in enumerate(zip(C.tolist(), beta.tolist())):
+        metrics, alert = detector.update(c, b)
+        m = metrics.recovery_margin
+        margins[i] = m
+        alerts[i] = code[alert]
+        slope[i] = 0.0 if prev is None else m - prev
+        prev = m
+        red = red + 1 if m <= red_threshold else 0
+        red_run[i] = red
+        if trigger < 0 and red >= red_count_limit:
+            trigger = i
+
+    return margins, alerts, slope, red_run, trigger
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark whole-series detection")
+    parser.add_argument("--steps", type=int, default=10_000_000)
+    parser.add_argument("--skip-streaming", action="store_true", help="Only time detect_series")
+    args = parser.parse_args()
+
+    C, beta = make_series(args.steps)
+    detector = RecoveryDebtDetector(beta_base=1.1, c_baseline=0.6)
+
+    start = time.perf_counter()
+    result = detect_series(C, beta, detector=detector)
+    vectorized = time.perf_counter() - start
+
+    print(f"{'path':<16} {'seconds':>10} {'steps/sec':>16}")
+    print(f"{'detect_series':<16} {vectorized:>10.3f} {args.steps / vectorized:>16,.0f}")
+
+    if args.skip_streaming:
+        return
+
+    start = time.perf_counter()
+    expected = streaming(detector, C, beta)
+    loop = time.perf_counter() - start
+    print(f"{'update loop':<16} {loop:>10.3f} {args.steps / loop:>16,.0f}")
+    print(f"speedup: {loop / vectorized:.1f}x")
+
+    for name, got, want in zip(result._fields, result, expected):
+        same = got == want if name == "trigger" else np.array_equal(got, want)
+        if not same:
+            raise SystemExit(f"FAIL: {name} differs from the streaming detector")
+    print("OK: identical to the streaming detector")
+
+
+if __name__ == "__main__":
+    main()
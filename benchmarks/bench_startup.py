@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+
+Startup budget for the `recovery` command line (src/recovery/cli.py).
+
+Runs `python -m recovery <args>` in fresh interpreters and reports the
+median wall time, then checks that building the parser imports none of
+the heavy dependencies. Exits non-zero when the median exceeds --budget-ms
+or a heavy module is loaded at startup, so it can gate CI or a cron host.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --budget-ms 100 --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY = ("numpy", "matplotlib", "flask", "requests", "cryptography", "sqlite3")
+
+COMMANDS = (
+    ["--help"],
+    ["detect", "--help"],
+    ["chart", "--help"],
+)
+
+PROBE = (
+    "import sys\n"
+    "from recovery.cli import build_parser\n"
+    "build_parser().format_help()\n"
+    "print(' '.join(sorted(m for m in {heavy!r} if m in sys.modules)))\n"
+)
+
+
+def environment():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT / "src"), env.get("PYTHONPATH")]))
+    return env
+
+
+def median_ms(cmd, runs, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check `recovery` CLI startup time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    env = environment()
+    interpreter = median_ms([sys.executable, "-c", "pass"], args.runs, env)
+
+    failed = False
+    print(f"{'command':<28} {'median ms':>10}")
+    print(f"{'python -c pass':<28} {interpreter:>10.1f}")
+    for command in COMMANDS:
+        ms = median_ms([sys.executable, "-m", "recovery", *command], args.runs, env)
+        over = ms > args.budget_ms
+        failed |= over
+        print(f"{'recovery ' + ' '.join(command):<28} {ms:>10.1f}{'  OVER BUDGET' if over else ''}")
+
+    loaded = subprocess.run(
+        [sys.executable, "-c", PROBE.format(heavy=HEAVY)], env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout.split()
+    if loaded:
+        failed = True
+        print(f"FAIL: imported at startup: {', '.join(loaded)}")
+
+    print(f"budget {args.budget_ms:.0f} ms: {'FAIL' if failed else 'OK'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+bench_tsstore.py
+
+Bytes per sample and scan throughput of the two metrics backends:
+the `metrics` table (one row per sample) and the Gorilla-compressed
+metric_blocks store (src/tsstore.py).
+
+A simulated fleet (MockFleetCollector, 30 s sample interval with jitter)
+is processed through the detector exactly like the API does, then written
+to a fresh database per backend. Size is measured after VACUUM relative
+to the same database without metrics; the scan reads every agent's full
+history through Database.get_metrics().
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT))
+
+from mock_collector import MockFleetCollector
+from recovery.coherence import compute_coherence_from_pod_metrics, compute_stress_factor
+from recovery.detector import RecoveryDebtDetector
+from src.models import Database
+
+METRIC_KEYS = ('cpu_usage', 'mem_usage', 'error_rate', 'response_p95', 'restart_count')
+
+
+def fleet_ticks(agents, ticks, seed=42):
+    """Yield (timestamp, [(index, db_metrics), ...]) per tick"""
+    collector = MockFleetCollector(agents, seed=seed)
+    detector = RecoveryDebtDetector(beta_base=1.1, c_baseline=0.6)
+    rng = random.Random(seed)
+    t = 1_700_000_000.0
+    for _ in range(ticks):
+        snapshot = collector.collect()
+        columns = [snapshot[k].tolist() for k in METRIC_KEYS]
+        rows = []
+        for i, values in enumerate(zip(*columns)):
+            metrics = dict(zip(METRIC_KEYS, values))
+            C = compute_coherence_from_pod_metrics(metrics)
+            margin, alert = detector.update(C, compute_stress_factor(metrics))
+            rows.append((i, {
+                'coherence': C,
+                'recovery_margin': margin.recovery_margin,
+                'alert_level': alert,
+                'cpu_usage': metrics['cpu_usage'],
+                'mem_usage': metrics['mem_usage'],
+                'error_rate': metrics['error_rate'],
+            }))
+        yield t + rng.uniform(0.0, 0.05), rows
+        t += 30.0
+
+
+def used_bytes(path):
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    size = conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    return size
+
+
+def run_backend(backend, tmp, ticks_data, agents):
+    path = os.path.join(tmp, f"{backend}.db")
+    db = Database(path, metrics_backend=backend)
+    org = db.create_organization("bench")
+    agent_ids = db.register_agents(org['id'], [f"host-{i:05d}" for i in range(agents)])
+    empty = used_bytes(path)
+
+    start = time.perf_counter()
+    for ts, rows in ticks_data:
+        batch = [(agent_ids[i], m) for i, m in rows]
+        if db.metrics_store:
+            db._write_blocks(*db.metrics_store.append(batch, timestamp=ts))
+        else:
+            db.store_metrics_batch(batch)
+    db.flush_metrics()
+    write_s = time.perf_counter() - start
+
+    samples = sum(len(rows) for _, rows in ticks_data)
+    size = used_bytes(path) - empty
+
+    start = time.perf_counter()
+    scanned = sum(len(db.get_metrics(agent_id)) for agent_id in agent_ids)
+    scan_s = time.perf_counter() - start
+    assert scanned == samples, (scanned, samples)
+
+    return {
+        'samples': samples,
+        'bytes_per_sample': size / samples,
+        'write_samples_per_s': samples / write_s,
+        'scan_samples_per_s': scanned / scan_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare metrics storage backends")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=2000, help="Samples per agent")
+    args = parser.parse_args()
+
+    ticks_data = list(fleet_ticks(args.agents, args.ticks))
+
+    print(f"{'backend':<12} {'samples':>10} {'bytes/sample':>14} {'write/s':>12} {'scan/s':>12}")
+    with tempfile.TemporaryDirectory(prefix="recovery-tsstore-") as tmp:
+        for backend in ("table", "compressed"):
+            r = run_backend(backend, tmp, ticks_data, args.agents)
+            print(f"{backend:<12} {r['samples']:>10,} {r['bytes_per_sample']:>14.1f} "
+                  f"{r['write_samples_per_s']:>12,.0f} {r['scan_samples_per_s']:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
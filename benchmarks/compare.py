@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+compare.py
+
+Compare a benchmark run against a saved baseline and flag regressions.
+
+    python benchmarks/compare.py                                   # latest vs baseline
+    python benchmarks/compare.py --current new.json --threshold 0.10
+
+Exits with status 1 if any benchmark is slower than the baseline by more
+than the threshold (relative change in median us/op).
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold):
+    """Yield (name, base_us, cur_us, change, status) for every benchmark."""
+    base_results = baseline["results"]
+    for name, cur in current["results"].items():
+        base = base_results.get(name)
+        if base is None:
+            yield name, None, cur["us_per_op"], None, "NEW"
+            continue
+        change = cur["us_per_op"] / base["us_per_op"] - 1.0
+        if change > threshold:
+            status = "REGRESSION"
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        yield name, base["us_per_op"], cur["us_per_op"], change, status
+
+    for name in base_results:
+        if name not in current["results"]:
+            yield name, base_results[name]["us_per_op"], None, None, "MISSING"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions")
+    parser.add_argument("--baseline", default=str(HERE / "baseline.json"))
+    parser.add_argument("--current", default=str(HERE / "results" / "latest.json"))
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    baseline = load(args.baseline)
+    current = load(args.current)
+
+    for label, report in (("baseline", baseline), ("current", current)):
+        meta = report.get("meta", {})
+        print(f"{label:<9} {meta.get('git_commit')} {meta.get('timestamp')} "
+              f"python {meta.get('python')} on {meta.get('machine')} ({meta.get('cpu_count')} cpu)")
+    if baseline.get("meta", {}).get("platform") != current.get("meta", {}).get("platform"):
+        print("WARNING: baseline was recorded on a different platform")
+    print()
+
+    regressions = 0
+    print(f"{'benchmark':<48} {'base us':>10} {'now us':>10} {'change':>9}  status")
+    for name, base, cur, change, status in compare(baseline, current, args.threshold):
+        base_s = f"{base:.2f}" if base is not None else "-"
+        cur_s = f"{cur:.2f}" if cur is not None else "-"
+        change_s = f"{change:+.1%}" if change is not None else "-"
+        print(f"{name:<48} {base_s:>10} {cur_s:>10} {change_s:>9}  {status}")
+        regressions += status == "REGRESSION"
+
+    print()
+    if regressions:
+        print(f"FAIL: {regressions} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"OK: no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
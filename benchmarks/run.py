@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+run.py
+
+Benchmark suite for every hot stage of the monitoring pipeline.
+
+Each benchmark is a zero-argument callable timed over `repeat` rounds of
+`number` calls; the median round is reported. Results are written as JSON
+together with machine metadata so they can be compared with
+benchmarks/compare.py against a saved baseline.
+
+    python benchmarks/run.py                      # all benchmarks
+    python benchmarks/run.py -k detector -k csv   # name filter
+    python benchmarks/run.py --save-baseline      # also write baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT))
+
+DEFAULT_OUTPUT = HERE / "results" / "latest.json"
+BASELINE = HERE / "baseline.json"
+
+BENCHMARKS = {}
+
+
+def benchmark(name, number=10_000):
+    """Register setup(tmpdir) -> callable as a benchmark."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+# -------------------------
+# COLLECTION / ANALYSIS
+# -------------------------
+@benchmark("collector.collect")
+def _collector(tmp):
+    from mock_collector import MockMetricsCollector
+    collector = MockMetricsCollector(degradation_rate=0.001)
+    return collector.collect
+
+
+@benchmark("coherence.compute_coherence_from_pod_metrics", number=50_000)
+def _coherence(tmp):
+    from recovery.coherence import compute_coherence_from_pod_metrics
+    metrics = {
+        'cpu_usage': 45.0, 'mem_usage': 60.0, 'error_rate': 0.01,
+        'response_p95': 350.0, 'restart_count': 1,
+    }
+    return lambda: compute_coherence_from_pod_metrics(metrics)
+
+
+@benchmark("detector.update", number=50_000)
+def _detector(tmp):
+    from recovery.detector import RecoveryDebtDetector
+    detector = RecoveryDebtDetector(beta_base=1.1, c_baseline=0.6)
+    rng = random.Random(1)
+    values = [(rng.random(), 0.8 + rng.random() * 0.6) for _ in range(1024)]
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 1023
+        C, beta = values[i]
+        return detector.update(C, beta)
+    return run
+
+
+@benchmark("forecast.update", number=50_000)
+def _forecast(tmp):
+    from recovery.forecast import ForecastingDetector
+    detector = ForecastingDetector(beta_base=1.1, c_baseline=0.6)
+    rng = random.Random(1)
+    values = [(rng.random(), 0.8 + rng.random() * 0.6) for _ in range(1024)]
+    state = {'i': 0, 't': 0.0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 1023
+        state['t'] += 1.0
+        C, beta = values[i]
+        return detector.update(C, beta, now=state['t'])
+    return run
+
+
+@benchmark("series.detect_series[100k]", number=20)
+def _series(tmp):
+    from bench_series import make_series
+    from recovery.series import detect_series
+    C, beta = make_series(100_000)
+    return lambda: detect_series(C, beta)
+
+
+@benchmark("FleetRollup.observe[50k agents]", number=50_000)
+def _rollup(tmp):
+    from src.fleet import FleetRollup
+    fleet = FleetRollup()
+    rng = random.Random(1)
+    samples = [(f"agent-{rng.randrange(50_000)}", rng.random()) for _ in range(4096)]
+    for i in range(50_000):
+        fleet.observe(1, f"agent-{i}", rng.random(), "GREEN")
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 4095
+        agent_id, C = samples[i]
+        fleet.observe(1, agent_id, C, "YELLOW" if C < 0.66 else "GREEN")
+    return run
+
+
+def _ranking(agents=50_000):
+    from src.fleet import WorstAgentIndex
+    index = WorstAgentIndex()
+    rng = random.Random(1)
+    for i in range(agents):
+        index.observe(1, f"agent-{i}", rng.random(), 0.0)
+    return index, rng
+
+
+@benchmark("WorstAgentIndex.observe[50k agents]", number=50_000)
+def _ranking_observe(tmp):
+    index, rng = _ranking()
+    samples = [(f"agent-{rng.randrange(50_000)}", rng.random()) for _ in range(4096)]
+    state = {'i': 0, 't': 0.0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 4095
+        state['t'] += 0.01
+        agent_id, margin = samples[i]
+        index.observe(1, agent_id, margin, state['t'])
+    return run
+
+
+@benchmark("WorstAgentIndex.worst[k=10, 50k agents]", number=20_000)
+def _ranking_worst(tmp):
+    index, _ = _ranking()
+    return lambda: index.worst(1, 10, now=0.0)
+
+
+@benchmark("CorrelationEngine.observe[50k agents]", number=50_000)
+def _correlation(tmp):
+    from src.fleet import CorrelationEngine
+    engine = CorrelationEngine()
+    rng = random.Random(1)
+    samples = [(f"agent-{rng.randrange(50_000)}", 0.8 + rng.gauss(0, 0.01)) for _ in range(4096)]
+    for i in range(50_000):
+        engine.observe(1, f"agent-{i}", 0.8, 0.0)
+    state = {'i': 0, 't': 0.0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 4095
+        state['t'] += 0.001
+        agent_id, C = samples[i]
+        engine.observe(1, agent_id, C, state['t'])
+    return run
+
+
+# -------------------------
+# INTEGRITY
+# -------------------------
+def _step_logs(n=200):
+    from recovery.integrity import compute_step_hash
+    logs, prev = [], "GENESIS"
+    for t in range(n):
+        step = {"t": t, "stress": 0.5, "M": 1.0, "beta_eff": 0.7, "C": 0.6, "violations": 0}
+        step["step_hash"] = prev = compute_step_hash(step, prev)
+        logs.append(step)
+    return logs
+
+
+@benchmark("integrity.compute_step_hash", number=20_000)
+def _hash(tmp):
+    from recovery.integrity import compute_step_hash
+    step = {"t": 1, "stress": 0.5, "M": 1.0, "beta_eff": 0.7, "C": 0.6, "violations": 0}
+    return lambda: compute_step_hash(step, "GENESIS")
+
+
+@benchmark("integrity.verify_hash_chain[200]", number=200)
+def _verify(tmp):
+    from recovery.integrity import verify_hash_chain
+    logs = _step_logs(200)
+    return lambda: verify_hash_chain(logs)
+
+
+# -------------------------
+# STORAGE / EXPORT
+# -------------------------
+@benchmark("Database.store_metrics", number=300)
+def _store(tmp):
+    from src.models import Database
+    db = Database(os.path.join(tmp, "bench.db"))
+    org = db.create_organization("bench")
+    agent_id = db.register_agent(org['id'], "bench-host")
+    metrics = {
+        'coherence': 0.8, 'recovery_margin': 0.3, 'alert_level': 'GREEN',
+        'cpu_usage': 25.0, 'mem_usage': 60.0, 'error_rate': 0.001,
+    }
+    return lambda: db.store_metrics(agent_id, metrics)
+
+
+@benchmark("CSVExporter.write", number=5_000)
+def _csv(tmp):
+    from sidecar.exporter import CSVExporter
+    exporter = CSVExporter(os.path.join(tmp, "pilot.csv"))
+    return lambda: exporter.write(C=0.8, margin=0.3, alert="GREEN")
+
+
+# -------------------------
+# END TO END
+# -------------------------
+@benchmark("sidecar.step", number=20_000)
+def _sidecar(tmp):
+    from bench_sidecar import MockAdapter, NullExporter
+    from sidecar.watchdog import RecoveryWatchdog
+    watchdog = RecoveryWatchdog(adapter=MockAdapter(), exporter=NullExporter())
+    return watchdog.step
+
+
+def _api_client(tmp):
+    os.environ['RECOVERY_DB_PATH'] = os.path.join(tmp, "api.db")
+    import saas_api
+    client = saas_api.app.test_client()
+    # Enough agents that the per-agent quota never rejects a timed call
+    org = saas_api.db.create_organization("bench", tier="enterprise")
+    agent_ids = saas_api.db.register_agents(org['id'], [f"bench-host-{i}" for i in range(1024)])
+    headers = {'X-API-Key': org['api_key']}
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 1023
+        body = {
+            'agent_id': agent_ids[i], 'cpu_usage': 35.0, 'mem_usage': 55.0,
+            'error_rate': 0.0, 'response_p95': 120.0, 'restart_count': 0,
+        }
+        response = client.post('/api/v1/metrics', json=body, headers=headers)
+        assert response.status_code == 200, response.status_code
+    return saas_api, run
+
+
+@benchmark("api POST /api/v1/metrics", number=300)
+def _api(tmp):
+    saas_api, run = _api_client(tmp)
+    saas_api.rate_limiter = saas_api.RateLimiter()
+    return run
+
+
+@benchmark("api POST /api/v1/metrics[no rate limit]", number=300)
+def _api_unlimited(tmp):
+    saas_api, run = _api_client(tmp)
+    saas_api.rate_limiter = None
+    return run
+
+
+@benchmark("RateLimiter.acquire", number=100_000)
+def _rate_limit(tmp):
+    from src.ratelimit import RateLimiter
+    limiter = RateLimiter()
+    agent_ids = [f"agent-{i}" for i in range(4096)]
+    state = {'i': 0}
+
+    def run():
+        i = state['i'] = (state['i'] + 1) & 4095
+        limiter.acquire(1, "professional", [agent_ids[i]])
+    return run
+
+
+# -------------------------
+# RUNNER
+# -------------------------
+def machine_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def measure(fn, number, repeat):
+    fn()  # warm-up
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    median = statistics.median(rounds)
+    return {
+        "number": number,
+        "repeat": repeat,
+        "us_per_op": median * 1e6,
+        "us_per_op_min": min(rounds) * 1e6,
+        "ops_per_sec": 1.0 / median if median else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmark suite")
+    parser.add_argument("-k", action="append", default=[], help="Only benchmarks containing this text")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply iteration counts")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write {BASELINE.name}")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    selected = [
+        name for name in BENCHMARKS
+        if not args.k or any(k.lower() in name.lower() for k in args.k)
+    ]
+    if args.list:
+        print("\n".join(selected))
+        return
+
+    logging.disable(logging.CRITICAL)
+    results = {}
+
+    print(f"{'benchmark':<48} {'us/op':>10} {'ops/sec':>14}")
+    with tempfile.TemporaryDirectory(prefix="recovery-bench-") as tmp:
+        for name in selected:
+            setup, number = BENCHMARKS[name]
+            fn = setup(tmp)
+            r = results[name] = measure(fn, max(1, int(number * args.scale)), args.repeat)
+            print(f"{name:<48} {r['us_per_op']:>10.2f} {r['ops_per_sec']:>14,.0f}")
+
+    report = {"meta": machine_metadata(), "results": results}
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"OK: wrote {len(results)} results → {out}")
+
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps(report, indent=2))
+        print(f"OK: baseline saved → {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,11 @@
-import argparse, json
-import matplotlib.pyplot as plt
+#!/usr/bin/env python3
+"""Compatibility wrapper for `recovery chart` (src/recovery/cli.py)."""
+import sys
+from pathlib import Path
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--run", required=True)
-    args = parser.parse_args()
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
-    run = json.load(open(args.run))
-    margins = [s["C"] for s in run["step_logs"]]
-
-    plt.plot(margins)
-    plt.title("Coherence over time")
-    plt.show()
+from recovery.cli import main
 
 if __name__ == "__main__":
-    main()
+    main(["chart", *sys.argv[1:]])
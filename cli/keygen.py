@@ -1,30 +1,11 @@
-import argparse
+#!/usr/bin/env python3
+"""Compatibility wrapper for `recovery keygen` (src/recovery/cli.py)."""
+import sys
 from pathlib import Path
-from recovery.crypto import generate_keypair
 
-def main():
-    parser = argparse.ArgumentParser(description="Generate signing keypair")
-    parser.add_argument("--output", required=True, help="Key name (no extension)")
-    args = parser.parse_args()
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
-    base = Path(args.output)
-    priv = base.with_suffix(".private.pem")
-    pub = base.with_suffix(".public.pem")
-
-    if priv.exists() or pub.exists():
-        print("Keys already exist.")
-        return
-
-    private_pem, public_pem = generate_keypair()
-
-    priv.parent.mkdir(parents=True, exist_ok=True)
-    priv.write_bytes(private_pem)
-    priv.chmod(0o600)
-    pub.write_bytes(public_pem)
-
-    print("Keys generated:")
-    print(priv)
-    print(pub)
+from recovery.cli import main
 
 if __name__ == "__main__":
-    main()
+    main(["keygen", *sys.argv[1:]])
@@ -4,13 +4,132 @@ dashboard.py
 Simple web dashboard for Recovery Watchdog
 """
 
-from flask import Flask, render_template_string
+from flask import Flask, Response, jsonify, render_template_string, request
+from collections import deque
+from itertools import islice
 import csv
-from pathlib import Path
+import os
+import threading
+import time
 import json
 
+import numpy as np
+
+from src.recovery.downsample import MODES, downsample_indices
+
 app = Flask(__name__)
 
+CHART_POINTS = 1000     # points drawn; the whole buffer is downsampled to fit
+
+
+class CSVTail:
+    """
+    In-memory ring buffer that follows a growing CSV by byte offset.
+
+    Only bytes appended since the last poll are read and parsed. A new
+    inode or a file shorter than the current offset is treated as a
+    rotation: the buffer is dropped and the file is followed from the
+    start again. Every row gets a monotonically increasing sequence
+    number so clients can ask for "everything after seq N".
+    """
+
+    def __init__(self, path, maxlen=5000):
+        self.path = path
+        self.points = deque(maxlen=maxlen)
+        self.seq = 0
+        self.total = 0
+        self.first_timestamp = None
+        self._lock = threading.Lock()
+        self._inode = None
+        self._offset = 0
+        self._header = None
+        self._partial = b""
+
+    def _reset(self, inode):
+        self._inode = inode
+        self._offset = 0
+        self._header = None
+        self._partial = b""
+        # Rows from the old file no longer match the new one; seq keeps
+        # counting so clients only see rows read after the rotation
+        self.points.clear()
+        self.total = 0
+        self.first_timestamp = None
+
+    def poll(self):
+        """Read whatever was appended since the last poll."""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                return
+
+            if st.st_ino != self._inode or st.st_size < self._offset:
+                self._reset(st.st_ino)
+
+            if st.st_size == self._offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(st.st_size - self._offset)
+            self._offset += len(chunk)
+
+            lines = (self._partial + chunk).split(b"\n")
+            self._partial = lines.pop()
+            for line in lines:
+                self._consume(line.decode("utf-8").rstrip("\r"))
+
+    def _consume(self, line):
+        if not line:
+            return
+        values = next(csv.reader([line]))
+        if self._header is None:
+            self._header = values
+            return
+        row = dict(zip(self._header, values))
+        try:
+            point = {
+                'timestamp': row['timestamp'][:19],
+                'coherence': float(row['coherence_C']),
+                'margin': float(row['recovery_margin']),
+                'alert_level': row['alert_level'],
+            }
+        except (KeyError, ValueError):
+            return
+
+        self.seq += 1
+        self.total += 1
+        point['seq'] = self.seq
+        if self.first_timestamp is None:
+            self.first_timestamp = point['timestamp']
+        self.points.append(point)
+
+    def since(self, seq):
+        """Points with sequence number > seq still held in the buffer."""
+        with self._lock:
+            if not self.points:
+                return []
+            start = max(0, seq - self.points[0]['seq'] + 1)
+            return list(islice(self.points, start, None))
+
+    def latest(self, n):
+        with self._lock:
+            return list(islice(self.points, max(0, len(self.points) - n), None))
+
+    def history(self, width, mode='lttb'):
+        """Every buffered point, downsampled to about `width` (RED kept)."""
+        with self._lock:
+            points = list(self.points)
+        if len(points) <= width:
+            return points
+        margin = np.fromiter((p['margin'] for p in points), dtype=np.float64, count=len(points))
+        red = np.fromiter((p['alert_level'] == 'RED' for p in points), dtype=bool, count=len(points))
+        return [points[i] for i in downsample_indices(margin, width, mode=mode, protect=red).tolist()]
+
+
+tail = CSVTail(os.environ.get('DASHBOARD_CSV', 'pilot.csv'))
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html>
@@ -67,20 +186,20 @@ HTML_TEMPLATE = """
     <div class="container">
         <h1>🛡️ Recovery Watchdog Dashboard</h1>
         
-        <div class="status-card status-{{ alert_level }}">
+        <div id="status" class="status-card status-{{ alert_level }}">
             Current Status: {{ alert_level }}
         </div>
         
         <div class="metric">
-            <strong>Coherence (C):</strong> {{ "%.3f"|format(current_C) }}
+            <strong>Coherence (C):</strong> <span id="current-c">{{ "%.3f"|format(current_C) }}</span>
         </div>
         
         <div class="metric">
-            <strong>Recovery Margin:</strong> {{ "%.3f"|format(current_margin) }}
+            <strong>Recovery Margin:</strong> <span id="current-margin">{{ "%.3f"|format(current_margin) }}</span>
         </div>
         
         <div class="metric">
-            <strong>Data Points:</strong> {{ data_count }}
+            <strong>Data Points:</strong> <span id="data-count">{{ data_count }}</span>
         </div>
         
         <div id="chart"></div>
@@ -126,6 +245,23 @@ HTML_TEMPLATE = """
         };
         
         Plotly.newPlot('chart', [trace1, trace2], layout);
+        
+        // Live updates: the server pushes only points after last_seq
+        var source = new EventSource('/api/stream?since={{ last_seq }}');
+        source.onmessage = function(event) {
+            var p = JSON.parse(event.data);
+            Plotly.extendTraces('chart', {
+                x: [[p.timestamp], [p.timestamp]],
+                y: [[p.coherence], [p.margin]]
+            }, [0, 1], {{ chart_points }});
+            
+            var status = document.getElementById('status');
+            status.className = 'status-card status-' + p.alert_level;
+            status.textContent = 'Current Status: ' + p.alert_level;
+            document.getElementById('current-c').textContent = p.coherence.toFixed(3);
+            document.getElementById('current-margin').textContent = p.margin.toFixed(3);
+            document.getElementById('data-count').textContent = p.data_count;
+        };
     </script>
 </body>
 </html>
@@ -134,41 +270,89 @@ HTML_TEMPLATE = """
 @app.route('/')
 def dashboard():
     """Main dashboard view"""
-    csv_file = Path("pilot.csv")
-    
-    if not csv_file.exists():
-        return "No data yet. Run watchdog_monitor.py first.", 404
-    
-    # Read CSV data
-    data = []
-    with open(csv_file, 'r') as f:
-        reader = csv.DictReader(f)
-        data = list(reader)
-    
-    if not data:
+    tail.poll()
+    recent_data = tail.history(CHART_POINTS)
+
+    if not recent_data:
         return "No data yet. Run watchdog_monitor.py first.", 404
-    
+
     # Extract current state
-    current = data[-1]
-    first = data[0]
-    
-    # Prepare data for chart (last 100 points)
-    recent_data = data[-100:]
-    
-    timestamps = [row['timestamp'][:19] for row in recent_data]
-    coherence = [float(row['coherence_C']) for row in recent_data]
-    margins = [float(row['recovery_margin']) for row in recent_data]
-    
+    current = recent_data[-1]
+
     return render_template_string(
         HTML_TEMPLATE,
         alert_level=current['alert_level'],
-        current_C=float(current['coherence_C']),
-        current_margin=float(current['recovery_margin']),
-        data_count=len(data),
-        first_timestamp=first['timestamp'][:19],
-        timestamps=timestamps,
-        coherence=coherence,
-        margins=margins
+        current_C=current['coherence'],
+        current_margin=current['margin'],
+        data_count=tail.total,
+        first_timestamp=tail.first_timestamp,
+        last_seq=current['seq'],
+        chart_points=CHART_POINTS,
+        timestamps=[p['timestamp'] for p in recent_data],
+        coherence=[p['coherence'] for p in recent_data],
+        margins=[p['margin'] for p in recent_data]
+    )
+
+
+@app.route('/api/points')
+def points():
+    """New points after ?since=<seq> (JSON polling fallback)"""
+    tail.poll()
+    since = request.args.get('since', 0, type=int)
+    return jsonify({
+        'points': tail.since(since),
+        'last_seq': tail.seq,
+        'data_count': tail.total
+    })
+
+
+@app.route('/api/history')
+def history():
+    """Whole buffered history downsampled to ?width=<points>&mode=lttb|minmax"""
+    tail.poll()
+    width = max(3, min(request.args.get('width', CHART_POINTS, type=int), tail.points.maxlen))
+    mode = request.args.get('mode', 'lttb')
+    if mode not in MODES:
+        return jsonify({'error': f"mode must be one of {', '.join(MODES)}"}), 400
+    points = tail.history(width, mode)
+    return jsonify({
+        'timestamps': [p['timestamp'] for p in points],
+        'coherence': [p['coherence'] for p in points],
+        'margins': [p['margin'] for p in points],
+        'alert_levels': [p['alert_level'] for p in points],
+        'last_seq': tail.seq,
+        'data_count': tail.total
+    })
+
+
+@app.route('/api/stream')
+def stream():
+    """Server-sent events: pushes each new point once"""
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', tail.seq, type=int)
+
+    def events(since):
+        idle = 0
+        while True:
+            tail.poll()
+            new = tail.since(since)
+            for point in new:
+                payload = dict(point, data_count=tail.total)
+                yield f"id: {point['seq']}\ndata: {json.dumps(payload)}\n\n"
+                since = point['seq']
+            if new:
+                idle = 0
+            else:
+                idle += 1
+                if idle % 15 == 0:
+                    yield ": keep-alive\n\n"
+            time.sleep(1.0)
+
+    return Response(
+        events(since),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
 
 if __name__ == '__main__':
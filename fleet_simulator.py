@@ -0,0 +1,291 @@
+"""
+fleet_simulator.py
+
+Capacity benchmark for the SaaS API.
+
+Generates N simulated agents with MockFleetCollector, drives the metrics
+endpoints (single or batch) at a fixed open-loop rate and reports
+sustained ingest throughput, p50/p99 request latency and database growth.
+
+By default a fresh API server is started as a subprocess on a temporary
+database; pass --url to load an already running deployment instead.
+--workers N starts saas_server.py (prefork, organization affinity) instead
+of saas_api.py; spread the agents over several organizations with --orgs
+so the load reaches every worker.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from mock_collector import MockFleetCollector
+from src.models import Database
+
+
+METRIC_KEYS = ('cpu_usage', 'mem_usage', 'error_rate', 'response_p95', 'restart_count')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def db_size(db_path: str) -> int:
+    """Database bytes on disk including WAL/SHM side files"""
+    return sum(
+        os.path.getsize(db_path + suffix)
+        for suffix in ('', '-wal', '-shm')
+        if os.path.exists(db_path + suffix)
+    )
+
+
+def db_rows(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class LocalServer:
+    """saas_api.py (or saas_server.py with workers) in a subprocess on its own database"""
+
+    def __init__(self, db_path: str, workers: int = 0):
+        self.db_path = db_path
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workers = workers
+        script = 'saas_server.py' if workers > 0 else 'saas_api.py'
+        self.command = [sys.executable, script]
+        self.proc = None
+
+    def start(self, timeout: float = 30.0):
+        # Quotas off: the simulator measures server throughput, not tiers
+        env = dict(os.environ, PORT=str(self.port), HOST='127.0.0.1',
+                   RECOVERY_DB_PATH=self.db_path, RECOVERY_RATE_LIMITS='0')
+        if self.workers > 0:
+            env['WEB_CONCURRENCY'] = str(self.workers)
+        self.proc = subprocess.Popen(
+            self.command, env=env, cwd=Path(__file__).resolve().parent,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if requests.get(f"{self.url}/api/v1/health", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("API server did not become healthy")
+
+    def stop(self):
+        if self.proc:
+            self.proc.terminate()
+            self.proc.wait(timeout=10)
+
+
+def provision(args):
+    """
+    Create orgs + agents; returns (url, api_keys, agent_ids, server, db_path)
+    where api_keys[i] is the key of the organization owning agent_ids[i].
+    Agents are assigned to the --orgs organizations round-robin.
+    """
+    hostnames = [f"sim-{i:06d}" for i in range(args.agents)]
+    owners = [i % args.orgs for i in range(args.agents)]
+
+    if args.url:
+        url = args.url.rstrip('/')
+        keys = []
+        for i in range(args.orgs):
+            org = requests.post(f"{url}/api/v1/organizations",
+                                json={'name': f'fleet-simulator-{i}', 'tier': 'enterprise'}).json()
+            keys.append(org['organization']['api_key'])
+
+        def register(i):
+            r = requests.post(f"{url}/api/v1/agents/register",
+                              headers={'X-API-Key': keys[owners[i]]},
+                              json={'hostname': hostnames[i]})
+            return r.json()['agent_id']
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            agent_ids = list(pool.map(register, range(args.agents)))
+        return url, [keys[o] for o in owners], agent_ids, None, args.db
+
+    # Provision directly in a fresh DB, then start the server on it
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix='fleet-sim-'), 'fleet.db')
+    db = Database(db_path)
+    agent_ids = [None] * args.agents
+    keys = []
+    for o in range(args.orgs):
+        org = db.create_organization(f'fleet-simulator-{o}', tier='enterprise')
+        keys.append(org['api_key'])
+        members = [i for i in range(args.agents) if owners[i] == o]
+        ids = db.register_agents(org['id'], [hostnames[i] for i in members])
+        for i, agent_id in zip(members, ids):
+            agent_ids[i] = agent_id
+
+    server = LocalServer(db_path, workers=args.workers)
+    server.start()
+    return server.url, [keys[o] for o in owners], agent_ids, server, db_path
+
+
+def build_requests(collector, agent_ids, api_keys, ticks, batch_size):
+    """
+    Pre-generate (path, body, samples, api_key) so payload building doesn't
+    skew timing. Batches never mix organizations.
+    """
+    by_org = {}
+    for i, key in enumerate(api_keys):
+        by_org.setdefault(key, []).append(i)
+
+    bodies = []
+    for _ in range(ticks):
+        snapshot = collector.collect()
+        columns = [snapshot[k].tolist() for k in METRIC_KEYS]
+        samples = [
+            {'agent_id': agent_id, **dict(zip(METRIC_KEYS, values))}
+            for agent_id, *values in zip(agent_ids, *columns)
+        ]
+        if batch_size <= 1:
+            bodies.extend(('/api/v1/metrics', s, 1, key) for s, key in zip(samples, api_keys))
+            continue
+        for key, members in by_org.items():
+            for i in range(0, len(members), batch_size):
+                chunk = [samples[j] for j in members[i:i + batch_size]]
+                bodies.append(('/api/v1/metrics/batch', {'samples': chunk}, len(chunk), key))
+    return bodies
+
+
+def drive(url, bodies, rate, concurrency):
+    """
+    Open-loop load: request i is due at start + i * interval, where the
+    interval keeps `rate` samples/sec. Returns per-request latency and
+    sample counts.
+    """
+    samples_per_request = np.mean([n for _, _, n, _ in bodies])
+    interval = samples_per_request / rate if rate > 0 else 0.0
+    latencies = np.full(len(bodies), np.nan)
+    ok = np.zeros(len(bodies), dtype=bool)
+    local = threading.local()
+    start = time.perf_counter() + 0.1
+
+    def send(i):
+        path, body, _, api_key = bodies[i]
+        # One keep-alive session per (thread, organization): the prefork
+        # server routes whole connections by API key.
+        sessions = getattr(local, 'sessions', None)
+        if sessions is None:
+            sessions = local.sessions = {}
+        session = sessions.get(api_key)
+        if session is None:
+            session = sessions[api_key] = requests.Session()
+            session.headers['X-API-Key'] = api_key
+        due = start + i * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t0 = time.perf_counter()
+        try:
+            response = session.post(url + path, json=body, timeout=30)
+            ok[i] = response.status_code == 200
+        except requests.RequestException:
+            ok[i] = False
+        latencies[i] = time.perf_counter() - t0
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(send, range(len(bodies))))
+    elapsed = time.perf_counter() - start
+
+    counts = np.array([n for _, _, n, _ in bodies])
+    return latencies, ok, counts, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet load simulator for the SaaS API")
+    parser.add_argument('--agents', type=int, default=10_000)
+    parser.add_argument('--ticks', type=int, default=3, help="Snapshots per agent")
+    parser.add_argument('--rate', type=float, default=2000, help="Target samples/sec (0 = as fast as possible)")
+    parser.add_argument('--batch-size', type=int, default=100, help="Samples per request (1 = single endpoint)")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--orgs', type=int, default=1, help="Organizations the agents are spread over")
+    parser.add_argument('--workers', type=int, default=0, help="Local server: saas_server.py workers (0 = saas_api.py)")
+    parser.add_argument('--url', help="Load an existing deployment instead of a local server")
+    parser.add_argument('--db', help="SQLite file to measure (local: created if missing)")
+    parser.add_argument('--json', help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Recovery Watchdog Fleet Simulator")
+    print("=" * 60)
+    print(f"Agents: {args.agents}  Orgs: {args.orgs}  Ticks: {args.ticks}  Rate: {args.rate}/s  "
+          f"Batch: {args.batch_size}  Concurrency: {args.concurrency}  Workers: {args.workers}")
+
+    url, api_keys, agent_ids, server, db_path = provision(args)
+    try:
+        collector = MockFleetCollector(args.agents, seed=args.seed)
+        bodies = build_requests(collector, agent_ids, api_keys, args.ticks, args.batch_size)
+
+        size_before = db_size(db_path) if db_path else None
+        rows_before = db_rows(db_path) if db_path else None
+
+        latencies, ok, counts, elapsed = drive(url, bodies, args.rate, args.concurrency)
+
+        # Let background writers drain before measuring the DB
+        time.sleep(1.0)
+        size_after = db_size(db_path) if db_path else None
+        rows_after = db_rows(db_path) if db_path else None
+    finally:
+        if server:
+            server.stop()
+
+    ms = latencies * 1000.0
+    samples_ok = int(counts[ok].sum())
+    report = {
+        'agents': args.agents,
+        'orgs': args.orgs,
+        'workers': args.workers,
+        'batch_size': args.batch_size,
+        'target_rate': args.rate,
+        'requests': len(bodies),
+        'requests_failed': int((~ok).sum()),
+        'samples_ok': samples_ok,
+        'elapsed_s': elapsed,
+        'throughput_samples_per_s': samples_ok / elapsed,
+        'latency_p50_ms': float(np.percentile(ms, 50)),
+        'latency_p99_ms': float(np.percentile(ms, 99)),
+    }
+    if size_before is not None:
+        rows = rows_after - rows_before
+        grown = size_after - size_before
+        report.update({
+            'db_rows_added': rows,
+            'db_bytes_added': grown,
+            'db_bytes_per_sample': grown / rows if rows else None,
+        })
+
+    print("-" * 60)
+    for key, value in report.items():
+        print(f"{key:<28} {value:,.2f}" if isinstance(value, float) else f"{key:<28} {value}")
+    print("=" * 60)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
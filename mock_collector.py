@@ -9,6 +9,8 @@ import time
 import random
 import math
 
+import numpy as np
+
 
 class MockMetricsCollector:
     """
@@ -74,6 +76,76 @@ class MockMetricsCollector:
         self.restart_count = 0
 
 
+class MockFleetCollector:
+    """
+    Simulates N hosts at once, one NumPy array per metric per tick.
+    
+    Same metric model as MockMetricsCollector, but every agent gets its own
+    degradation profile:
+        - stable   (70%): no degradation, low noise
+        - slow     (20%): slow drift starting at a random step
+        - fast     (10%): rapid collapse starting at a random step
+    """
+    
+    PROFILES = ('stable', 'slow', 'fast')
+    
+    def __init__(self, n_agents: int, seed: int = 42, profile_mix=(0.7, 0.2, 0.1),
+                 onset_max: int = 200):
+        """
+        Args:
+            n_agents: Number of simulated hosts
+            seed: RNG seed (runs are reproducible)
+            profile_mix: Fractions of stable/slow/fast agents
+            onset_max: Latest step at which degradation can begin
+        """
+        self.n_agents = n_agents
+        self.rng = np.random.default_rng(seed)
+        self.time_step = 0
+        
+        self.profile = self.rng.choice(len(self.PROFILES), size=n_agents, p=profile_mix)
+        rates = np.array([0.0, 0.002, 0.02])
+        self.degradation_rate = rates[self.profile] * self.rng.uniform(0.5, 1.5, n_agents)
+        self.onset = self.rng.integers(0, onset_max + 1, n_agents)
+        self.base_cpu = self.rng.uniform(10.0, 40.0, n_agents)
+        self.base_mem = self.rng.uniform(20.0, 50.0, n_agents)
+        self.noise = np.where(self.profile == 0, 2.0, 5.0)
+        self.restart_count = np.zeros(n_agents, dtype=np.int64)
+    
+    def collect(self) -> dict:
+        """
+        Collect one snapshot for every agent.
+        
+        Returns:
+            dict: metric name -> array of shape (n_agents,)
+        """
+        self.time_step += 1
+        n = self.n_agents
+        rng = self.rng
+        
+        degradation = np.maximum(0, self.time_step - self.onset) * self.degradation_rate
+        
+        cpu = self.base_cpu + degradation * 50 + rng.uniform(-1, 1, n) * self.noise
+        cpu = np.clip(cpu, 0, 100)
+        
+        mem = self.base_mem + degradation * 40 + rng.uniform(-1, 1, n) * self.noise
+        mem = np.clip(mem, 0, 100)
+        
+        error_rate = np.maximum(0, degradation * 0.1 + rng.uniform(-0.01, 0.01, n))
+        
+        response_p95 = np.maximum(0, 100 + degradation * 1000 + rng.uniform(-50, 50, n))
+        
+        saturated = (cpu > 95) | (mem > 95)
+        self.restart_count += saturated & (rng.random(n) < 0.1)
+        
+        return {
+            'cpu_usage': cpu,
+            'mem_usage': mem,
+            'error_rate': error_rate,
+            'response_p95': response_p95,
+            'restart_count': self.restart_count.copy()
+        }
+
+
 # Test the collector
 if __name__ == "__main__":
     collector = MockMetricsCollector(degradation_rate=0.05)
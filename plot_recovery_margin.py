@@ -1,24 +1,15 @@
-import csv
-import matplotlib.pyplot as plt
+"""
+plot_recovery_margin.py
 
-CSV_FILE = "detector_report.csv"
+Plot detector_report.csv; same as `recovery chart --report detector_report.csv`.
+"""
+import sys
+
+sys.path.insert(0, "src")
 
-steps = []
-margins = []
+from recovery.cli import main
 
-with open(CSV_FILE, "r", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for i, row in enumerate(reader):
-        t = row.get("t")
-        steps.append(int(t) if t not in (None, "", "None") else i)
-        margins.append(float(row["recovery_margin"]))
+CSV_FILE = "detector_report.csv"
 
-plt.figure(figsize=(10, 4))
-plt.plot(steps, margins, label="Recovery Margin")
-plt.axhline(0.0, linestyle="--", color="red", alpha=0.5)
-plt.xlabel("Step")
-plt.ylabel("Recovery Margin")
-plt.title("Recovery Margin Over Time")
-plt.legend()
-plt.tight_layout()
-plt.show()
+if __name__ == "__main__":
+    main(["chart", "--report", CSV_FILE, *sys.argv[1:]])
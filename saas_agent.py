@@ -3,12 +3,79 @@ saas_agent.py
 
 Lightweight agent that customers install on their servers.
 Sends metrics to Recovery Watchdog SaaS.
+
+The sampling interval adapts to the local recovery margin: the agent
+computes C and the margin itself (same baseline as the server) and
+samples faster as the margin falls or its trend turns negative, slower
+while the host is healthy and stable.
 """
 
 import time
 import requests
 import socket
 from real_collector import RealMetricsCollector
+from src.recovery.coherence import compute_coherence_from_pod_metrics, compute_stress_factor
+from src.recovery.forecast import ForecastingDetector
+
+
+class AdaptiveInterval:
+    """
+    Seconds to wait before the next sample, within [min_interval, max_interval].
+    
+    The target interval is the smallest of:
+    - a margin target: min_interval at red_margin, rising linearly to
+      max_interval at healthy_margin;
+    - a forecast target: the pessimistic time to RED split into
+      samples_before_red samples, so a falling margin is sampled more
+      densely the closer RED gets.
+    A shorter target applies at once; a longer one is approached by at most
+    a factor of `grow` per sample, so one good reading doesn't stretch it.
+    RED always samples at min_interval.
+    
+    The server admits 1 sample/s per agent, so min_interval is at least 1 s.
+    """
+    
+    def __init__(
+        self,
+        base_interval: float = 30.0,
+        min_interval: float = 5.0,
+        max_interval: float = 120.0,
+        red_margin: float = 0.05,
+        healthy_margin: float = 0.30,
+        samples_before_red: int = 60,
+        grow: float = 1.5,
+    ):
+        if not 1.0 <= min_interval <= base_interval <= max_interval:
+            raise ValueError('need 1 <= min_interval <= base_interval <= max_interval')
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.red_margin = red_margin
+        self.healthy_margin = healthy_margin
+        self.samples_before_red = samples_before_red
+        self.grow = grow
+        self.interval = base_interval
+    
+    def target(self, margin: float, seconds_to_red) -> float:
+        span = (margin - self.red_margin) / (self.healthy_margin - self.red_margin)
+        span = min(max(span, 0.0), 1.0)
+        target = self.min_interval + span * (self.max_interval - self.min_interval)
+        
+        if seconds_to_red is not None:
+            target = min(target, seconds_to_red / self.samples_before_red)
+        return min(max(target, self.min_interval), self.max_interval)
+    
+    def next(self, margin: float, seconds_to_red=None, alert: str = 'GREEN') -> float:
+        if alert == 'RED':
+            self.interval = self.min_interval
+            return self.interval
+        
+        target = self.target(margin, seconds_to_red)
+        if target < self.interval:
+            self.interval = target
+        else:
+            self.interval = min(target, self.interval * self.grow)
+        return self.interval
 
 
 class RecoveryWatchdogAgent:
@@ -28,6 +95,11 @@ class RecoveryWatchdogAgent:
         self.collector = RealMetricsCollector()
         self.agent_id = None
         self.hostname = socket.gethostname()
+        # Local copy of the server's detector, used only for scheduling
+        self.detector = ForecastingDetector(beta_base=1.1, c_baseline=0.6)
+        self.local = None
+        self.local_alert = 'GREEN'
+        self.retry_after = 0.0
         
     def register(self):
         """Register this agent with SaaS platform"""
@@ -37,7 +109,7 @@ class RecoveryWatchdogAgent:
             json={'hostname': self.hostname}
         )
         
-        if response.status_code == 201:
+        if response.status_code in (200, 201):
             data = response.json()
             self.agent_id = data['agent_id']
             print(f"✓ Agent registered: {self.agent_id}")
@@ -56,6 +128,11 @@ class RecoveryWatchdogAgent:
         # Collect local metrics
         metrics = self.collector.collect()
         
+        # Local margin and trend for the sampling schedule
+        C = compute_coherence_from_pod_metrics(metrics)
+        beta = compute_stress_factor(metrics)
+        self.local, self.local_alert = self.detector.update(C, beta)
+        
         # Add agent_id
         metrics['agent_id'] = self.agent_id
         
@@ -71,6 +148,10 @@ class RecoveryWatchdogAgent:
             if response.status_code == 200:
                 data = response.json()
                 return data
+            elif response.status_code == 429:
+                self.retry_after = float(response.headers.get('Retry-After', 1))
+                print(f"✗ Rate limited, retrying in {self.retry_after:.0f}s")
+                return None
             else:
                 print(f"✗ Metrics submission failed: {response.status_code}")
                 return None
@@ -79,14 +160,25 @@ class RecoveryWatchdogAgent:
             print(f"✗ Connection error: {e}")
             return None
     
-    def run(self, interval: int = 30):
-        """Run monitoring loop"""
+    def run(self, interval: int = 30, min_interval: float = 5, max_interval: float = 120,
+            adaptive: bool = True):
+        """
+        Run monitoring loop.
+        
+        With adaptive=False every sample is `interval` seconds apart;
+        otherwise the interval moves between min_interval and max_interval
+        (see AdaptiveInterval), starting at `interval`.
+        """
+        scheduler = AdaptiveInterval(interval, min_interval, max_interval) if adaptive else None
         print("=" * 60)
         print("Recovery Watchdog Agent Starting")
         print("=" * 60)
         print(f"API: {self.api_url}")
         print(f"Hostname: {self.hostname}")
-        print(f"Interval: {interval}s")
+        if adaptive:
+            print(f"Interval: {interval}s (adaptive {min_interval}-{max_interval}s)")
+        else:
+            print(f"Interval: {interval}s")
         print("=" * 60)
         print()
         
@@ -106,6 +198,16 @@ class RecoveryWatchdogAgent:
                 
                 result = self.send_metrics()
                 
+                wait = interval
+                if scheduler and self.local is not None:
+                    wait = scheduler.next(
+                        self.local.recovery_margin,
+                        self.local.seconds_to_red_low,
+                        self.local_alert,
+                    )
+                wait = max(wait, self.retry_after)
+                self.retry_after = 0.0
+                
                 if result:
                     alert_symbol = {
                         'GREEN': '✓',
@@ -115,11 +217,12 @@ class RecoveryWatchdogAgent:
                     
                     print(f"[{step:04d}] C={result['coherence']:.3f} | "
                           f"M={result['recovery_margin']:.3f} | "
-                          f"{alert_symbol} {result['alert_level']}")
+                          f"{alert_symbol} {result['alert_level']} | "
+                          f"next {wait:.0f}s")
                 else:
                     print(f"[{step:04d}] ✗ Failed to send metrics")
                 
-                time.sleep(interval)
+                time.sleep(wait)
                 
         except KeyboardInterrupt:
             print("\n" + "=" * 60)
@@ -134,4 +237,4 @@ if __name__ == "__main__":
     API_URL = "http://localhost:8000"  # Change to production URL
     
     agent = RecoveryWatchdogAgent(API_KEY, API_URL)
-    agent.run(interval=30)
\ No newline at end of file
+    agent.run(interval=30, min_interval=5, max_interval=120)
\ No newline at end of file
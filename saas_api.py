@@ -6,19 +6,295 @@ REST API for SaaS Recovery Watchdog
 
 from flask import Flask, request, jsonify
 from functools import wraps
-from src.models import Database
+from src.fleet import FLEET_AGENT_ID, RANKINGS, CorrelationEngine, FleetRollup, WorstAgentIndex
+from src.models import BatchWriter, Database, open_database
+from src.ratelimit import RateLimiter, limits_for
 from src.recovery.detector import RecoveryDebtDetector
 from src.recovery.coherence import compute_coherence_from_pod_metrics, compute_stress_factor
+from src.recovery import timing
+from alerts import AlertManager
+import math
 import os
+import threading
+import time
 
 
 app = Flask(__name__)
-db = Database()
+db = open_database()
 
 # Initialize detector
 detector = RecoveryDebtDetector(beta_base=1.1, c_baseline=0.6)
 
 
+def alert_config_from_env() -> dict:
+    """AlertManager config from SMTP_* / SLACK_WEBHOOK_URL environment"""
+    config = {'digest': {'window_seconds': float(os.environ.get('ALERT_DIGEST_SECONDS', 30))}}
+    if os.environ.get('SMTP_SERVER'):
+        config['email'] = {
+            'enabled': True,
+            'smtp_server': os.environ['SMTP_SERVER'],
+            'smtp_port': int(os.environ.get('SMTP_PORT', 587)),
+            'sender': os.environ.get('SMTP_SENDER', ''),
+            'password': os.environ.get('SMTP_PASSWORD', ''),
+            'recipients': os.environ.get('ALERT_RECIPIENTS', '').split(',')
+        }
+    if os.environ.get('SLACK_WEBHOOK_URL'):
+        config['slack'] = {
+            'enabled': True,
+            'webhook_url': os.environ['SLACK_WEBHOOK_URL']
+        }
+    return config
+
+
+alert_manager = AlertManager(alert_config_from_env())
+
+
+class AlertTracker:
+    """
+    Per-agent alert level state for the ingestion path, keyed by
+    (organization_id, agent_id).
+    
+    observe() is a dict lookup; only level changes become alert events,
+    which are queued for a background writer that batch-inserts them into
+    the alerts table and then hands them to AlertManager. raise_event()
+    queues other events (e.g. organization-wide ones) the same way.
+    """
+    
+    def __init__(self, database: Database, manager: AlertManager):
+        self.db = database
+        self.manager = manager
+        self.levels = database.get_latest_alert_levels()
+        self._lock = threading.Lock()
+        self.writer = BatchWriter(self._persist, name='alert-writer')
+    
+    def observe(self, organization_id: int, agent_id: str, alert_level: str, metrics: dict):
+        key = (organization_id, agent_id)
+        with self._lock:
+            previous = self.levels.get(key, 'GREEN')
+            if previous == alert_level:
+                return
+            self.levels[key] = alert_level
+            # Queue under the lock so concurrent transitions for one agent
+            # reach the writer in the order they were recorded
+            self.raise_event(organization_id, agent_id, alert_level, f"{previous} → {alert_level}", metrics)
+    
+    def raise_event(self, organization_id: int, agent_id: str, alert_level: str,
+                    message: str, metrics: dict):
+        """Queue an alert event for persistence and delivery"""
+        self.writer.put({
+            'organization_id': organization_id,
+            'agent_id': agent_id,
+            'alert_level': alert_level,
+            'message': message,
+            'metrics': metrics
+        })
+    
+    def _persist(self, events: list):
+        self.db.store_alerts(events)
+        for e in events:
+            self.manager.send_alert(
+                e['alert_level'], e['message'], e['metrics'],
+                org=e['organization_id'], agent=e['agent_id']
+            )
+
+
+alert_tracker = AlertTracker(db, alert_manager)
+
+# An agent that hasn't reported for this long no longer counts toward the
+# tier's agent cap or the org-wide views
+AGENT_LIVE_SECONDS = float(os.environ.get('AGENT_LIVE_SECONDS', 3600))
+
+# Org-wide aggregates, triage ranking and correlated-decline detection,
+# seeded from the last stored sample of every agent
+fleet = FleetRollup(live_seconds=AGENT_LIVE_SECONDS)
+worst_agents = WorstAgentIndex(live_seconds=AGENT_LIVE_SECONDS)
+correlation = CorrelationEngine(
+    window=float(os.environ.get('CORRELATION_WINDOW_SECONDS', 60)),
+    min_agents=int(os.environ.get('CORRELATION_MIN_AGENTS', 5))
+)
+_latest = db.get_latest_metrics()
+fleet.rebuild(_latest, time.time())
+worst_agents.rebuild(_latest, time.time())
+correlation.rebuild(_latest, time.time())
+del _latest
+
+# Set by enable_worker_mode(): metric rows are queued and written in
+# batches instead of one transaction per request.
+metrics_writer = None
+
+
+def enable_worker_mode(batch_size: int = 1000, flush_interval: float = 0.05):
+    """
+    Configure this process as one of several saas_server workers sharing
+    the database: cross-process write lock plus batched metric inserts.
+    """
+    global metrics_writer
+    db.enable_shared_writes()
+    metrics_writer = BatchWriter(
+        write_metric_rows, batch_size=batch_size,
+        flush_interval=flush_interval, name='metrics-writer'
+    )
+
+
+def shutdown():
+    """Drain queued metric rows and alert events before exiting"""
+    if metrics_writer is not None:
+        metrics_writer.close()
+    alert_tracker.writer.close()
+    alert_manager.close()
+    db.flush_metrics()
+
+
+def write_metric_rows(items: list):
+    """Write queued (organization_id, agent_id, db_metrics) items, one transaction per org"""
+    by_org = {}
+    for org_id, agent_id, db_metrics in items:
+        by_org.setdefault(org_id, []).append((agent_id, db_metrics))
+    for org_id, rows in by_org.items():
+        db.store_metrics_batch(rows, organization_id=org_id)
+
+
+def store_rows(organization_id: int, rows: list):
+    """Persist (agent_id, db_metrics) rows, through the batch writer if enabled"""
+    if metrics_writer is not None:
+        for agent_id, db_metrics in rows:
+            metrics_writer.put((organization_id, agent_id, db_metrics))
+    elif len(rows) == 1:
+        db.store_metrics(*rows[0], organization_id=organization_id)
+    else:
+        db.store_metrics_batch(rows, organization_id=organization_id)
+
+
+def observe_sample(organization_id: int, agent_id: str, result: dict, db_metrics: dict):
+    """In-memory state updates for one processed sample"""
+    with timing.stage("api.alerts"):
+        alert_tracker.observe(
+            organization_id, agent_id, result['alert_level'],
+            dict(db_metrics, margin=result['recovery_margin'])
+        )
+    now = time.time()
+    with timing.stage("api.fleet"):
+        fleet.observe(organization_id, agent_id, result['coherence'], result['alert_level'], now)
+        worst_agents.observe(organization_id, agent_id, result['recovery_margin'], now)
+        event = correlation.observe(organization_id, agent_id, result['coherence'], now)
+    if event:
+        raise_fleet_event(organization_id, event)
+
+
+def raise_fleet_event(organization_id: int, event: dict):
+    """Queue an organization-wide alert event from the correlation engine"""
+    alert_tracker.raise_event(
+        organization_id, FLEET_AGENT_ID, event['alert_level'], event['message'], event['metrics']
+    )
+
+
+class OrgCache:
+    """
+    api_key -> organization record, re-read from the database once it is
+    older than ttl seconds (tier changes and deactivation apply within ttl).
+    Unknown keys are not cached.
+    """
+    
+    def __init__(self, database, ttl: float = 60.0):
+        self.db = database
+        self.ttl = ttl
+        self.entries = {}
+    
+    def get(self, api_key: str):
+        entry = self.entries.get(api_key)
+        now = time.monotonic()
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        
+        org = self.db.verify_api_key(api_key)
+        if org:
+            self.entries[api_key] = (org, now)
+        else:
+            self.entries.pop(api_key, None)
+        return org
+
+
+org_cache = OrgCache(db, ttl=float(os.environ.get('ORG_CACHE_SECONDS', 60)))
+
+
+class AgentDirectory:
+    """
+    Which agent_ids belong to which organization, for the ingestion path.
+    
+    Known (organization_id, agent_id) pairs are kept in memory; misses go
+    to the database in one query per request (agents registered through
+    another worker process). Unknown ids are not cached.
+    """
+    
+    def __init__(self, database):
+        self.db = database
+        self.known = set()
+    
+    def add(self, organization_id: int, agent_id: str):
+        self.known.add((organization_id, agent_id))
+    
+    def unknown(self, organization_id: int, agent_ids: list) -> list:
+        """agent_ids not registered to organization_id"""
+        missing = [a for a in agent_ids if (organization_id, a) not in self.known]
+        if not missing:
+            return []
+        
+        owned = self.db.owned_agents(organization_id, missing)
+        for agent_id in owned:
+            self.add(organization_id, agent_id)
+        return [a for a in missing if a not in owned]
+
+
+agent_directory = AgentDirectory(db)
+
+
+# Per-tier ingest quotas; RECOVERY_RATE_LIMITS=0 turns enforcement off
+# (load tests against a local server)
+rate_limiter = RateLimiter() if os.environ.get('RECOVERY_RATE_LIMITS', '1') != '0' else None
+
+
+def rate_limited(agent_ids: list, unknown: int = 0):
+    """429 response when the organization or an agent is over its tier's rate, else None"""
+    if rate_limiter is None:
+        return None
+    
+    org = request.organization
+    with timing.stage("api.rate_limit"):
+        retry_after = rate_limiter.acquire(org['id'], org['tier'], agent_ids, unknown)
+    if not retry_after:
+        return None
+    
+    if math.isinf(retry_after):
+        return jsonify({'error': f"Batch exceeds the per-request quota of the {org['tier']} tier"}), 413
+    
+    response = jsonify({'error': 'Rate limit exceeded', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def admit(agent_ids: list):
+    """
+    Error response for a metrics request, else None. Unknown agent_ids
+    are charged to the organization before the 403, so rotating ids is
+    rate limited like any other traffic.
+    """
+    with timing.stage("api.agents"):
+        unknown = agent_directory.unknown(request.organization['id'], agent_ids)
+    
+    known = agent_ids
+    if unknown:
+        rejected = set(unknown)
+        known = [a for a in agent_ids if a not in rejected]
+    limited = rate_limited(known, len(agent_ids) - len(known))
+    if limited:
+        return limited
+    
+    if unknown:
+        return jsonify({'error': 'Unknown agent_id for this organization', 'agent_ids': unknown[:10]}), 403
+    return None
+
+
 def require_api_key(f):
     """Decorator to require valid API key"""
     @wraps(f)
@@ -28,7 +304,7 @@ def require_api_key(f):
         if not api_key:
             return jsonify({'error': 'API key required'}), 401
         
-        org = db.verify_api_key(api_key)
+        org = org_cache.get(api_key)
         if not org:
             return jsonify({'error': 'Invalid API key'}), 403
         
@@ -77,11 +353,29 @@ def register_agent():
     if not data.get('hostname'):
         return jsonify({'error': 'Hostname required'}), 400
     
+    # Re-registering a known hostname (agent restart) returns its id
+    agent_id = db.find_agent(request.organization['id'], data['hostname'])
+    if agent_id:
+        return jsonify({
+            'agent_id': agent_id,
+            'hostname': data['hostname'],
+            'message': 'Agent already registered'
+        }), 200
+    
+    # Only agents seen recently count toward the cap, so retired hosts free their slot
+    cap = limits_for(request.organization['tier']).agents
+    if cap is not None and db.count_live_agents(request.organization['id'], AGENT_LIVE_SECONDS) >= cap:
+        return jsonify({
+            'error': f"Agent limit reached: the {request.organization['tier']} tier allows {cap} agents"
+        }), 403
+    
     agent_id = db.register_agent(
         organization_id=request.organization['id'],
         hostname=data['hostname']
     )
     
+    agent_directory.add(request.organization['id'], agent_id)
+    
     return jsonify({
         'agent_id': agent_id,
         'hostname': data['hostname'],
@@ -89,15 +383,8 @@ def register_agent():
     }), 201
 
 
-@app.route('/api/v1/metrics', methods=['POST'])
-@require_api_key
-def submit_metrics():
-    """Submit metrics from agent"""
-    data = request.json
-    
-    if not data.get('agent_id'):
-        return jsonify({'error': 'Agent ID required'}), 400
-    
+def process_sample(data: dict):
+    """Coherence + detection for one agent sample; returns (result, db_metrics)"""
     # Extract system metrics
     metrics = {
         'cpu_usage': data.get('cpu_usage', 0),
@@ -108,11 +395,12 @@ def submit_metrics():
     }
     
     # Compute coherence and detection
-    C = compute_coherence_from_pod_metrics(metrics)
-    beta = compute_stress_factor(metrics)
-    margin_result, alert_level = detector.update(C, beta)
+    with timing.stage("api.coherence"):
+        C = compute_coherence_from_pod_metrics(metrics)
+        beta = compute_stress_factor(metrics)
+    with timing.stage("api.detect"):
+        margin_result, alert_level = detector.update(C, beta)
     
-    # Store in database
     db_metrics = {
         'coherence': C,
         'recovery_margin': margin_result.recovery_margin,
@@ -122,12 +410,72 @@ def submit_metrics():
         'error_rate': metrics['error_rate']
     }
     
-    db.store_metrics(data['agent_id'], db_metrics)
-    
-    return jsonify({
+    result = {
         'coherence': C,
         'recovery_margin': margin_result.recovery_margin,
-        'alert_level': alert_level,
+        'alert_level': alert_level
+    }
+    return result, db_metrics
+
+
+@app.route('/api/v1/metrics', methods=['POST'])
+@timing.timed('api.submit_metrics')
+@require_api_key
+def submit_metrics():
+    """Submit metrics from agent"""
+    data = request.json
+    
+    if not data.get('agent_id'):
+        return jsonify({'error': 'Agent ID required'}), 400
+    
+    refused = admit([data['agent_id']])
+    if refused:
+        return refused
+    
+    result, db_metrics = process_sample(data)
+    
+    # Store in database
+    with timing.stage("api.store"):
+        store_rows(request.organization['id'], [(data['agent_id'], db_metrics)])
+    
+    observe_sample(request.organization['id'], data['agent_id'], result, db_metrics)
+    
+    return jsonify(dict(result, message='Metrics processed successfully'))
+
+
+@app.route('/api/v1/metrics/batch', methods=['POST'])
+@require_api_key
+def submit_metrics_batch():
+    """Submit samples from many agents in one request (single transaction)"""
+    data = request.json
+    samples = data.get('samples') if data else None
+    
+    if not isinstance(samples, list) or not samples:
+        return jsonify({'error': 'samples list required'}), 400
+    if any(not s.get('agent_id') for s in samples):
+        return jsonify({'error': 'Agent ID required for every sample'}), 400
+    
+    refused = admit([s['agent_id'] for s in samples])
+    if refused:
+        return refused
+    
+    org_id = request.organization['id']
+    results = []
+    rows = []
+    for sample in samples:
+        result, db_metrics = process_sample(sample)
+        rows.append((sample['agent_id'], db_metrics))
+        results.append(dict(result, agent_id=sample['agent_id']))
+    
+    with timing.stage("api.store_batch"):
+        store_rows(org_id, rows)
+    
+    for (agent_id, db_metrics), result in zip(rows, results):
+        observe_sample(org_id, agent_id, result, db_metrics)
+    
+    return jsonify({
+        'results': results,
+        'count': len(results),
         'message': 'Metrics processed successfully'
     })
 
@@ -145,6 +493,84 @@ def list_agents():
     })
 
 
+@app.route('/api/v1/agents/summary', methods=['GET'])
+@require_api_key
+def agents_summary():
+    """Org-wide health: agents per alert level, mean/min coherence, degrading count"""
+    return jsonify(dict(
+        fleet.summary(request.organization['id']),
+        organization=request.organization['name']
+    ))
+
+
+@app.route('/api/v1/agents/worst', methods=['GET'])
+@require_api_key
+def worst_agents_endpoint():
+    """Agents with the lowest recovery margin (?by=margin) or soonest forecast RED (?by=time_to_red)"""
+    k = max(1, min(request.args.get('k', 10, type=int), 1000))
+    by = request.args.get('by', 'margin')
+    if by not in RANKINGS:
+        return jsonify({'error': f"by must be one of {', '.join(RANKINGS)}"}), 400
+    
+    agents = worst_agents.worst(request.organization['id'], k, by)
+    
+    return jsonify({
+        'agents': agents,
+        'count': len(agents),
+        'by': by
+    })
+
+
+@app.route('/api/v1/agents/correlation', methods=['GET'])
+@require_api_key
+def agents_correlation():
+    """Fleet-wide co-movement of coherence: current window, baseline, recent windows"""
+    status, event = correlation.status(request.organization['id'])
+    if event:
+        # The window ended with no sample to close it
+        raise_fleet_event(request.organization['id'], event)
+    return jsonify(status)
+
+
+@app.route('/api/v1/alerts', methods=['GET'])
+@require_api_key
+def list_alerts():
+    """List recent alert transitions for organization"""
+    acknowledged = request.args.get('acknowledged')
+    if acknowledged is not None:
+        acknowledged = acknowledged.lower() in ('1', 'true', 'yes')
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    
+    alerts = db.get_alerts(request.organization['id'], acknowledged, limit)
+    
+    return jsonify({
+        'alerts': alerts,
+        'count': len(alerts)
+    })
+
+
+@app.route('/api/v1/alerts/<int:alert_id>/acknowledge', methods=['POST'])
+@require_api_key
+def acknowledge_alert(alert_id):
+    """Acknowledge an alert"""
+    if not db.acknowledge_alert(request.organization['id'], alert_id):
+        return jsonify({'error': 'Alert not found'}), 404
+    
+    return jsonify({
+        'id': alert_id,
+        'acknowledged': True
+    })
+
+
+@app.route('/api/v1/debug/timings', methods=['GET'])
+@require_api_key
+def debug_timings():
+    """Stage timing histograms (only when RECOVERY_TIMING is enabled)"""
+    if not timing.ENABLED:
+        return jsonify({'error': 'Timing disabled (set RECOVERY_TIMING=1)'}), 404
+    return jsonify(timing.snapshot())
+
+
 @app.route('/api/v1/dashboard/<agent_id>', methods=['GET'])
 @require_api_key
 def get_dashboard_data(agent_id):
@@ -161,6 +587,7 @@ if __name__ == '__main__':
     
     # Initialize database
     db.init_db()
+    timing.install_from_env()
     
     # Get port from environment variable (Railway sets this)
     port = int(os.environ.get('PORT', 8000))
@@ -175,4 +602,7 @@ if __name__ == '__main__':
     print()
     
     # Run with production settings
-    app.run(host=host, port=port, debug=False)
\ No newline at end of file
+    try:
+        app.run(host=host, port=port, debug=False)
+    finally:
+        shutdown()
\ No newline at end of file
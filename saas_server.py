@@ -0,0 +1,290 @@
+"""
+saas_server.py
+
+Production server for the SaaS API: pre-started worker processes with
+organization affinity.
+
+The parent process owns the listening socket. For every new connection
+it peeks (MSG_PEEK, nothing is consumed) at the request headers, hashes
+the X-API-Key to pick a worker and passes the connected socket to that
+worker over a Unix socket (SCM_RIGHTS). Each worker runs saas_api's Flask
+app on a threaded WSGI server. Because every request of an organization
+lands on the same worker, the in-memory per-organization state (alert
+level transitions, dedup cooldowns, digests, fleet rollups and rankings,
+correlation windows, rate-limit buckets) stays consistent without a
+shared store. Connections without an API key are spread round-robin.
+
+A connection still sending its headers waits in the selector with
+SO_RCVLOWAT set just above what was already peeked, so the parent wakes
+only when more bytes arrive. One that hasn't sent a complete header block
+within HEADER_TIMEOUT gets a 408 and is closed.
+
+Routing looks only at a connection's first request, so workers answer
+with HTTP/1.0 semantics and close every connection after one response:
+a proxy that pools keep-alive connections across organizations can't
+carry organization B's request to organization A's worker.
+
+A worker that died is restarted from the serve loop, never from inside
+the accept path; connections routed to it meanwhile are held and handed
+to its replacement.
+
+Workers share the SQLite database in WAL mode; metric rows are batched
+per worker and written under a cross-process file lock (see
+saas_api.enable_worker_mode).
+
+Environment: PORT, HOST, WEB_CONCURRENCY (workers, default CPU count).
+Unix only (socket.send_fds); use `python saas_api.py` elsewhere.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+
+MAX_HEADER_BYTES = 16384
+HEADER_TIMEOUT = 5.0
+
+
+def affinity_key(head: bytes):
+    """X-API-Key header value from a raw request head, or None"""
+    for line in head.split(b'\r\n')[1:]:
+        if not line:
+            break
+        name, _, value = line.partition(b':')
+        if name.strip().lower() == b'x-api-key':
+            return value.strip()
+    return None
+
+
+def worker_main(channel: socket.socket, index: int):
+    """Serve connections handed over on `channel` until the parent closes it"""
+    root = Path(__file__).resolve().parent
+    os.chdir(root)
+    sys.path.insert(0, str(root))
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import saas_api
+
+    class OneRequestHandler(WSGIRequestHandler):
+        # HTTP/1.0: no keep-alive, the connection closes after each response
+        protocol_version = 'HTTP/1.0'
+
+    saas_api.enable_worker_mode()
+    saas_api.timing.install_from_env()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    # The server's own listener (loopback, ephemeral port) is never used;
+    # it only provides the request handler plumbing for process_request().
+    server = make_server('127.0.0.1', 0, saas_api.app, threaded=True,
+                         request_handler=OneRequestHandler)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    while True:
+        try:
+            msg, fds, _, _ = socket.recv_fds(channel, 256, 1)
+        except OSError:
+            break
+        if not fds:
+            break
+        host, _, port = msg.decode().rpartition(':')
+        conn = socket.socket(fileno=fds[0])
+        conn.setblocking(True)
+        server.process_request(conn, (host, int(port or 0)))
+
+    saas_api.shutdown()
+
+
+class Worker:
+    def __init__(self, index: int, ctx):
+        self.index = index
+        self.channel, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.proc = ctx.Process(target=worker_main, args=(child, index), name=f'worker-{index}')
+        self.proc.start()
+        child.close()
+
+    def send(self, conn: socket.socket, addr) -> bool:
+        try:
+            socket.send_fds(self.channel, [f"{addr[0]}:{addr[1]}".encode()], [conn.fileno()])
+            return True
+        except OSError:
+            return False
+
+    def stop(self, timeout: float = 10.0):
+        self.channel.close()
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+
+
+class PreforkServer:
+    """Accept loop routing connections to workers by API key"""
+
+    def __init__(self, host: str, port: int, workers: int):
+        self.host = host
+        self.port = port
+        self.ctx = multiprocessing.get_context('spawn')
+        self.workers = [Worker(i, self.ctx) for i in range(workers)]
+        self.round_robin = itertools.cycle(range(workers))
+        self.selector = selectors.DefaultSelector()
+        self.waiting = {}   # conn -> addr while headers arrive
+        self.deadlines = deque()    # (deadline, conn) in accept order
+        self.pending = {}   # worker index -> [(conn, addr)] held until it is restarted
+        self.running = True
+
+        self.listener = socket.create_server((host, port), backlog=1024)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+    def pick(self, key) -> Worker:
+        if key is None:
+            return self.workers[next(self.round_robin)]
+        return self.workers[zlib.crc32(key) % len(self.workers)]
+
+    def dispatch(self, conn, addr, key):
+        worker = self.pick(key)
+        if worker.index in self.pending or not worker.send(conn, addr):
+            # Held until serve_forever restarts the worker
+            self.pending.setdefault(worker.index, []).append((conn, addr))
+            return
+        conn.close()
+
+    def respawn(self, index: int):
+        old = self.workers[index]
+        old.channel.close()
+        if old.proc.is_alive():
+            old.proc.terminate()
+        print(f"[server] worker {index} exited ({old.proc.exitcode}), restarting")
+        # Reaps exited workers without waiting on them
+        multiprocessing.active_children()
+        worker = self.workers[index] = Worker(index, self.ctx)
+        for conn, addr in self.pending.pop(index, ()):
+            worker.send(conn, addr)
+            conn.close()
+
+    def _forget(self, conn):
+        if self.waiting.pop(conn, None) is not None:
+            self.selector.unregister(conn)
+
+    def peek(self, conn, addr):
+        """Dispatch (or close) once the header block is in, else wait for more bytes"""
+        try:
+            head = conn.recv(MAX_HEADER_BYTES, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            head = None
+        except OSError:
+            self._forget(conn)
+            conn.close()
+            return
+        if head == b'':
+            # Client closed before sending a request
+            self._forget(conn)
+            conn.close()
+            return
+
+        if head is not None and (b'\r\n\r\n' in head or len(head) >= MAX_HEADER_BYTES):
+            if conn in self.waiting:
+                # The worker reads from the same socket
+                conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVLOWAT, 1)
+                self._forget(conn)
+            self.dispatch(conn, addr, affinity_key(head))
+            return
+
+        # Peeked bytes keep the socket readable; wake only once more arrive
+        conn.setsockopt(socket.SOL_SOCKET, socket.SO_RCVLOWAT, len(head or b'') + 1)
+        if conn not in self.waiting:
+            self.waiting[conn] = addr
+            self.deadlines.append((time.monotonic() + HEADER_TIMEOUT, conn))
+            self.selector.register(conn, selectors.EVENT_READ, addr)
+
+    def accept(self):
+        while True:
+            try:
+                conn, addr = self.listener.accept()
+            except BlockingIOError:
+                return
+            self.peek(conn, addr)
+
+    def drop_slow_clients(self):
+        """408 and close connections whose headers missed HEADER_TIMEOUT"""
+        now = time.monotonic()
+        while self.deadlines and self.deadlines[0][0] <= now:
+            _, conn = self.deadlines.popleft()
+            if conn not in self.waiting:
+                continue
+            self._forget(conn)
+            try:
+                conn.send(b'HTTP/1.0 408 Request Timeout\r\nConnection: close\r\n\r\n',
+                          socket.MSG_DONTWAIT)
+            except OSError:
+                pass
+            conn.close()
+
+    def serve_forever(self):
+        print(f"[server] {len(self.workers)} workers on {self.host}:{self.port}")
+        while self.running:
+            timeout = 1.0
+            if self.deadlines:
+                timeout = min(timeout, max(0.0, self.deadlines[0][0] - time.monotonic()))
+            for key, _ in self.selector.select(timeout):
+                if key.fileobj is self.listener:
+                    self.accept()
+                else:
+                    self.peek(key.fileobj, key.data)
+            self.drop_slow_clients()
+
+            for worker in self.workers:
+                if self.running and (worker.index in self.pending or not worker.proc.is_alive()):
+                    self.respawn(worker.index)
+
+    def stop(self, *_):
+        self.running = False
+
+    def close(self):
+        self.selector.close()
+        self.listener.close()
+        for conn in self.waiting:
+            conn.close()
+        for held in self.pending.values():
+            for conn, _ in held:
+                conn.close()
+        for worker in self.workers:
+            worker.stop()
+
+
+def main():
+    port = int(os.environ.get('PORT', 8000))
+    host = os.environ.get('HOST', '0.0.0.0')
+    workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+
+    # Switch the database to WAL once, before any worker opens it
+    from src.models import open_database
+    open_database().enable_shared_writes()
+
+    print("=" * 60)
+    print("Recovery Watchdog SaaS API Starting (prefork)")
+    print("=" * 60)
+    print(f"Host: {host}")
+    print(f"Port: {port}")
+    print(f"Workers: {workers}")
+    print("=" * 60)
+    print()
+
+    server = PreforkServer(host, port, workers)
+    signal.signal(signal.SIGTERM, server.stop)
+    signal.signal(signal.SIGINT, server.stop)
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
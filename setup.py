@@ -6,6 +6,9 @@ setup(
     description="Recovery Debt Detector — tamper-evident resilience failure early warning",
     package_dir={"": "src"},
     packages=find_packages("src"),
+    entry_points={
+        "console_scripts": ["recovery=recovery.cli:main"],
+    },
     install_requires=[
         "cryptography>=41.0.0",
         "numpy>=1.24.0",
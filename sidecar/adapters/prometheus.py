@@ -2,7 +2,42 @@ import os
 import time
 import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from recovery.coherence import compute_coherence_from_pod_metrics
+
+
+# PromQL evaluated per poll, keyed by the metric name that
+# compute_coherence_from_pod_metrics expects. Every query aggregates
+# "by (pod)" so one response covers the whole cluster. Event counters
+# (5xx responses, restarts) fall back to an explicit 0 for running pods
+# with no such series, so a missing series always means missing data.
+_RUNNING_PODS = 'sum by (pod) (rate(container_cpu_usage_seconds_total{container!=""}[1m])) * 0'
+
+DEFAULT_QUERIES = {
+    "cpu_usage": (
+        'sum by (pod) (rate(container_cpu_usage_seconds_total{container!=""}[1m])) * 100'
+    ),
+    "mem_usage": (
+        '100 * sum by (pod) (container_memory_working_set_bytes{container!=""})'
+        ' / sum by (pod) (kube_pod_container_resource_limits{resource="memory"})'
+    ),
+    "error_rate": (
+        'sum by (pod) (rate(http_requests_total{status=~"5.."}[1m]))'
+        " or " + _RUNNING_PODS
+    ),
+    "response_p95": (
+        "histogram_quantile(0.95, sum by (pod, le) "
+        "(rate(http_request_duration_seconds_bucket[5m]))) * 1000"
+    ),
+    "restart_count": (
+        "sum by (pod) (increase(kube_pod_container_status_restarts_total[15m]))"
+        " or " + _RUNNING_PODS
+    ),
+}
 
 
 class PrometheusAdapter:
@@ -13,6 +48,17 @@ class PrometheusAdapter:
     - NEVER crash
     - Return None if unavailable
     - Support MOCK mode for pilots/demos
+
+    Two modes:
+    - single query (legacy): `query` is evaluated and every returned
+      series is averaged into one coherence value
+    - multi query: `queries` maps metric names to PromQL; all of them are
+      evaluated concurrently over one keep-alive session and every series
+      is folded into per-target metric dicts
+
+    A failed query makes the whole poll unavailable (None), and a target
+    missing any metric not listed in `optional` is left out. Absent
+    metrics are never filled in: coherence would score them as healthy.
     """
 
     def __init__(
@@ -20,42 +66,55 @@ class PrometheusAdapter:
         prometheus_url="http://localhost:9090",
         query="up",
         timeout=1.0,
+        queries=None,
+        target_label="pod",
+        optional=(),
     ):
         self.url = prometheus_url.rstrip("/")
         self.query = query
         self.timeout = timeout
+        self.queries = dict(queries) if queries else None
+        self.target_label = target_label
+        self.optional = frozenset(optional)
 
         # Enable mock mode via env var
         self.mock = os.getenv("MOCK_PROMETHEUS", "false").lower() == "true"
 
         self.log = logging.getLogger("prometheus-adapter")
 
+        # One pooled session shared by all workers: connections stay
+        # open between polls instead of a new TCP handshake per query.
+        workers = max(1, len(self.queries or ()))
+        self.session = requests.Session()
+        pool = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", pool)
+        self.session.mount("https://", pool)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="prometheus"
+        )
+
         if self.mock:
             self.log.warning("MOCK_PROMETHEUS enabled — using simulated signal")
 
-    def get_coherence(self):
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+    # =========================
+    # LOW LEVEL
+    # =========================
+    def _query(self, promql):
         """
+        Evaluate one instant query.
+
         Returns:
-            float in [0,1]  -> coherence
-            None            -> metrics unavailable (SAFE)
+            list of result series -> success (may be empty)
+            None                  -> Prometheus unavailable
         """
-
-        # =========================
-        # MOCK MODE (DEMO / PILOT)
-        # =========================
-        if self.mock:
-            # Smooth decay with noise (looks realistic on charts)
-            base = max(0.0, 1.0 - (time.time() % 60) / 80.0)
-            noise = random.uniform(-0.02, 0.02)
-            return max(0.0, min(1.0, base + noise))
-
-        # =========================
-        # REAL PROMETHEUS MODE
-        # =========================
         try:
-            resp = requests.get(
+            resp = self.session.get(
                 f"{self.url}/api/v1/query",
-                params={"query": self.query},
+                params={"query": promql},
                 timeout=self.timeout,
             )
 
@@ -67,18 +126,247 @@ class PrometheusAdapter:
             if data.get("status") != "success":
                 return None
 
-            result = data.get("data", {}).get("result", [])
-            if not result:
-                return 0.0  # Prometheus up, no targets
+            return data.get("data", {}).get("result", [])
 
-            # Extract numeric value
-            value = float(result[0]["value"][1])
+        except Exception as e:
+            # HARD RULE: NEVER CRASH
+            self.log.warning("Prometheus unavailable (%s)", str(e))
+            return None
+
+    def _query_range(self, promql, start, end, step):
+        """
+        Evaluate one range query.
+
+        Returns:
+            list of matrix series -> success (may be empty)
+            None                  -> Prometheus unavailable
+        """
+        try:
+            resp = self.session.get(
+                f"{self.url}/api/v1/query_range",
+                params={"query": promql, "start": start, "end": end, "step": step},
+                timeout=max(self.timeout, 10.0),
+            )
 
-            # Normalize -> coherence
-            # "up" metric: 1 = healthy, 0 = down
-            return max(0.0, min(1.0, value))
+            if resp.status_code != 200:
+                self.log.warning("Prometheus HTTP %s", resp.status_code)
+                return None
+
+            data = resp.json()
+            if data.get("status") != "success":
+                return None
+
+            return data.get("data", {}).get("result", [])
 
         except Exception as e:
-            # HARD RULE: NEVER CRASH
             self.log.warning("Prometheus unavailable (%s)", str(e))
             return None
+
+    def _target_of(self, series):
+        labels = series.get("metric", {})
+        return labels.get(self.target_label) or labels.get("instance") or "cluster"
+
+    def _complete(self, targets, names, warn=True):
+        """Targets that have every non-optional metric; the others are dropped"""
+        required = [n for n in names if n not in self.optional]
+        complete = {
+            target: metrics for target, metrics in targets.items()
+            if all(n in metrics for n in required)
+        }
+        if warn and len(complete) < len(targets):
+            self.log.warning(
+                "%d target(s) missing metrics, skipped: %s",
+                len(targets) - len(complete),
+                ", ".join(sorted(set(targets) - set(complete))[:10]),
+            )
+        return complete
+
+    # =========================
+    # MULTI TARGET
+    # =========================
+    def get_target_metrics(self):
+        """
+        Evaluate every configured query concurrently.
+
+        Returns:
+            {target: {metric_name: float}} -> one entry per series label
+            None                           -> metrics unavailable (SAFE)
+        """
+        if self.mock:
+            return {"mock": self._mock_metrics()}
+
+        queries = self.queries or DEFAULT_QUERIES
+        names = list(queries)
+        results = self._executor.map(self._query, [queries[n] for n in names])
+
+        targets = {}
+        for name, result in zip(names, results):
+            if result is None:
+                self.log.warning("Query for %s failed — metrics unavailable", name)
+                return None
+            for series in result:
+                try:
+                    value = float(series["value"][1])
+                except (KeyError, IndexError, TypeError, ValueError):
+                    continue
+                if value != value:  # NaN from empty histogram buckets
+                    continue
+                targets.setdefault(self._target_of(series), {})[name] = value
+
+        complete = self._complete(targets, names)
+        if targets and not complete:
+            return None     # series exist but none is whole: unavailable, not "no targets"
+        return complete
+
+    def get_target_coherence(self):
+        """
+        Returns:
+            {target: coherence} -> per target
+            None                -> metrics unavailable (SAFE)
+        """
+        targets = self.get_target_metrics()
+        if targets is None:
+            return None
+        return {
+            target: compute_coherence_from_pod_metrics(metrics)
+            for target, metrics in targets.items()
+        }
+
+    # =========================
+    # HISTORY
+    # =========================
+    def backfill(self, lookback_sec, step_sec=15.0, chunk_points=500):
+        """
+        Stream history through query_range, oldest sample first.
+
+        The window ends on the last step boundary and is fetched in pages
+        of at most `chunk_points` steps, so only one page of matrices is
+        held in memory at a time.
+
+        Yields:
+            (timestamp, {target: {metric_name: float}})
+        """
+        if self.mock or lookback_sec <= 0:
+            return
+
+        step = float(step_sec)
+        end = (time.time() // step) * step
+        start = end - (lookback_sec // step) * step
+        queries = self.queries or {"up": self.query}
+        names = list(queries)
+
+        page_start = start
+        while page_start <= end:
+            page_end = min(end, page_start + (chunk_points - 1) * step)
+            results = self._executor.map(
+                lambda promql, s=page_start, e=page_end: self._query_range(promql, s, e, step),
+                [queries[n] for n in names],
+            )
+
+            samples = {}
+            results = list(results)
+            if any(result is None for result in results):
+                # Same rule as get_target_metrics: a gap, not partial data
+                self.log.warning("Backfill page %.0f-%.0f unavailable", page_start, page_end)
+                results = []
+            for name, result in zip(names, results):
+                for series in result:
+                    target = self._target_of(series)
+                    for ts, raw in series.get("values", []):
+                        try:
+                            value = float(raw)
+                        except (TypeError, ValueError):
+                            continue
+                        if value != value:
+                            continue
+                        samples.setdefault(float(ts), {}).setdefault(target, {})[name] = value
+
+            partial = 0
+            for ts in sorted(samples):
+                targets = self._complete(samples[ts], names, warn=False)
+                partial += len(targets) < len(samples[ts])
+                if targets:
+                    yield ts, targets
+            if partial:
+                self.log.warning("Backfill: %d step(s) had targets missing metrics", partial)
+
+            page_start = page_end + step
+
+    def backfill_coherence(self, lookback_sec, step_sec=15.0, chunk_points=500):
+        """
+        Same as backfill(), reduced to the value get_coherence() would
+        have returned at each step.
+
+        Yields:
+            (timestamp, coherence)
+        """
+        for ts, targets in self.backfill(lookback_sec, step_sec, chunk_points):
+            if self.queries:
+                C = min(compute_coherence_from_pod_metrics(m) for m in targets.values())
+            else:
+                values = [m["up"] for m in targets.values()]
+                C = max(0.0, min(1.0, sum(values) / len(values)))
+            yield ts, C
+
+    # =========================
+    # SINGLE VALUE
+    # =========================
+    def get_coherence(self):
+        """
+        Returns:
+            float in [0,1]  -> coherence
+            None            -> metrics unavailable (SAFE)
+
+        In multi query mode this is the worst (lowest) target coherence.
+        """
+
+        # =========================
+        # MOCK MODE (DEMO / PILOT)
+        # =========================
+        if self.mock:
+            # Smooth decay with noise (looks realistic on charts)
+            base = max(0.0, 1.0 - (time.time() % 60) / 80.0)
+            noise = random.uniform(-0.02, 0.02)
+            return max(0.0, min(1.0, base + noise))
+
+        if self.queries:
+            per_target = self.get_target_coherence()
+            if per_target is None:
+                return None
+            if not per_target:
+                return 0.0  # Prometheus up, no targets
+            return min(per_target.values())
+
+        # =========================
+        # REAL PROMETHEUS MODE
+        # =========================
+        result = self._query(self.query)
+        if result is None:
+            return None
+        if not result:
+            return 0.0  # Prometheus up, no targets
+
+        # Extract numeric values from every series
+        values = []
+        for series in result:
+            try:
+                values.append(float(series["value"][1]))
+            except (KeyError, IndexError, TypeError, ValueError):
+                continue
+        if not values:
+            return None
+
+        # Normalize -> coherence
+        # "up" metric: 1 = healthy, 0 = down -> fraction of targets up
+        return max(0.0, min(1.0, sum(values) / len(values)))
+
+    def _mock_metrics(self):
+        C = self.get_coherence()
+        load = (1.0 - C) * 100.0
+        return {
+            "cpu_usage": load,
+            "mem_usage": load,
+            "error_rate": 0.0,
+            "response_p95": 100.0,
+            "restart_count": 0,
+        }
@@ -1,38 +1,14 @@
 #!/usr/bin/env python3
+"""Render pilot.csv to watchdog_report.png; same as `recovery chart --pilot pilot.csv`."""
 
-import csv
-import matplotlib
-matplotlib.use('Agg')  # Fix for recursion issue
-import matplotlib.pyplot as plt
-from datetime import datetime
+import os
+import sys
 
-CSV_PATH = "pilot.csv"
-
-timestamps = []
-coherence = []
-margin = []
-
-with open(CSV_PATH, newline='') as f:
-    reader = csv.DictReader(f)
-    for row in reader:
-        timestamps.append(datetime.fromisoformat(row["timestamp"]))
-        coherence.append(float(row["coherence_C"]))
-        margin.append(float(row["recovery_margin"]))
+sys.path.insert(0, os.path.abspath("src"))
 
-fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+from recovery.cli import main
 
-ax1.plot(timestamps, coherence, 'b-', linewidth=2)
-ax1.axhline(0.6, linestyle="--", color="red", alpha=0.5)
-ax1.set_ylabel("Coherence C")
-ax1.grid(True, alpha=0.3)
-ax1.set_title("Recovery Watchdog - System Health")
-
-ax2.plot(timestamps, margin, 'orange', linewidth=2)
-ax2.axhline(0.0, linestyle="--", color="black", alpha=0.5)
-ax2.set_ylabel("Recovery Margin")
-ax2.set_xlabel("Time")
-ax2.grid(True, alpha=0.3)
+CSV_PATH = "pilot.csv"
 
-plt.tight_layout()
-plt.savefig("watchdog_report.png", dpi=150)
-print("Chart saved to: watchdog_report.png")
\ No newline at end of file
+if __name__ == "__main__":
+    main(["chart", "--pilot", CSV_PATH, "--output", "watchdog_report.png", *sys.argv[1:]])
@@ -26,13 +26,52 @@ class CSVExporter:
                     "alert_level",
                 ])
 
-    def write(self, C: float, margin: float, alert: str):
-        # Append one row
+    def write(self, C: float, margin: float, alert: str, timestamp: float = None):
+        # Append one row (timestamp given as epoch seconds for replayed history)
+        if timestamp is None:
+            stamp = datetime.utcnow().isoformat()
+        else:
+            stamp = datetime.utcfromtimestamp(timestamp).isoformat()
         with open(self.path, "a", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow([
-                datetime.utcnow().isoformat(),
+                stamp,
                 round(C, 6),
                 round(margin, 6),
                 alert,
             ])
+
+
+class MultiplexedCSVExporter:
+    """
+    One CSV stream for many targets.
+    Each tick is appended with a single open/write, one row per target.
+    """
+
+    HEADER = [
+        "timestamp",
+        "target",
+        "coherence_C",
+        "recovery_margin",
+        "alert_level",
+    ]
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        self._ensure_file()
+
+    def _ensure_file(self):
+        if not os.path.exists(self.path):
+            with open(self.path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(self.HEADER)
+
+    def write_many(self, targets, C, margins, alerts, timestamp: float = None):
+        if timestamp is None:
+            stamp = datetime.utcnow().isoformat()
+        else:
+            stamp = datetime.utcfromtimestamp(timestamp).isoformat()
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(
+                [stamp, target, round(float(c), 6), round(float(m), 6), alert]
+                for target, c, m, alert in zip(targets, C, margins, alerts)
+            )
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Multi-target Recovery Watchdog.
+
+One process watches every pod/service Prometheus reports instead of one
+sidecar per pod. Per-target detector state lives in parallel NumPy arrays
+indexed by a slot number; each tick is one batched adapter poll, one
+vectorized detector pass and one multiplexed CSV append.
+
+Memory per target (documented budget):
+    coherence, margin         2 x float64   16 B
+    last_seen tick            int64          8 B
+    red_count                 uint16         2 B
+    alert code, triggered     2 x uint8      2 B
+    ------------------------------------------------
+    array state                             28 B
+    name string + slot dict entry       ~120-180 B (depends on name length)
+
+So 10,000 targets hold well under 2 MB of steady state. The per-tick
+metric dicts returned by the adapter (~1 KB per target) are transient.
+
+Targets not reported for TARGET_TTL_SEC (default 300 s) release their
+slot, which the next new target reuses, so pod churn doesn't grow the
+table: its size follows the number of targets seen within one TTL.
+
+Every target is scored with the constant stress factor BETA, the same
+policy as the single-target sidecar (whose adapter only reports
+coherence), so a pod gets the same alert level in either mode.
+"""
+
+import os
+import sys
+import time
+import logging
+
+import numpy as np
+
+# Ensure local imports work
+sys.path.insert(0, os.path.abspath("."))
+
+from sidecar.adapters.prometheus import PrometheusAdapter, DEFAULT_QUERIES
+from sidecar.exporter import MultiplexedCSVExporter
+from recovery.coherence import compute_coherence_from_pod_metrics
+from recovery.detector import RecoveryDebtDetector, ALERT_LEVELS
+from recovery import timing
+
+
+class TargetTable:
+    """
+    Slot-indexed per-target state in compact arrays.
+    Slots are assigned on first sighting and released by expire(); free
+    slots are reused before the arrays grow (by doubling).
+    """
+
+    FIELDS = (
+        ("coherence", np.float64, np.nan),
+        ("margin", np.float64, np.nan),
+        ("last_seen", np.int64, -1),
+        ("red_count", np.uint16, 0),
+        ("alert", np.uint8, 0),
+        ("triggered", np.bool_, False),
+    )
+
+    def __init__(self, capacity=1024):
+        self.names = []     # slot -> name, None while the slot is free
+        self.slots = {}
+        self.free = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        n = len(self.names)
+        for name, dtype, fill in self.FIELDS:
+            arr = np.full(capacity, fill, dtype=dtype)
+            if n:
+                arr[:n] = getattr(self, name)[:n]
+            setattr(self, name, arr)
+        self.capacity = capacity
+
+    def __len__(self):
+        return len(self.slots)
+
+    def slot(self, name):
+        slot = self.slots.get(name)
+        if slot is None:
+            if self.free:
+                slot = self.free.pop()
+                self.names[slot] = name
+            else:
+                slot = len(self.names)
+                if slot >= self.capacity:
+                    self._allocate(self.capacity * 2)
+                self.names.append(name)
+            self.slots[name] = slot
+        return slot
+
+    def expire(self, before_tick):
+        """Release the slots of targets last seen before before_tick; returns their names"""
+        n = len(self.names)
+        stale = np.flatnonzero(self.last_seen[:n] < before_tick)
+        expired = []
+        for slot in stale.tolist():
+            name = self.names[slot]
+            if name is None:
+                continue
+            expired.append(name)
+            del self.slots[name]
+            self.names[slot] = None
+            self.free.append(slot)
+        if expired:
+            freed = np.asarray(self.free[-len(expired):], dtype=np.intp)
+            for field, _, fill in self.FIELDS:
+                getattr(self, field)[freed] = fill
+            # Never stale while free, so later scans skip them
+            self.last_seen[freed] = np.iinfo(np.int64).max
+        return expired
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name, _, _ in self.FIELDS)
+
+
+class MultiTargetWatchdog:
+    """
+    Recovery Watchdog for many targets
+    - READ ONLY
+    - One batched poll per tick
+    - Per-target RED hysteresis
+    """
+
+    def __init__(self, adapter=None, detector=None, exporter=None):
+        # -------------------------
+        # CONFIG
+        # -------------------------
+        self.SLEEP_SECONDS = float(os.getenv("POLL_INTERVAL_SEC", "1.0"))
+        self.RED_THRESHOLD = 0.01
+        self.RED_COUNT_LIMIT = 5
+        self.BETA = 1.1
+        self.TARGET_TTL_TICKS = max(
+            1, int(float(os.getenv("TARGET_TTL_SEC", "300")) / self.SLEEP_SECONDS)
+        )
+
+        # -------------------------
+        # LOGGING
+        # -------------------------
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s [%(levelname)s] %(message)s",
+        )
+        self.log = logging.getLogger("watchdog-multi")
+
+        self.adapter = adapter or PrometheusAdapter(
+            prometheus_url=os.getenv("PROMETHEUS_URL", "http://localhost:9090"),
+            queries=DEFAULT_QUERIES,
+            target_label=os.getenv("TARGET_LABEL", "pod"),
+        )
+        self.detector = detector or RecoveryDebtDetector(beta_base=self.BETA)
+        self.exporter = exporter or MultiplexedCSVExporter("pilot_multi.csv")
+
+        self.table = TargetTable()
+        self.tick = 0
+
+        self.log.info("Multi-target Recovery Watchdog started (READ-ONLY MODE)")
+
+    def step(self, timestamp=None):
+        with timing.stage("multi.collect"):
+            targets = self.adapter.get_target_metrics()
+
+        if targets is None:
+            self.log.warning("No metrics available — skipping tick")
+            return
+        if not targets:
+            return
+
+        self.tick += 1
+        table = self.table
+
+        n = len(targets)
+        idx = np.empty(n, dtype=np.intp)
+        C = np.empty(n, dtype=np.float64)
+        names = list(targets)
+
+        with timing.stage("multi.coherence"):
+            for i, name in enumerate(names):
+                metrics = targets[name]
+                idx[i] = table.slot(name)
+                C[i] = compute_coherence_from_pod_metrics(metrics)
+
+        with timing.stage("multi.detect"):
+            margins, codes = self.detector.update_many(C, self.BETA)
+
+        # state
+        table.coherence[idx] = C
+        table.margin[idx] = margins
+        table.alert[idx] = codes
+        table.last_seen[idx] = self.tick
+
+        # per-target hysteresis
+        red = margins <= self.RED_THRESHOLD
+        counts = table.red_count[idx]
+        counts = np.where(red, np.minimum(counts.astype(np.int64) + 1, 0xFFFF), 0)
+        table.red_count[idx] = counts
+
+        fired = idx[(counts >= self.RED_COUNT_LIMIT) & ~table.triggered[idx]]
+        if fired.size:
+            table.triggered[fired] = True
+            self.trigger_action([table.names[s] for s in fired])
+
+        # output
+        with timing.stage("multi.export"):
+            self.exporter.write_many(
+                names, C, margins, [ALERT_LEVELS[c] for c in codes], timestamp=timestamp
+            )
+
+        expired = table.expire(self.tick - self.TARGET_TTL_TICKS)
+        if expired:
+            self.log.info("expired %d target(s) not seen for %d ticks", len(expired), self.TARGET_TTL_TICKS)
+
+        counts_by_level = np.bincount(codes, minlength=len(ALERT_LEVELS))
+        self.log.info(
+            "tick=%d targets=%d green=%d yellow=%d red=%d",
+            self.tick, n, *counts_by_level,
+        )
+
+    def trigger_action(self, targets):
+        self.log.critical("=" * 60)
+        self.log.critical("PHASE CHANGE DETECTED on %d target(s)", len(targets))
+        for target in targets:
+            self.log.critical("  %s", target)
+        self.log.critical("READ-ONLY MODE — NO ACTION TAKEN")
+        self.log.critical("=" * 60)
+
+    def run(self):
+        profiler = timing.install_from_env()
+        while True:
+            profiler.tick()
+            self.step()
+            time.sleep(self.SLEEP_SECONDS)
+
+
+if __name__ == "__main__":
+    MultiTargetWatchdog().run()
@@ -3,15 +3,18 @@
 import os
 import sys
 import time
+import inspect
 import logging
 import signal
+from typing import Any, Callable, NamedTuple, Optional
 
 # Ensure local imports work
 sys.path.insert(0, os.path.abspath("."))
 
-from sidecar.adapters.prometheus import PrometheusAdapter
+from sidecar.adapters.prometheus import PrometheusAdapter, DEFAULT_QUERIES
 from sidecar.exporter import CSVExporter
-from recovery.detector import RecoveryDebtDetector
+from recovery.forecast import ForecastingDetector
+from recovery import timing
 
 
 def _coerce_float(x):
@@ -101,6 +104,92 @@ def _parse_detector_output(out):
     return margin, alert
 
 
+class DetectorResult(NamedTuple):
+    """Normalized detector output."""
+    margin: Optional[float]
+    alert: Any
+
+
+def _resolve_call(update, beta):
+    """
+    Pick the detector.update calling convention once, from its signature:
+    (C, beta), (C, *, beta=) or (C). Detectors that accept `now` (such as
+    ForecastingDetector) also get the sample timestamp.
+    """
+    try:
+        params = list(inspect.signature(update).parameters.values())
+    except (TypeError, ValueError):
+        return lambda C, now: update(C, beta)
+
+    if any(p.name == "now" for p in params):
+        return lambda C, now: update(C, beta, now=now)
+
+    if any(p.kind is p.VAR_POSITIONAL for p in params):
+        return lambda C, now: update(C, beta)
+
+    positional = [
+        p for p in params
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+    ]
+    if len(positional) >= 2:
+        return lambda C, now: update(C, beta)
+
+    if any(p.name == "beta" or p.kind is p.VAR_KEYWORD for p in params):
+        return lambda C, now: update(C, beta=beta)
+
+    return lambda C, now: update(C)
+
+
+def _generic_extract(out):
+    return DetectorResult(*_parse_detector_output(out))
+
+
+def _resolve_extract(out):
+    """
+    Build an extractor specialised to the shape of one sample output.
+    Falls back to the generic _parse_detector_output cascade for shapes
+    without a fast path.
+    """
+    if isinstance(out, tuple) and len(out) >= 2:
+        head, alert = out[0], out[1]
+        if isinstance(alert, str):
+            if hasattr(head, "recovery_margin"):
+                return lambda o: DetectorResult(float(o[0].recovery_margin), o[1])
+            if isinstance(head, (int, float)):
+                return lambda o: DetectorResult(float(o[0]), o[1])
+
+    if isinstance(out, dict) and "recovery_margin" in out and "alert_level" in out:
+        return lambda o: DetectorResult(float(o["recovery_margin"]), o["alert_level"])
+
+    return _generic_extract
+
+
+def bind_detector(detector, beta) -> Callable[..., DetectorResult]:
+    """
+    Bind detector.update into a single callable (C, now=None) -> DetectorResult.
+
+    The calling convention is resolved from the signature up front and the
+    output extractor is specialised on the first result, so the per-step
+    cost is one call plus a few attribute reads. If a later output no
+    longer fits the specialised shape, the generic parser takes over.
+    """
+    call = _resolve_call(detector.update, beta)
+    extract = None
+
+    def bound(C, now=None):
+        nonlocal extract
+        out = call(C, time.time() if now is None else now)
+        if extract is None:
+            extract = _resolve_extract(out)
+        try:
+            return extract(out)
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+            extract = _generic_extract
+            return _generic_extract(out)
+
+    return bound
+
+
 class RecoveryWatchdog:
     """
     Recovery Watchdog
@@ -111,7 +200,7 @@ class RecoveryWatchdog:
     - Pilot safe
     """
 
-    def __init__(self):
+    def __init__(self, adapter=None, detector=None, exporter=None):
         # -------------------------
         # CONFIG
         # -------------------------
@@ -120,6 +209,8 @@ class RecoveryWatchdog:
         self.RED_THRESHOLD = 0.01
         self.RED_COUNT_LIMIT = 5
         self.BETA = 1.1
+        self.BACKFILL_SECONDS = float(os.getenv("BACKFILL_SECONDS", "0"))
+        self.BACKFILL_STEP_SECONDS = float(os.getenv("BACKFILL_STEP_SECONDS", "15"))
 
         # -------------------------
         # LOGGING
@@ -133,20 +224,32 @@ class RecoveryWatchdog:
         # -------------------------
         # ADAPTER
         # -------------------------
-        self.adapter = PrometheusAdapter(
-            prometheus_url=os.getenv("PROMETHEUS_URL", "http://localhost:9090"),
-            query="up",
-        )
+        # PROMETHEUS_MULTI_QUERY=true evaluates the cpu/mem/error/latency/
+        # restart query set and tracks the worst target in the cluster.
+        if adapter is None:
+            multi = os.getenv("PROMETHEUS_MULTI_QUERY", "false").lower() == "true"
+            adapter = PrometheusAdapter(
+                prometheus_url=os.getenv("PROMETHEUS_URL", "http://localhost:9090"),
+                query="up",
+                queries=DEFAULT_QUERIES if multi else None,
+            )
+        self.adapter = adapter
 
         # -------------------------
         # DETECTOR
         # -------------------------
-        self.detector = RecoveryDebtDetector(beta_base=self.BETA)
+        # ForecastingDetector escalates GREEN -> YELLOW when the margin trend
+        # reaches RED within FORECAST_HORIZON_SECONDS.
+        self.detector = detector or ForecastingDetector(
+            beta_base=self.BETA,
+            warn_horizon=float(os.getenv("FORECAST_HORIZON_SECONDS", "900")),
+        )
+        self._detector_update = bind_detector(self.detector, self.BETA)
 
         # -------------------------
         # CSV EXPORT
         # -------------------------
-        self.exporter = CSVExporter("pilot.csv")
+        self.exporter = exporter or CSVExporter("pilot.csv")
 
         # -------------------------
         # INTERNAL STATE
@@ -156,38 +259,44 @@ class RecoveryWatchdog:
 
         self.log.info("Recovery Watchdog started (READ-ONLY MODE)")
 
-    def _detector_update(self, C):
-        """
-        Call detector.update with whatever signature it supports.
-        """
-        try:
-            # Try (C, beta)
-            return self.detector.update(C, self.BETA)
-        except TypeError:
-            try:
-                # Try (C, beta=)
-                return self.detector.update(C, beta=self.BETA)
-            except TypeError:
-                # Try (C)
-                return self.detector.update(C)
-
     def step(self):
-        C = self.adapter.get_coherence()
+        with timing.stage("sidecar.collect"):
+            C = self.adapter.get_coherence()
 
         if C is None:
             self.log.warning("No metrics available — skipping step")
             return
 
-        # detector
+        self._process(C)
+
+    def backfill(self, lookback_sec, step_sec=15.0):
+        """
+        Replay recent history from Prometheus before the live loop starts,
+        so the CSV and the detector's trend are already warm. Historical
+        RED runs are reported but never trigger an action: the hysteresis
+        counter starts from zero in live mode.
+        """
+        steps = 0
+        for ts, C in self.adapter.backfill_coherence(lookback_sec, step_sec):
+            self._process(C, timestamp=ts, live=False)
+            steps += 1
+
+        self.log.info(
+            f"Backfilled {steps} steps ({lookback_sec:.0f}s @ {step_sec:.0f}s) red={self.red_count}"
+        )
+        if self.red_count >= self.RED_COUNT_LIMIT:
+            self.log.warning("History ends inside a sustained RED phase")
+        self.red_count = 0
+
+    def _process(self, C, timestamp=None, live=True):
+        # detector (bound once in __init__, output already normalized)
         try:
-            out = self._detector_update(C)
+            with timing.stage("sidecar.detect"):
+                margin, alert = self._detector_update(C, timestamp)
         except Exception as e:
             self.log.error(f"Detector failed: {e}")
             return
 
-        # normalize output
-        margin, alert = _parse_detector_output(out)
-
         if margin is None:
             self.log.error("Detector output had no usable recovery_margin/margin")
             return
@@ -195,16 +304,20 @@ class RecoveryWatchdog:
         alert_level = alert if alert is not None else "UNKNOWN"
 
         # log (never format non-numeric)
-        self.log.info(
-            f"C={float(C):.3f} margin={float(margin):.3f} alert={alert_level} red={self.red_count}"
-        )
+        if live:
+            self.log.info(
+                "C=%.3f margin=%.3f alert=%s red=%d",
+                float(C), float(margin), alert_level, self.red_count,
+            )
 
         # csv
-        self.exporter.write(
-            C=float(C),
-            margin=float(margin),
-            alert=alert_level,
-        )
+        with timing.stage("sidecar.export"):
+            self.exporter.write(
+                C=float(C),
+                margin=float(margin),
+                alert=alert_level,
+                timestamp=timestamp,
+            )
 
         # phase tracking
         if margin <= self.RED_THRESHOLD:
@@ -212,7 +325,11 @@ class RecoveryWatchdog:
         else:
             self.red_count = 0
 
-        if self.red_count >= self.RED_COUNT_LIMIT and not self.phase_triggered:
+        if (
+            live
+            and self.red_count >= self.RED_COUNT_LIMIT
+            and not self.phase_triggered
+        ):
             self.phase_triggered = True
             self.trigger_action()
 
@@ -236,7 +353,13 @@ class RecoveryWatchdog:
             sys.exit(1)
 
     def run(self):
+        profiler = timing.install_from_env()
+
+        if self.BACKFILL_SECONDS > 0:
+            self.backfill(self.BACKFILL_SECONDS, self.BACKFILL_STEP_SECONDS)
+
         while True:
+            profiler.tick()
             self.step()
             time.sleep(self.SLEEP_SECONDS)
 
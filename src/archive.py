@@ -0,0 +1,250 @@
+"""
+archive.py
+
+Columnar daily archive of the metrics history.
+
+export_day() writes one sealed partition per organization and UTC day:
+
+    <root>/org_<id>/<YYYY-MM-DD>/
+        index.json          agents, row offsets per agent, columns, time range
+        timestamp.npy       float64 epoch seconds
+        coherence.npy       float64
+        recovery_margin.npy float64
+        cpu_usage.npy       float64
+        mem_usage.npy       float64
+        error_rate.npy      float64 (NaN = missing)
+        alert_level.npy     uint8 codes into ALERT_LEVELS, 255 = unknown
+
+Rows are sorted by (agent, timestamp), so each agent is one contiguous
+slice. Archive memory-maps the column files and answers aggregates with
+whole-array NumPy reductions, without copying the data into Python.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+from src.recovery.detector import ALERT_LEVELS
+
+UNKNOWN_LEVEL = 255
+FLOAT_COLUMNS = ('coherence', 'recovery_margin', 'cpu_usage', 'mem_usage', 'error_rate')
+COLUMNS = ('timestamp',) + FLOAT_COLUMNS + ('alert_level',)
+
+
+def _day_bounds(day: date):
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    return start.timestamp(), (start + timedelta(days=1)).timestamp()
+
+
+def _databases(db):
+    """The Database files behind db (every shard of a ShardedDatabase)"""
+    if hasattr(db, 'all_shards'):
+        return [db.shard(shard) for shard in db.all_shards()]
+    return [db]
+
+
+def _read_day(database, day: date) -> dict:
+    """organization_id -> list of (agent_id, sample dict) for one day"""
+    start, end = _day_bounds(day)
+    conn = sqlite3.connect(database.db_path)
+    agents = conn.execute("SELECT agent_id, organization_id FROM agents").fetchall()
+
+    by_org = {}
+    if database.metrics_store:
+        conn.close()
+        for agent_id, org_id in agents:
+            for sample in database.get_metrics(agent_id, start, end - 0.001):
+                by_org.setdefault(org_id, []).append((agent_id, sample))
+        return by_org
+
+    owner = dict(agents)
+    rows = conn.execute("""
+        SELECT agent_id, CAST(strftime('%s', timestamp) AS REAL), coherence, recovery_margin,
+               cpu_usage, mem_usage, error_rate, alert_level
+        FROM metrics
+        WHERE timestamp >= ? AND timestamp < ?
+    """, (f"{day.isoformat()} 00:00:00", f"{(day + timedelta(days=1)).isoformat()} 00:00:00"))
+    for agent_id, ts, *values, level in rows:
+        sample = dict(zip(FLOAT_COLUMNS, values), timestamp=ts, alert_level=level)
+        by_org.setdefault(owner.get(agent_id), []).append((agent_id, sample))
+    conn.close()
+    return by_org
+
+
+def write_partition(path: Path, samples: list, day: date) -> dict:
+    """Write (agent_id, sample) pairs as a sealed partition; returns its index"""
+    samples = sorted(samples, key=lambda s: (s[0], s[1]['timestamp']))
+    agents = sorted({agent_id for agent_id, _ in samples})
+
+    code = {agent_id: i for i, agent_id in enumerate(agents)}
+    agent_codes = np.fromiter((code[a] for a, _ in samples), dtype=np.int64, count=len(samples))
+    offsets = np.searchsorted(agent_codes, np.arange(len(agents) + 1)).tolist()
+
+    level_code = {level: i for i, level in enumerate(ALERT_LEVELS)}
+    columns = {
+        'timestamp': np.array([s['timestamp'] for _, s in samples], dtype=np.float64),
+        'alert_level': np.array(
+            [level_code.get(s['alert_level'], UNKNOWN_LEVEL) for _, s in samples], dtype=np.uint8
+        ),
+    }
+    for name in FLOAT_COLUMNS:
+        columns[name] = np.array(
+            [np.nan if s[name] is None else s[name] for _, s in samples], dtype=np.float64
+        )
+
+    # Build in a temp directory and rename, so readers never see a partial partition
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    for name in COLUMNS:
+        np.save(tmp / f"{name}.npy", columns[name])
+
+    index = {
+        'day': day.isoformat(),
+        'rows': len(samples),
+        'agents': agents,
+        'offsets': offsets,
+        'columns': {name: str(columns[name].dtype) for name in COLUMNS},
+        'alert_levels': list(ALERT_LEVELS),
+        'min_timestamp': float(columns['timestamp'].min()) if samples else None,
+        'max_timestamp': float(columns['timestamp'].max()) if samples else None,
+        'sealed': True,
+    }
+    (tmp / "index.json").write_text(json.dumps(index))
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return index
+
+
+def export_day(db, day: date, root: str, force: bool = False) -> list:
+    """
+    Archive one UTC day of every organization; returns the partition paths
+    written. Existing sealed partitions are kept unless force=True.
+    """
+    if day >= datetime.now(timezone.utc).date():
+        raise ValueError(f"{day} is not over yet; only past days can be sealed")
+
+    by_org = {}
+    for database in _databases(db):
+        for org_id, samples in _read_day(database, day).items():
+            by_org.setdefault(org_id, []).extend(samples)
+
+    written = []
+    for org_id, samples in sorted(by_org.items(), key=lambda item: str(item[0])):
+        path = Path(root) / f"org_{org_id}" / day.isoformat()
+        if (path / "index.json").exists() and not force:
+            continue
+        write_partition(path, samples, day)
+        written.append(path)
+    return written
+
+
+class Partition:
+    """One memory-mapped day of one organization"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.index = json.loads((self.path / "index.json").read_text())
+        self.agents = self.index['agents']
+        self.offsets = np.asarray(self.index['offsets'], dtype=np.int64)
+        self._columns = {}
+
+    def __len__(self):
+        return self.index['rows']
+
+    def column(self, name: str) -> np.ndarray:
+        col = self._columns.get(name)
+        if col is None:
+            col = self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode='r')
+        return col
+
+    def agent_codes(self) -> np.ndarray:
+        """Per-row agent index (rows are grouped by agent)"""
+        return np.repeat(np.arange(len(self.agents)), np.diff(self.offsets))
+
+
+class Archive:
+    """Reader over <root>/org_<id>/<day> partitions"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def partitions(self, organization_id, start: date = None, end: date = None) -> list:
+        """Sealed partitions of an organization with start <= day <= end"""
+        org_dir = self.root / f"org_{organization_id}"
+        if not org_dir.is_dir():
+            return []
+        parts = []
+        for path in sorted(org_dir.iterdir()):
+            if path.suffix == ".tmp" or not (path / "index.json").exists():
+                continue
+            day = date.fromisoformat(path.name)
+            if (start is None or day >= start) and (end is None or day <= end):
+                parts.append(Partition(path))
+        return parts
+
+    def hourly_coherence(self, organization_id, start: date = None, end: date = None) -> dict:
+        """
+        Mean/min coherence per agent per hour. Returns column arrays:
+        agent_id, hour (epoch seconds), mean_c, min_c, samples.
+        """
+        out = {'agent_id': [], 'hour': [], 'mean_c': [], 'min_c': [], 'samples': []}
+        for part in self.partitions(organization_id, start, end):
+            if not len(part):
+                continue
+            c = part.column('coherence')
+            hour = (part.column('timestamp') // 3600).astype(np.int64)
+            agent = part.agent_codes()
+
+            # Rows are sorted by (agent, time), so (agent, hour) keys are
+            # non-decreasing and every group is one contiguous run.
+            key = agent * 10_000_000 + hour
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1))
+            counts = np.diff(np.append(starts, len(key)))
+
+            out['agent_id'].append(np.asarray(part.agents, dtype=object)[agent[starts]])
+            out['hour'].append(hour[starts] * 3600)
+            out['mean_c'].append(np.add.reduceat(c, starts) / counts)
+            out['min_c'].append(np.minimum.reduceat(c, starts))
+            out['samples'].append(counts)
+
+        return {
+            name: np.concatenate(parts) if parts else np.array([])
+            for name, parts in out.items()
+        }
+
+    def alert_time(self, organization_id, start: date = None, end: date = None,
+                   max_gap: float = 300.0) -> dict:
+        """
+        Seconds spent at each alert level per agent: every sample holds its
+        level until the agent's next sample (gaps capped at max_gap, the
+        last sample of a day counts 0). Returns agent_id -> {level: seconds}.
+        """
+        totals = {}
+        labels = list(ALERT_LEVELS) + ['UNKNOWN']
+        for part in self.partitions(organization_id, start, end):
+            if not len(part):
+                continue
+            ts = part.column('timestamp')
+            level = part.column('alert_level').astype(np.int64)
+            level[level == UNKNOWN_LEVEL] = len(ALERT_LEVELS)
+            agent = part.agent_codes()
+
+            held = np.zeros(len(ts))
+            held[:-1] = np.minimum(np.diff(ts), max_gap)
+            held[part.offsets[1:] - 1] = 0.0     # no interval across agents
+
+            width = len(labels)
+            sums = np.bincount(agent * width + level, weights=held,
+                               minlength=len(part.agents) * width).reshape(-1, width)
+            for agent_id, row in zip(part.agents, sums):
+                acc = totals.setdefault(agent_id, dict.fromkeys(labels, 0.0))
+                for label, seconds in zip(labels, row.tolist()):
+                    acc[label] += seconds
+        return totals
@@ -0,0 +1,601 @@
+"""
+fleet.py
+
+Organization-wide views of the fleet, maintained in memory as samples are
+ingested so overview requests never scan the agents' metrics.
+
+FleetRollup keeps one OrgRollup per organization with the agents' latest
+coherence and alert level. Every sample replaces the agent's previous
+contribution in O(1):
+
+- counts per alert level
+- mean coherence (running sum over the agents' latest C)
+- min coherence: agents are bucketed by C (1/1000 wide) and a pointer
+  tracks the lowest non-empty bucket, so the minimum is the smallest C in
+  one small bucket
+- degrading agents: EWMA of each agent's per-sample change in C below
+  -DEGRADING_SLOPE
+
+Agents are kept in least-recently-seen order; one that hasn't reported for
+live_seconds (saas_api passes AGENT_LIVE_SECONDS, the rule behind the
+tier agent cap) is dropped from every aggregate, amortised O(1) per sample.
+
+WorstAgentIndex ranks each organization's agents for triage: two
+IndexedHeaps keyed by current recovery margin and by forecast seconds to
+RED (margin over its EWMA decline per second). A sample re-positions its
+agent in O(log n); the k worst are read off the heap in O(k log k)
+without popping. Agents silent for live_seconds are removed from both
+heaps, as in the rollup.
+
+CorrelationEngine flags whole-service incidents: many agents' coherence
+dropping together. Time is cut into windows; within the current window
+each organization keeps co-movement counts (agents reporting, agents whose
+C fell since the window began by more than their usual jitter, summed
+net C changes), updated in O(1) per sample with each agent counted once. Closed
+windows feed an EWMA baseline of the declining fraction. A correlated
+decline is flagged as soon as a quorum of agents has reported in the
+current window and the declining count is both a majority and far above
+the binomial expectation from the baseline; it clears at the first closed
+window that no longer meets that test, or once reporting stops (a window
+closes empty or windows are skipped). Windows are closed by the first
+sample or status() call after they end. Agents that reported in neither
+the current nor the previous window are pruned, so they don't count
+toward coverage. Memory is one small record per recent agent plus a fixed
+window history.
+
+rebuild() seeds the state from the last stored sample of every agent
+(Database.get_latest_metrics) at startup; trends restart at zero.
+"""
+
+import heapq
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from src.recovery.detector import ALERT_LEVELS
+from src.recovery.metrics import estimate_steps_to_irreversible
+
+C_BUCKETS = 1000
+TREND_ALPHA = 0.3
+DEGRADING_SLOPE = 0.002     # EWMA drop in C per sample
+RANKINGS = ('margin', 'time_to_red')
+DECLINE_EPSILON = 0.005     # smallest C drop between samples that counts as declining
+DECLINE_DEVIATIONS = 1.5    # ... in units of the agent's mean absolute C change
+NOISE_ALPHA = 0.05
+WARMUP_SAMPLES = 10         # samples before an agent's jitter estimate is used
+FLEET_AGENT_ID = '*'        # agent_id of organization-wide alerts
+
+
+def _bucket(coherence: float) -> int:
+    return min(C_BUCKETS - 1, max(0, int(coherence * C_BUCKETS)))
+
+
+def _by_last_seen(latest: dict, now: float) -> list:
+    """(agent_id, sample, timestamp) from get_latest_metrics(), oldest first"""
+    samples = []
+    for agent_id, sample in latest.items():
+        seen = sample.get('timestamp')
+        samples.append((agent_id, sample, now if seen is None else seen))
+    samples.sort(key=lambda item: item[2])
+    return samples
+
+
+class _AgentState:
+    __slots__ = ('coherence', 'alert_level', 'trend', 'bucket', 'seen')
+
+    def __init__(self, coherence, alert_level, seen):
+        self.coherence = coherence
+        self.alert_level = alert_level
+        self.trend = 0.0
+        self.bucket = _bucket(coherence)
+        self.seen = seen
+
+
+class OrgRollup:
+    """Aggregates over the latest sample of every live agent in one organization"""
+
+    def __init__(self, live_seconds: float = 3600.0):
+        self.live_seconds = live_seconds
+        self.agents = OrderedDict()     # agent_id -> _AgentState, least recently seen first
+        self.levels = dict.fromkeys(ALERT_LEVELS, 0)
+        self.sum_c = 0.0
+        self.degrading = 0
+        self.buckets = {}           # bucket -> {agent_id: coherence}
+        self.low = C_BUCKETS        # lowest non-empty bucket
+
+    def _add(self, agent_id: str, state: _AgentState):
+        self.levels[state.alert_level] = self.levels.get(state.alert_level, 0) + 1
+        self.sum_c += state.coherence
+        self.buckets.setdefault(state.bucket, {})[agent_id] = state.coherence
+        self.low = min(self.low, state.bucket)
+
+    def _remove(self, agent_id: str, state: _AgentState):
+        self.levels[state.alert_level] -= 1
+        self.sum_c -= state.coherence
+        members = self.buckets[state.bucket]
+        del members[agent_id]
+        if not members:
+            del self.buckets[state.bucket]
+            if state.bucket == self.low:
+                while self.low < C_BUCKETS and self.low not in self.buckets:
+                    self.low += 1
+
+    def observe(self, agent_id: str, coherence: float, alert_level: str, now: float):
+        state = self.agents.get(agent_id)
+        if state is None:
+            state = self.agents[agent_id] = _AgentState(coherence, alert_level, now)
+            self._add(agent_id, state)
+        else:
+            self._remove(agent_id, state)
+            was_degrading = state.trend < -DEGRADING_SLOPE
+            state.trend += TREND_ALPHA * ((coherence - state.coherence) - state.trend)
+            state.coherence = coherence
+            state.alert_level = alert_level
+            state.bucket = _bucket(coherence)
+            state.seen = max(state.seen, now)
+            self.degrading += (state.trend < -DEGRADING_SLOPE) - was_degrading
+            self._add(agent_id, state)
+            self.agents.move_to_end(agent_id)
+        self.expire(now)
+
+    def expire(self, now: float):
+        """Drop agents that haven't reported for live_seconds"""
+        cutoff = now - self.live_seconds
+        while self.agents:
+            agent_id, state = next(iter(self.agents.items()))
+            if state.seen >= cutoff:
+                break
+            del self.agents[agent_id]
+            self._remove(agent_id, state)
+            self.degrading -= state.trend < -DEGRADING_SLOPE
+
+    def summary(self) -> dict:
+        n = len(self.agents)
+        lowest = self.buckets.get(self.low)
+        return {
+            'agents': n,
+            'alert_levels': dict(self.levels),
+            'mean_coherence': self.sum_c / n if n else None,
+            'min_coherence': min(lowest.values()) if lowest else None,
+            'degrading': self.degrading,
+        }
+
+
+class FleetRollup:
+    """OrgRollup per organization, safe to share between request threads"""
+
+    def __init__(self, live_seconds: float = 3600.0):
+        self.live_seconds = live_seconds
+        self.orgs = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, latest: dict, now: float):
+        """Replace all state with Database.get_latest_metrics() output"""
+        orgs = {}
+        for agent_id, sample, seen in _by_last_seen(latest, now):
+            if sample['organization_id'] is None or sample['coherence'] is None:
+                continue
+            rollup = orgs.get(sample['organization_id'])
+            if rollup is None:
+                rollup = orgs[sample['organization_id']] = OrgRollup(self.live_seconds)
+            rollup.observe(agent_id, sample['coherence'], sample['alert_level'], seen)
+        for rollup in orgs.values():
+            rollup.expire(now)
+        with self._lock:
+            self.orgs = orgs
+
+    def observe(self, organization_id: int, agent_id: str, coherence: float, alert_level: str,
+                now: float = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rollup = self.orgs.get(organization_id)
+            if rollup is None:
+                rollup = self.orgs[organization_id] = OrgRollup(self.live_seconds)
+            rollup.observe(agent_id, coherence, alert_level, now)
+
+    def summary(self, organization_id: int, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            rollup = self.orgs.get(organization_id)
+            if rollup is None:
+                return OrgRollup().summary()
+            rollup.expire(now)
+            return rollup.summary()
+
+
+class IndexedHeap:
+    """Binary min-heap with a position map: any item can be re-keyed or removed in O(log n)"""
+
+    def __init__(self):
+        self.keys = []
+        self.items = []
+        self.pos = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _swap(self, i, j):
+        keys, items, pos = self.keys, self.items, self.pos
+        keys[i], keys[j] = keys[j], keys[i]
+        items[i], items[j] = items[j], items[i]
+        pos[items[i]] = i
+        pos[items[j]] = j
+
+    def _sift_up(self, i):
+        keys = self.keys
+        while i:
+            parent = (i - 1) >> 1
+            if not keys[i] < keys[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        keys, n = self.keys, len(self.keys)
+        while True:
+            left = 2 * i + 1
+            if left >= n:
+                break
+            child = left + 1 if left + 1 < n and keys[left + 1] < keys[left] else left
+            if not keys[child] < keys[i]:
+                break
+            self._swap(i, child)
+            i = child
+
+    def update(self, item, key):
+        """Insert item or change its key"""
+        i = self.pos.get(item)
+        if i is None:
+            self.pos[item] = len(self.items)
+            self.items.append(item)
+            self.keys.append(key)
+            self._sift_up(len(self.items) - 1)
+            return
+        old, self.keys[i] = self.keys[i], key
+        if key < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, item):
+        i = self.pos.pop(item)
+        last = len(self.items) - 1
+        if i != last:
+            self.keys[i], self.items[i] = self.keys[last], self.items[last]
+            self.pos[self.items[i]] = i
+        self.keys.pop()
+        self.items.pop()
+        if i < len(self.items):
+            self._sift_up(i)
+            self._sift_down(i)
+
+    def smallest(self, k: int) -> list:
+        """The k smallest (key, item) pairs in order, heap left intact"""
+        keys, items, n = self.keys, self.items, len(self.keys)
+        out = []
+        frontier = [(keys[0], 0)] if n else []
+        while frontier and len(out) < k:
+            key, i = heapq.heappop(frontier)
+            out.append((key, items[i]))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < n:
+                    heapq.heappush(frontier, (keys[child], child))
+        return out
+
+
+class _MarginTrend:
+    __slots__ = ('margin', 'time', 'trend')
+
+    def __init__(self, margin, now):
+        self.margin = margin
+        self.time = now
+        self.trend = 0.0        # margin per second, EWMA
+
+
+def _seconds_to_red(margin: float, trend: float):
+    """0 when already RED, else the extrapolated seconds (None = not declining)"""
+    if margin <= 0:
+        return 0
+    return estimate_steps_to_irreversible(margin, trend)
+
+
+class OrgRanking:
+    """Live agents of one organization ordered by margin and by time to RED"""
+
+    def __init__(self, live_seconds: float = 3600.0):
+        self.live_seconds = live_seconds
+        self.agents = OrderedDict()     # agent_id -> _MarginTrend, least recently seen first
+        self.by_margin = IndexedHeap()
+        self.by_time_to_red = IndexedHeap()
+
+    def observe(self, agent_id: str, margin: float, now: float):
+        state = self.agents.get(agent_id)
+        if state is None:
+            state = self.agents[agent_id] = _MarginTrend(margin, now)
+        else:
+            if now > state.time:
+                slope = (margin - state.margin) / (now - state.time)
+                state.trend += TREND_ALPHA * (slope - state.trend)
+                state.margin, state.time = margin, now
+            else:
+                state.margin = margin
+            self.agents.move_to_end(agent_id)
+
+        seconds = _seconds_to_red(margin, state.trend)
+        eta = math.inf if seconds is None else seconds
+        self.by_margin.update(agent_id, (margin, eta))
+        self.by_time_to_red.update(agent_id, (eta, margin))
+        self.expire(now)
+
+    def expire(self, now: float):
+        """Drop agents that haven't reported for live_seconds"""
+        cutoff = now - self.live_seconds
+        while self.agents:
+            agent_id, state = next(iter(self.agents.items()))
+            if state.time >= cutoff:
+                break
+            del self.agents[agent_id]
+            self.by_margin.remove(agent_id)
+            self.by_time_to_red.remove(agent_id)
+
+    def worst(self, k: int, by: str = 'margin') -> list:
+        heap = self.by_margin if by == 'margin' else self.by_time_to_red
+        out = []
+        for _, agent_id in heap.smallest(k):
+            state = self.agents[agent_id]
+            seconds = _seconds_to_red(state.margin, state.trend)
+            out.append({
+                'agent_id': agent_id,
+                'recovery_margin': state.margin,
+                'trend_per_second': state.trend,
+                'seconds_to_red': seconds,
+            })
+        return out
+
+
+class WorstAgentIndex:
+    """OrgRanking per organization, safe to share between request threads"""
+
+    def __init__(self, live_seconds: float = 3600.0):
+        self.live_seconds = live_seconds
+        self.orgs = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self, latest: dict, now: float):
+        """Replace all state with Database.get_latest_metrics() output"""
+        orgs = {}
+        for agent_id, sample, seen in _by_last_seen(latest, now):
+            if sample['organization_id'] is None or sample['recovery_margin'] is None:
+                continue
+            ranking = orgs.get(sample['organization_id'])
+            if ranking is None:
+                ranking = orgs[sample['organization_id']] = OrgRanking(self.live_seconds)
+            ranking.observe(agent_id, sample['recovery_margin'], seen)
+        for ranking in orgs.values():
+            ranking.expire(now)
+        with self._lock:
+            self.orgs = orgs
+
+    def observe(self, organization_id: int, agent_id: str, margin: float, now: float):
+        with self._lock:
+            ranking = self.orgs.get(organization_id)
+            if ranking is None:
+                ranking = self.orgs[organization_id] = OrgRanking(self.live_seconds)
+            ranking.observe(agent_id, margin, now)
+
+    def worst(self, organization_id: int, k: int, by: str = 'margin', now: float = None) -> list:
+        if by not in RANKINGS:
+            raise ValueError(f"by must be one of {RANKINGS}, got {by!r}")
+        now = time.time() if now is None else now
+        with self._lock:
+            ranking = self.orgs.get(organization_id)
+            if ranking is None:
+                return []
+            ranking.expire(now)
+            return ranking.worst(k, by)
+
+
+class _CoMovement:
+    __slots__ = ('coherence', 'noise', 'samples', 'window', 'start', 'steps', 'declined', 'delta',
+                 'seen')
+
+    def __init__(self, coherence, seen):
+        self.coherence = coherence
+        self.seen = seen
+        self.noise = 0.0        # EWMA of |delta C| per sample
+        self.samples = 0
+        self.window = None      # window this agent was last counted in
+        self.start = coherence  # C when that window began
+        self.steps = 0          # samples in that window
+        self.declined = False
+        self.delta = 0.0        # C change since start
+
+
+class OrgCorrelation:
+    """Sliding-window co-movement of C deltas across one organization's agents"""
+
+    def __init__(self, window: float = 60.0, min_agents: int = 5, min_coverage: float = 0.25,
+                 min_fraction: float = 0.5, z: float = 5.0, baseline_alpha: float = 0.1,
+                 history: int = 60):
+        self.window = window
+        self.min_agents = min_agents
+        self.min_coverage = min_coverage
+        self.min_fraction = min_fraction
+        self.z = z
+        self.baseline_alpha = baseline_alpha
+
+        self.agents = OrderedDict()     # agent_id -> _CoMovement, least recently seen first
+        self.current = None
+        self.reporting = 0
+        self.declining = 0
+        self.sum_delta = 0.0
+        self.baseline = 0.1         # declining fraction of a quiet window
+        self.active = False
+        self.history = deque(maxlen=history)
+
+    def fraction(self) -> float:
+        return self.declining / self.reporting if self.reporting else 0.0
+
+    def score(self) -> float:
+        """
+        Declining agents above the baseline expectation, in binomial
+        standard deviations: large only when many agents fall at once.
+        """
+        p = min(max(self.baseline, 0.05), 0.95)
+        n = self.reporting
+        return (self.declining - n * p) / (n * p * (1 - p)) ** 0.5 if n else 0.0
+
+    def correlated(self) -> bool:
+        return (self.fraction() >= self.min_fraction and self.sum_delta < 0
+                and self.score() >= self.z)
+
+    def _event(self, alert_level: str, message: str) -> dict:
+        return {
+            'alert_level': alert_level,
+            'message': message,
+            'metrics': {
+                'agents_reporting': self.reporting,
+                'agents_declining': self.declining,
+                'declining_fraction': self.fraction(),
+                'mean_delta_c': self.sum_delta / self.reporting if self.reporting else 0.0,
+                'baseline_fraction': self.baseline,
+            },
+        }
+
+    def _close(self, window: int):
+        """Finish the current window; returns a clear event if the decline ended"""
+        event = None
+        if self.current is not None and self.reporting:
+            self.history.append({
+                'start': self.current * self.window,
+                'agents_reporting': self.reporting,
+                'agents_declining': self.declining,
+                'mean_delta_c': self.sum_delta / self.reporting,
+            })
+            if self.active and not self.correlated():
+                self.active = False
+                event = self._event(
+                    'GREEN', f"Correlated decline cleared: {self.fraction():.0%} of agents declining"
+                )
+            if not self.active:
+                # Incident windows stay out of the baseline
+                self.baseline += self.baseline_alpha * (self.fraction() - self.baseline)
+        if self.active and (not self.reporting or window > self.current + 1):
+            self.active = False
+            event = self._event('GREEN', "Correlated decline cleared: agents stopped reporting")
+
+        self.current = window
+        self.reporting = 0
+        self.declining = 0
+        self.sum_delta = 0.0
+        self._prune((window - 1) * self.window)
+        return event
+
+    def _prune(self, cutoff: float):
+        """Forget agents last seen before cutoff"""
+        while self.agents:
+            agent_id, state = next(iter(self.agents.items()))
+            if state.seen >= cutoff:
+                break
+            del self.agents[agent_id]
+
+    def tick(self, now: float):
+        """Close the current window if it has ended; returns a clear event or None"""
+        window = int(now // self.window)
+        return self._close(window) if window != self.current else None
+
+    def observe(self, agent_id: str, coherence: float, now: float):
+        """Count one sample; returns an alert event dict on onset or clear, else None"""
+        window = int(now // self.window)
+        event = self.tick(now)
+
+        state = self.agents.get(agent_id)
+        if state is None:
+            self.agents[agent_id] = _CoMovement(coherence, now)
+            return event
+
+        state.seen = max(state.seen, now)
+        self.agents.move_to_end(agent_id)
+        previous, state.coherence = state.coherence, coherence
+        state.samples += 1
+        if not self.active:
+            # Plain mean while warming up, EWMA afterwards
+            alpha = max(NOISE_ALPHA, 1.0 / state.samples)
+            state.noise += alpha * (abs(coherence - previous) - state.noise)
+        if state.samples <= WARMUP_SAMPLES:
+            return event
+
+        if state.window != window:
+            state.window = window
+            state.start = previous
+            state.steps = 0
+            state.declined = False
+            state.delta = 0.0
+            self.reporting += 1
+        state.steps += 1
+
+        # Net change over the window against the agent's own random-walk
+        # jitter, so isolated noisy samples rarely count as declining
+        delta = coherence - state.start
+        declined = delta < -max(DECLINE_EPSILON, DECLINE_DEVIATIONS * state.noise * math.sqrt(state.steps))
+        self.declining += declined - state.declined
+        self.sum_delta += delta - state.delta
+        state.declined = declined
+        state.delta = delta
+
+        if (not self.active and self.reporting >= self.min_agents
+                and self.reporting >= self.min_coverage * len(self.agents)
+                and self.correlated()):
+            self.active = True
+            event = self._event(
+                'YELLOW',
+                f"Correlated decline: {self.declining} of {self.reporting} agents losing coherence together",
+            )
+        return event
+
+    def status(self, now: float) -> tuple:
+        """(status dict, clear event or None from closing an overdue window)"""
+        event = self.tick(now)
+        return dict(
+            self._event('YELLOW' if self.active else 'GREEN', '')['metrics'],
+            active=self.active,
+            score=self.score(),
+            window_seconds=self.window,
+            history=list(self.history),
+        ), event
+
+
+class CorrelationEngine:
+    """OrgCorrelation per organization, safe to share between request threads"""
+
+    def __init__(self, **params):
+        self.params = params
+        self.orgs = {}
+        self._lock = threading.Lock()
+
+    def _org(self, organization_id: int) -> OrgCorrelation:
+        org = self.orgs.get(organization_id)
+        if org is None:
+            org = self.orgs[organization_id] = OrgCorrelation(**self.params)
+        return org
+
+    def rebuild(self, latest: dict, now: float):
+        """Seed every agent's last C from Database.get_latest_metrics() output"""
+        with self._lock:
+            self.orgs = {}
+            for agent_id, sample, seen in _by_last_seen(latest, now):
+                if sample['organization_id'] is None or sample['coherence'] is None:
+                    continue
+                self._org(sample['organization_id']).agents[agent_id] = _CoMovement(sample['coherence'], seen)
+
+    def observe(self, organization_id: int, agent_id: str, coherence: float, now: float):
+        with self._lock:
+            return self._org(organization_id).observe(agent_id, coherence, now)
+
+    def status(self, organization_id: int, now: float = None) -> tuple:
+        """(status dict, clear event or None); see OrgCorrelation.status"""
+        now = time.time() if now is None else now
+        with self._lock:
+            org = self.orgs.get(organization_id) or OrgCorrelation(**self.params)
+            return org.status(now)
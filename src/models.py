@@ -4,19 +4,128 @@ models.py
 Database models for multi-tenant SaaS
 """
 
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Optional
+from pathlib import Path
+from typing import Callable, Optional
+import os
+import queue
 import sqlite3
 import hashlib
 import secrets
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process write lock
+    fcntl = None
+
+
+class BatchWriter:
+    """
+    Background writer that hands queued items to handler(batch) in batches.
+    
+    A batch is flushed when batch_size items are waiting or flush_interval
+    seconds after its first item arrived, whichever comes first. put() never
+    blocks the caller; handler errors are logged and the batch is dropped.
+    """
+    
+    def __init__(self, handler: Callable[[list], None], batch_size: int = 500,
+                 flush_interval: float = 0.5, name: str = "batch-writer"):
+        self.handler = handler
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+    
+    def put(self, item):
+        self._queue.put(item)
+    
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            stop = batch[-1] is None
+            if stop:
+                batch.pop()
+            if batch:
+                try:
+                    self.handler(batch)
+                except Exception as e:
+                    print(f"[{self._thread.name}] dropped batch of {len(batch)}: {e}")
+            for _ in range(len(batch) + stop):
+                self._queue.task_done()
+            if stop:
+                return
+    
+    def flush(self):
+        """Block until everything queued so far has been handled"""
+        self._queue.join()
+    
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
 
 
 class Database:
     """Simple SQLite database for SaaS"""
     
-    def __init__(self, db_path: str = "recovery_watchdog.db"):
+    def __init__(self, db_path: str = "recovery_watchdog.db", metrics_backend: str = "table"):
+        """
+        metrics_backend: "table" stores one metrics row per sample;
+        "compressed" appends to Gorilla-compressed per-agent blocks
+        (src/tsstore.py), sealed into metric_blocks.
+        """
         self.db_path = db_path
+        self.shared_writes = False
+        self.metrics_backend = metrics_backend
         self.init_db()
+        
+        self.metrics_store = None
+        if metrics_backend == "compressed":
+            from src.tsstore import CompressedMetricsStore
+            self.metrics_store = CompressedMetricsStore(db_path, write_lock=self.write_lock)
+        elif metrics_backend != "table":
+            raise ValueError(f"Unknown metrics backend: {metrics_backend}")
+    
+    def enable_shared_writes(self):
+        """
+        Prepare for several writer processes (saas_server workers): WAL
+        journaling so readers never block the writer, and an flock on
+        <db>.lock around write transactions so writers queue on the lock
+        instead of polling in SQLite's busy handler.
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+        self.shared_writes = True
+    
+    @contextmanager
+    def write_lock(self):
+        """Exclusive cross-process write lock (no-op unless shared_writes)"""
+        if not self.shared_writes or fcntl is None:
+            yield
+            return
+        # Opened per call: flock is per open file, so an inherited handle
+        # would be shared between processes.
+        with open(self.db_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
     
     def init_db(self):
         """Initialize database schema"""
@@ -92,6 +201,19 @@ class Database:
             )
         """)
         
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_alerts_org_created
+            ON alerts (organization_id, created_at DESC)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_alerts_org_ack
+            ON alerts (organization_id, acknowledged, created_at DESC)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_metrics_agent_id
+            ON metrics (agent_id, id)
+        """)
+        
         conn.commit()
         conn.close()
     
@@ -99,20 +221,21 @@ class Database:
         """Create new organization with API key"""
         api_key = f"rwk_{secrets.token_urlsafe(32)}"
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Trial ends in 30 days
         trial_ends = datetime.now() + timedelta(days=30)
         
-        cursor.execute("""
-            INSERT INTO organizations (name, api_key, tier, trial_ends_at)
-            VALUES (?, ?, ?, ?)
-        """, (name, api_key, tier, trial_ends))
-        
-        org_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO organizations (name, api_key, tier, trial_ends_at)
+                VALUES (?, ?, ?, ?)
+            """, (name, api_key, tier, trial_ends))
+            
+            org_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
         
         return {
             'id': org_id,
@@ -148,47 +271,376 @@ class Database:
         """Register new monitoring agent"""
         agent_id = f"agent_{secrets.token_urlsafe(16)}"
         
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO agents (organization_id, agent_id, hostname, last_seen)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, (organization_id, agent_id, hostname))
+            
+            conn.commit()
+            conn.close()
+        
+        return agent_id
+    
+    def find_agent(self, organization_id: int, hostname: str) -> Optional[str]:
+        """
+        Most recently registered active agent for a hostname, or None. A hit
+        counts as activity (last_seen is refreshed), so a restarting agent
+        keeps its id.
+        """
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT agent_id FROM agents
+                WHERE organization_id = ? AND hostname = ? AND status = 'active'
+                ORDER BY id DESC LIMIT 1
+            """, (organization_id, hostname))
+            row = cursor.fetchone()
+            
+            if row:
+                cursor.execute("""
+                    UPDATE agents SET last_seen = CURRENT_TIMESTAMP
+                    WHERE agent_id = ?
+                """, (row[0],))
+                conn.commit()
+            conn.close()
+        
+        return row[0] if row else None
+    
+    def count_live_agents(self, organization_id: int, seen_within: float) -> int:
+        """Active agents that reported in the last seen_within seconds"""
+        conn = sqlite3.connect(self.db_path)
+        count = conn.execute("""
+            SELECT COUNT(*) FROM agents
+            WHERE organization_id = ? AND status = 'active'
+              AND last_seen >= datetime('now', ?)
+        """, (organization_id, f"-{int(seen_within)} seconds")).fetchone()[0]
+        conn.close()
+        return count
+    
+    def owned_agents(self, organization_id: int, agent_ids) -> set:
+        """The subset of agent_ids registered (and active) under organization_id"""
+        agent_ids = list(dict.fromkeys(agent_ids))
+        owned = set()
+        conn = sqlite3.connect(self.db_path)
+        for i in range(0, len(agent_ids), 500):
+            chunk = agent_ids[i:i + 500]
+            owned.update(row[0] for row in conn.execute(f"""
+                SELECT agent_id FROM agents
+                WHERE organization_id = ? AND status = 'active'
+                  AND agent_id IN ({','.join('?' * len(chunk))})
+            """, (organization_id, *chunk)))
+        conn.close()
+        return owned
+    
+    def register_agents(self, organization_id: int, hostnames: list) -> list:
+        """Register many agents in one transaction (provisioning/simulation)"""
+        agent_ids = [f"agent_{secrets.token_urlsafe(16)}" for _ in hostnames]
+        
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany("""
+                INSERT INTO agents (organization_id, agent_id, hostname, last_seen)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, [(organization_id, a, h) for a, h in zip(agent_ids, hostnames)])
+            
+            conn.commit()
+            conn.close()
+        
+        return agent_ids
+    
+    def store_metrics(self, agent_id: str, metrics: dict, organization_id: int = None):
+        """Store metrics for an agent (organization_id is used by ShardedDatabase)"""
+        if self.metrics_store:
+            self._store_compressed([(agent_id, metrics)])
+            return
+        
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO metrics (
+                    agent_id, coherence, recovery_margin, alert_level,
+                    cpu_usage, mem_usage, error_rate
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (
+                agent_id,
+                metrics.get('coherence'),
+                metrics.get('recovery_margin'),
+                metrics.get('alert_level'),
+                metrics.get('cpu_usage'),
+                metrics.get('mem_usage'),
+                metrics.get('error_rate')
+            ))
+            
+            # Update agent last_seen
+            cursor.execute("""
+                UPDATE agents SET last_seen = CURRENT_TIMESTAMP
+                WHERE agent_id = ?
+            """, (agent_id,))
+            
+            conn.commit()
+            conn.close()
+    
+    def store_metrics_batch(self, rows: list, organization_id: int = None):
+        """Store many (agent_id, metrics) samples in one transaction"""
+        if self.metrics_store:
+            self._store_compressed(rows)
+            return
+        
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany("""
+                INSERT INTO metrics (
+                    agent_id, coherence, recovery_margin, alert_level,
+                    cpu_usage, mem_usage, error_rate
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    agent_id,
+                    metrics.get('coherence'),
+                    metrics.get('recovery_margin'),
+                    metrics.get('alert_level'),
+                    metrics.get('cpu_usage'),
+                    metrics.get('mem_usage'),
+                    metrics.get('error_rate')
+                )
+                for agent_id, metrics in rows
+            ])
+            
+            cursor.executemany("""
+                UPDATE agents SET last_seen = CURRENT_TIMESTAMP
+                WHERE agent_id = ?
+            """, [(agent_id,) for agent_id in {agent_id for agent_id, _ in rows}])
+            
+            conn.commit()
+            conn.close()
+    
+    def _store_compressed(self, rows: list):
+        self._write_blocks(*self.metrics_store.append(rows))
+    
+    def _write_blocks(self, sealed: list, seen: list = (), checkpoint: tuple = None):
+        if not sealed and not seen and not checkpoint:
+            return
+        try:
+            with self.write_lock():
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                
+                self.metrics_store.write_blocks(cursor, sealed, checkpoint)
+                cursor.executemany("""
+                    UPDATE agents SET last_seen = CURRENT_TIMESTAMP
+                    WHERE agent_id = ?
+                """, [(agent_id,) for agent_id in seen])
+                
+                conn.commit()
+                conn.close()
+        except Exception:
+            if checkpoint:
+                self.metrics_store.checkpoint_failed(checkpoint)
+            raise
+        if checkpoint:
+            self.metrics_store.checkpoint_done(checkpoint)
+    
+    def flush_metrics(self):
+        """Seal and write all open compressed blocks (no-op for the table backend)"""
+        if self.metrics_store:
+            sealed, checkpoint = self.metrics_store.take_open()
+            self._write_blocks(sealed, (), checkpoint)
+    
+    def get_metrics(self, agent_id: str, start: float = None, end: float = None) -> list:
+        """Samples for an agent, oldest first; start/end are epoch seconds"""
+        if self.metrics_store:
+            return self.metrics_store.read(agent_id, start, end)
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO agents (organization_id, agent_id, hostname, last_seen)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        """, (organization_id, agent_id, hostname))
+        query = """
+            SELECT CAST(strftime('%s', timestamp) AS REAL), coherence, recovery_margin,
+                   alert_level, cpu_usage, mem_usage, error_rate
+            FROM metrics
+            WHERE agent_id = ?
+        """
+        params = [agent_id]
+        if start is not None:
+            query += " AND timestamp >= datetime(?, 'unixepoch')"
+            params.append(start)
+        if end is not None:
+            query += " AND timestamp <= datetime(?, 'unixepoch')"
+            params.append(end)
+        cursor.execute(query + " ORDER BY id", params)
+        
+        samples = [
+            {
+                'timestamp': row[0],
+                'coherence': row[1],
+                'recovery_margin': row[2],
+                'alert_level': row[3],
+                'cpu_usage': row[4],
+                'mem_usage': row[5],
+                'error_rate': row[6]
+            }
+            for row in cursor.fetchall()
+        ]
         
-        conn.commit()
         conn.close()
+        return samples
+    
+    def store_alerts(self, alerts: list):
+        """Insert a batch of alert events in one transaction"""
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.executemany("""
+                INSERT INTO alerts (organization_id, agent_id, alert_level, message)
+                VALUES (?, ?, ?, ?)
+            """, [
+                (a['organization_id'], a['agent_id'], a['alert_level'], a.get('message'))
+                for a in alerts
+            ])
+            
+            conn.commit()
+            conn.close()
+    
+    def get_alerts(self, organization_id: int, acknowledged: Optional[bool] = None,
+                   limit: int = 100) -> list:
+        """Most recent alerts for an organization"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
         
-        return agent_id
+        if acknowledged is None:
+            cursor.execute("""
+                SELECT id, agent_id, alert_level, message, created_at, acknowledged
+                FROM alerts
+                WHERE organization_id = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (organization_id, limit))
+        else:
+            cursor.execute("""
+                SELECT id, agent_id, alert_level, message, created_at, acknowledged
+                FROM alerts
+                WHERE organization_id = ? AND acknowledged = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            """, (organization_id, int(acknowledged), limit))
+        
+        alerts = []
+        for row in cursor.fetchall():
+            alerts.append({
+                'id': row[0],
+                'agent_id': row[1],
+                'alert_level': row[2],
+                'message': row[3],
+                'created_at': row[4],
+                'acknowledged': bool(row[5])
+            })
+        
+        conn.close()
+        return alerts
     
-    def store_metrics(self, agent_id: str, metrics: dict):
-        """Store metrics for an agent"""
+    def acknowledge_alert(self, organization_id: int, alert_id: int) -> bool:
+        """Mark an alert acknowledged; False if it doesn't belong to the org"""
+        with self.write_lock():
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE alerts SET acknowledged = 1
+                WHERE id = ? AND organization_id = ?
+            """, (alert_id, organization_id))
+            
+            updated = cursor.rowcount > 0
+            conn.commit()
+            conn.close()
+        return updated
+    
+    def get_latest_alert_levels(self) -> dict:
+        """
+        Last recorded alert level per registered agent:
+        (organization_id, agent_id) -> level
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        cursor.execute("SELECT agent_id, organization_id FROM agents")
+        owner = dict(cursor.fetchall())
+        
+        if self.metrics_store:
+            conn.close()
+            levels = self.metrics_store.latest_levels()
+        else:
+            cursor.execute("""
+                SELECT m.agent_id, m.alert_level
+                FROM metrics m
+                JOIN (SELECT agent_id, MAX(id) AS id FROM metrics GROUP BY agent_id) last
+                  ON m.id = last.id
+            """)
+            levels = dict(cursor.fetchall())
+            conn.close()
+        
+        return {
+            (owner[agent_id], agent_id): level
+            for agent_id, level in levels.items()
+            if agent_id in owner
+        }
+    
+    def get_latest_metrics(self) -> dict:
+        """
+        Last sample per agent: agent_id -> dict with organization_id,
+        coherence, recovery_margin, alert_level and timestamp (epoch seconds)
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT agent_id, organization_id FROM agents")
+        owner = dict(cursor.fetchall())
+        
+        if self.metrics_store:
+            conn.close()
+            return {
+                agent_id: {
+                    'organization_id': owner.get(agent_id),
+                    'coherence': sample['coherence'],
+                    'recovery_margin': sample['recovery_margin'],
+                    'alert_level': sample['alert_level'],
+                    'timestamp': sample['timestamp']
+                }
+                for agent_id, sample in self.metrics_store.latest_samples().items()
+            }
+        
         cursor.execute("""
-            INSERT INTO metrics (
-                agent_id, coherence, recovery_margin, alert_level,
-                cpu_usage, mem_usage, error_rate
-            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            agent_id,
-            metrics.get('coherence'),
-            metrics.get('recovery_margin'),
-            metrics.get('alert_level'),
-            metrics.get('cpu_usage'),
-            metrics.get('mem_usage'),
-            metrics.get('error_rate')
-        ))
-        
-        # Update agent last_seen
-        cursor.execute("""
-            UPDATE agents SET last_seen = CURRENT_TIMESTAMP
-            WHERE agent_id = ?
-        """, (agent_id,))
+            SELECT m.agent_id, m.coherence, m.recovery_margin, m.alert_level,
+                   CAST(strftime('%s', m.timestamp) AS REAL)
+            FROM metrics m
+            JOIN (SELECT agent_id, MAX(id) AS id FROM metrics GROUP BY agent_id) last
+              ON m.id = last.id
+        """)
+        
+        latest = {}
+        for agent_id, coherence, margin, alert_level, timestamp in cursor.fetchall():
+            latest[agent_id] = {
+                'organization_id': owner.get(agent_id),
+                'coherence': coherence,
+                'recovery_margin': margin,
+                'alert_level': alert_level,
+                'timestamp': timestamp
+            }
         
-        conn.commit()
         conn.close()
+        return latest
     
     def get_organization_agents(self, organization_id: int) -> list:
         """Get all agents for an organization"""
@@ -215,6 +667,245 @@ class Database:
         return agents
 
 
+
+class ShardedDatabase:
+    """
+    Database with each organization's agents, metrics and alerts in a shard
+    file, so writes from different organizations don't share a SQLite
+    write lock.
+    
+    A catalog database (catalog.db) holds organizations and users and maps
+    every organization to a shard (organization id modulo `shards`, stored
+    per row so organizations can be moved later). Shards are ordinary
+    Database files shard_NNN.db in the same directory.
+    
+    Shard handles are opened on first use (running the schema check once)
+    and cached; handles idle for idle_seconds, or beyond max_open, are
+    flushed and dropped, except while a metrics write holds them. Methods
+    mirror Database; writes need organization_id, and
+    get_latest_alert_levels()/query_all() fan out over every shard.
+    """
+    
+    def __init__(self, directory: str, shards: int = 16, max_open: int = 64,
+                 idle_seconds: float = 300.0, metrics_backend: str = "table"):
+        self.directory = Path(directory)
+        self.metrics_backend = metrics_backend
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shards = shards
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.shared_writes = False
+        
+        self.catalog = Database(str(self.directory / "catalog.db"))
+        self._init_catalog()
+        
+        self._open = OrderedDict()   # shard -> (Database, last_used), LRU order
+        self._busy = {}              # shard -> metrics writes in flight (not evictable)
+        self._org_shard = {}
+        self._lock = threading.Lock()
+    
+    def _init_catalog(self):
+        conn = sqlite3.connect(self.catalog.db_path)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(organizations)")]
+        if 'shard' not in columns:
+            conn.execute("ALTER TABLE organizations ADD COLUMN shard INTEGER")
+        conn.commit()
+        conn.close()
+    
+    def shard_path(self, shard: int) -> str:
+        return str(self.directory / f"shard_{shard:03d}.db")
+    
+    def shard(self, shard: int) -> Database:
+        """Cached handle for a shard, opening it if needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._open.pop(shard, None)
+            if entry is None:
+                db = Database(self.shard_path(shard), metrics_backend=self.metrics_backend)
+                if self.shared_writes:
+                    db.enable_shared_writes()
+            else:
+                db = entry[0]
+            self._open[shard] = (db, now)
+            self._close_idle(now)
+        return db
+    
+    def _close_idle(self, now: float):
+        excess = len(self._open) - self.max_open
+        for shard, (db, last_used) in list(self._open.items()):
+            if shard in self._busy:
+                continue
+            if excess > 0:
+                excess -= 1
+            elif now - last_used < self.idle_seconds:
+                break
+            db.flush_metrics()
+            del self._open[shard]
+    
+    @contextmanager
+    def _writer(self, organization_id: int):
+        """Shard handle that can't be evicted until the write returns"""
+        if organization_id is None:
+            raise ValueError("organization_id is required with ShardedDatabase")
+        shard = self.shard_of(organization_id)
+        with self._lock:
+            self._busy[shard] = self._busy.get(shard, 0) + 1
+        try:
+            yield self.shard(shard)
+        finally:
+            with self._lock:
+                self._busy[shard] -= 1
+                if not self._busy[shard]:
+                    del self._busy[shard]
+    
+    def open_shards(self) -> list:
+        return list(self._open)
+    
+    def shard_of(self, organization_id: int) -> int:
+        shard = self._org_shard.get(organization_id)
+        if shard is None:
+            conn = sqlite3.connect(self.catalog.db_path)
+            row = conn.execute(
+                "SELECT shard FROM organizations WHERE id = ?", (organization_id,)
+            ).fetchone()
+            conn.close()
+            shard = row[0] if row and row[0] is not None else organization_id % self.shards
+            self._org_shard[organization_id] = shard
+        return shard
+    
+    def for_org(self, organization_id: int) -> Database:
+        if organization_id is None:
+            raise ValueError("organization_id is required with ShardedDatabase")
+        return self.shard(self.shard_of(organization_id))
+    
+    def all_shards(self) -> list:
+        """Shard numbers that exist on disk"""
+        return sorted(
+            int(p.stem.split('_')[1]) for p in self.directory.glob("shard_*.db")
+        )
+    
+    def enable_shared_writes(self):
+        self.catalog.enable_shared_writes()
+        self.shared_writes = True
+        with self._lock:
+            for db, _ in self._open.values():
+                db.enable_shared_writes()
+    
+    def flush_metrics(self):
+        with self._lock:
+            for db, _ in self._open.values():
+                db.flush_metrics()
+    
+    # Catalog
+    
+    def init_db(self):
+        self.catalog.init_db()
+        self._init_catalog()
+    
+    def create_organization(self, name: str, tier: str = 'trial') -> dict:
+        """Create organization in the catalog and assign its shard"""
+        org = self.catalog.create_organization(name, tier)
+        shard = org['id'] % self.shards
+        
+        with self.catalog.write_lock():
+            conn = sqlite3.connect(self.catalog.db_path)
+            conn.execute("UPDATE organizations SET shard = ? WHERE id = ?", (shard, org['id']))
+            conn.commit()
+            conn.close()
+        
+        self._org_shard[org['id']] = shard
+        return org
+    
+    def verify_api_key(self, api_key: str) -> Optional[dict]:
+        return self.catalog.verify_api_key(api_key)
+    
+    # Per-organization (routed to one shard)
+    
+    def register_agent(self, organization_id: int, hostname: str) -> str:
+        return self.for_org(organization_id).register_agent(organization_id, hostname)
+    
+    def register_agents(self, organization_id: int, hostnames: list) -> list:
+        return self.for_org(organization_id).register_agents(organization_id, hostnames)
+    
+    def find_agent(self, organization_id: int, hostname: str) -> Optional[str]:
+        return self.for_org(organization_id).find_agent(organization_id, hostname)
+    
+    def count_live_agents(self, organization_id: int, seen_within: float) -> int:
+        return self.for_org(organization_id).count_live_agents(organization_id, seen_within)
+    
+    def owned_agents(self, organization_id: int, agent_ids) -> set:
+        return self.for_org(organization_id).owned_agents(organization_id, agent_ids)
+    
+    def store_metrics(self, agent_id: str, metrics: dict, organization_id: int = None):
+        with self._writer(organization_id) as db:
+            db.store_metrics(agent_id, metrics)
+    
+    def store_metrics_batch(self, rows: list, organization_id: int = None):
+        with self._writer(organization_id) as db:
+            db.store_metrics_batch(rows)
+    
+    def store_alerts(self, alerts: list):
+        by_shard = {}
+        for a in alerts:
+            by_shard.setdefault(self.shard_of(a['organization_id']), []).append(a)
+        for shard, batch in by_shard.items():
+            self.shard(shard).store_alerts(batch)
+    
+    def get_alerts(self, organization_id: int, acknowledged: Optional[bool] = None,
+                   limit: int = 100) -> list:
+        return self.for_org(organization_id).get_alerts(organization_id, acknowledged, limit)
+    
+    def acknowledge_alert(self, organization_id: int, alert_id: int) -> bool:
+        return self.for_org(organization_id).acknowledge_alert(organization_id, alert_id)
+    
+    def get_organization_agents(self, organization_id: int) -> list:
+        return self.for_org(organization_id).get_organization_agents(organization_id)
+    
+    def get_metrics(self, agent_id: str, start: float = None, end: float = None,
+                    organization_id: int = None) -> list:
+        return self.for_org(organization_id).get_metrics(agent_id, start, end)
+    
+    # Cross-shard (admin)
+    
+    def get_latest_alert_levels(self) -> dict:
+        levels = {}
+        for shard in self.all_shards():
+            levels.update(self.shard(shard).get_latest_alert_levels())
+        return levels
+    
+    def get_latest_metrics(self) -> dict:
+        latest = {}
+        for shard in self.all_shards():
+            latest.update(self.shard(shard).get_latest_metrics())
+        return latest
+    
+    def query_all(self, sql: str, params: tuple = ()) -> list:
+        """Run a read-only query on every shard; rows are prefixed with the shard number"""
+        rows = []
+        for shard in self.all_shards():
+            conn = sqlite3.connect(f"file:{self.shard_path(shard)}?mode=ro", uri=True)
+            try:
+                rows.extend((shard, *row) for row in conn.execute(sql, params))
+            finally:
+                conn.close()
+        return rows
+
+
+def open_database(environ=None):
+    """
+    Database configured from the environment: ShardedDatabase when
+    RECOVERY_SHARD_DIR is set (RECOVERY_SHARDS shards, default 16),
+    otherwise a single file at RECOVERY_DB_PATH. RECOVERY_METRICS_BACKEND
+    selects "table" (default) or "compressed" metrics storage.
+    """
+    environ = os.environ if environ is None else environ
+    backend = environ.get('RECOVERY_METRICS_BACKEND', 'table')
+    shard_dir = environ.get('RECOVERY_SHARD_DIR')
+    if shard_dir:
+        return ShardedDatabase(shard_dir, shards=int(environ.get('RECOVERY_SHARDS', 16)),
+                               metrics_backend=backend)
+    return Database(environ.get('RECOVERY_DB_PATH', 'recovery_watchdog.db'), metrics_backend=backend)
+
 # Test the database
 if __name__ == "__main__":
     db = Database()
@@ -0,0 +1,158 @@
+"""
+ratelimit.py
+
+Per-tier ingest quotas for the SaaS API.
+
+Every organization and every agent has a token bucket held in memory.
+Buckets refill lazily: a request adds rate * elapsed tokens (capped at
+burst) before spending, so there are no timers and an idle bucket costs
+nothing. A request that cannot be paid for in full spends nothing and
+gets the seconds until it could (the Retry-After value).
+
+Agent buckets are keyed by (organization, agent id) and only exist for
+agents registered to the organization; the caller resolves ids first.
+Samples for unknown ids share one bucket per organization (agent limits)
+and also count against the organization bucket, so rotating ids buys
+nothing, on enterprise too.
+
+A bucket that has refilled to its burst is the same as a new one. Buckets
+are kept in least-recently-used order, and a bucket's full_at is at most
+burst / rate after its last use, so each acquire() drops full buckets from
+the old end until it reaches one still refilling: amortised O(1), no
+periodic scan under the lock. The agent table is also capped at
+max_agents buckets, least recently used first.
+
+TIER_LIMITS mirrors the pricing table: agent caps of 3 / 10 / 50 /
+unlimited, an organization-wide samples-per-second rate that grows with
+the tier, and the same per-agent rate everywhere (an agent reports every
+5-120 s depending on its margin; 1 sample/s with a burst of 20 leaves
+room for backfill but stops a tight loop).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+
+class TierLimits(NamedTuple):
+    agents: Optional[int]           # None = unlimited
+    org_rate: Optional[float]       # samples/s across the organization, None = unlimited
+    org_burst: float
+    agent_rate: float               # samples/s per agent
+    agent_burst: float
+
+
+TIER_LIMITS = {
+    'trial': TierLimits(agents=3, org_rate=5.0, org_burst=60, agent_rate=1.0, agent_burst=20),
+    'starter': TierLimits(agents=10, org_rate=20.0, org_burst=200, agent_rate=1.0, agent_burst=20),
+    'professional': TierLimits(agents=50, org_rate=100.0, org_burst=1000, agent_rate=1.0, agent_burst=20),
+    'enterprise': TierLimits(agents=None, org_rate=None, org_burst=0, agent_rate=1.0, agent_burst=20),
+}
+# Trials that ended convert to the free plan, which keeps the trial limits
+TIER_LIMITS['free'] = TIER_LIMITS['trial']
+
+
+def limits_for(tier: str) -> TierLimits:
+    return TIER_LIMITS.get(tier, TIER_LIMITS['trial'])
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated', 'full_at')
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+        self.full_at = now
+
+    def spend(self, cost: float, rate: float, burst: float, now: float):
+        self.tokens -= cost
+        self.full_at = now + (burst - self.tokens) / rate
+
+    def refill(self, rate: float, burst: float, now: float) -> float:
+        if now > self.updated:
+            self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+        return self.tokens
+
+
+class RateLimiter:
+    """Organization and agent token buckets, safe to share between request threads"""
+
+    def __init__(self, tiers: dict = None, clock=time.monotonic, max_agents: int = 100000):
+        self.tiers = TIER_LIMITS if tiers is None else tiers
+        self.clock = clock
+        self.max_agents = max_agents
+        self.orgs = OrderedDict()       # organization_id -> bucket, LRU order
+        self.agents = OrderedDict()     # (organization_id, agent_id) -> bucket, LRU order
+        self._lock = threading.Lock()
+
+    def _limits(self, tier: str) -> TierLimits:
+        return self.tiers.get(tier) or self.tiers['trial']
+
+    def _bucket(self, buckets: OrderedDict, key, burst: float, now: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(burst, now)
+        else:
+            buckets.move_to_end(key)
+        return bucket
+
+    @staticmethod
+    def _expire(buckets: OrderedDict, now: float):
+        """Drop full buckets from the least recently used end"""
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if bucket.full_at > now:
+                break
+            del buckets[key]
+
+    def acquire(self, organization_id: int, tier: str, agent_ids: list, unknown: int = 0) -> float:
+        """
+        Spend one token per sample from the organization's bucket and from
+        each agent's bucket; `unknown` samples for ids not registered to the
+        organization are paid from its shared unknown-id bucket instead.
+        Returns 0.0 when admitted, otherwise the seconds until the request
+        would fit (nothing is spent).
+        """
+        limits = self._limits(tier)
+        counts = {}
+        for agent_id in agent_ids:
+            counts[agent_id] = counts.get(agent_id, 0) + 1
+        if unknown:
+            counts[None] = unknown
+        total = len(agent_ids) + unknown
+
+        with self._lock:
+            now = self.clock()
+            self._expire(self.orgs, now)
+            self._expire(self.agents, now)
+            wait = 0.0
+            org = None
+            if limits.org_rate is not None:
+                org = self._bucket(self.orgs, organization_id, limits.org_burst, now)
+                wait = self._wait(org, total, limits.org_rate, limits.org_burst, now)
+
+            agents = []
+            for agent_id, n in counts.items():
+                bucket = self._bucket(self.agents, (organization_id, agent_id), limits.agent_burst, now)
+                wait = max(wait, self._wait(bucket, n, limits.agent_rate, limits.agent_burst, now))
+                agents.append((bucket, n))
+            while len(self.agents) > self.max_agents:
+                self.agents.popitem(last=False)
+
+            if wait:
+                return wait
+            if org is not None:
+                org.spend(total, limits.org_rate, limits.org_burst, now)
+            for bucket, n in agents:
+                bucket.spend(n, limits.agent_rate, limits.agent_burst, now)
+            return 0.0
+
+    @staticmethod
+    def _wait(bucket: TokenBucket, cost: float, rate: float, burst: float, now: float) -> float:
+        if cost > burst:
+            # Can never fit in one request; ask the caller to split it
+            return float('inf')
+        missing = cost - bucket.refill(rate, burst, now)
+        return missing / rate if missing > 0 else 0.0
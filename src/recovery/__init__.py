@@ -5,5 +5,8 @@ __all__ = [
     "integrity",
     "crypto",
     "detector",
+    "forecast",
+    "series",
+    "timing",
 ]
 __version__ = "1.0.0"
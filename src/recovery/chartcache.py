@@ -0,0 +1,210 @@
+"""
+chartcache.py
+
+On-disk cache for chart rendering, bounded by size with LRU eviction.
+
+Two kinds of entries live under one root directory:
+
+- renders/<key>.<ext>: a finished image. The key is a hash of the input
+  file's identity (path, size, mtime) and the chart parameters, so an
+  unchanged input with the same options is served by copying the file.
+- columns/<key>.npz: the parsed numeric columns of an input file. For
+  CSVs the entry also records the byte offset it has read up to and a
+  fingerprint of the bytes before it. When the file has only grown, just
+  the appended tail is parsed and appended; a rewrite or truncation
+  (fingerprint mismatch, shorter file) falls back to a full read.
+
+Every hit refreshes the entry's mtime; after each write the oldest
+entries are removed until the cache fits in max_bytes (default 256 MB,
+RECOVERY_CACHE_MAX_MB overrides).
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+FORMAT = 2
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+FINGERPRINT_BYTES = 4096
+
+
+def default_root() -> Path:
+    root = os.environ.get("RECOVERY_CACHE_DIR")
+    if root:
+        return Path(root)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "recovery" / "charts"
+
+
+def parse_rows(lines: list, header: list, converters: dict) -> dict:
+    """Apply converters to CSV data lines; a row that fails to convert raises ValueError."""
+    out = {k: [] for k in converters}
+    for row in csv.DictReader(io.StringIO("\n".join(lines)), fieldnames=header):
+        try:
+            values = {k: fn(row) for k, fn in converters.items()}
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"malformed row {dict(row)!r}: {e}") from e
+        for k, v in values.items():
+            out[k].append(v)
+    return out
+
+
+def read_csv_columns(path, converters: dict) -> dict:
+    """Uncached full read: column -> float64 array."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return {k: np.empty(0) for k in converters}
+    header = next(csv.reader([lines[0]]))
+    return {k: np.asarray(v, dtype=np.float64) for k, v in parse_rows(lines[1:], header, converters).items()}
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+
+class ChartCache:
+    def __init__(self, root=None, max_bytes: int = None):
+        self.root = Path(root) if root else default_root()
+        if max_bytes is None:
+            mb = os.environ.get("RECOVERY_CACHE_MAX_MB")
+            max_bytes = int(float(mb) * 1024 * 1024) if mb else DEFAULT_MAX_BYTES
+        self.max_bytes = max_bytes
+
+    # -------------------------
+    # RENDERS
+    # -------------------------
+    def render_key(self, path, params: dict) -> str:
+        st = os.stat(path)
+        return _digest(FORMAT, os.path.realpath(path), st.st_size, st.st_mtime_ns, params)
+
+    def _render_entry(self, key: str, output) -> Path:
+        return self.root / "renders" / f"{key}{Path(output).suffix or '.png'}"
+
+    def fetch_render(self, key: str, output) -> bool:
+        """Copy a cached image to output; False on a miss."""
+        entry = self._render_entry(key, output)
+        if not entry.exists():
+            return False
+        shutil.copyfile(entry, output)
+        os.utime(entry)
+        return True
+
+    def store_render(self, key: str, output):
+        entry = self._render_entry(key, output)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_suffix(f".{os.getpid()}.tmp")
+        shutil.copyfile(output, tmp)
+        os.replace(tmp, entry)
+        self.evict()
+
+    # -------------------------
+    # PARSED COLUMNS
+    # -------------------------
+    def _load(self, entry: Path):
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                meta = json.loads(str(data["__meta__"]))
+                columns = {name: data[name] for name in data.files if name != "__meta__"}
+        except (OSError, ValueError, KeyError):
+            return None, None
+        os.utime(entry)
+        return meta, columns
+
+    def _save(self, entry: Path, meta: dict, columns: dict):
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(f"{entry.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, __meta__=np.array(json.dumps(meta)), **columns)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def file_columns(self, path, loader, name: str) -> dict:
+        """loader(path) -> {column: array}, cached until the file changes."""
+        st = os.stat(path)
+        entry = self.root / "columns" / f"{_digest(FORMAT, name, os.path.realpath(path))}.npz"
+        identity = [st.st_size, st.st_mtime_ns, st.st_ino]
+
+        meta, columns = self._load(entry)
+        if meta is not None and meta.get("identity") == identity:
+            return columns
+
+        columns = {k: np.asarray(v) for k, v in loader(path).items()}
+        self._save(entry, {"identity": identity}, columns)
+        return columns
+
+    def csv_columns(self, path, converters: dict, name: str) -> dict:
+        """
+        converters: column -> fn(row dict) -> float. Rows appended since
+        the last call are the only ones parsed.
+        """
+        entry = self.root / "columns" / f"{_digest(FORMAT, name, os.path.realpath(path))}.npz"
+        meta, columns = self._load(entry)
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            if meta is not None and meta["offset"] <= size:
+                start = max(0, meta["offset"] - FINGERPRINT_BYTES)
+                f.seek(start)
+                if hashlib.sha1(f.read(meta["offset"] - start)).hexdigest() == meta["fingerprint"]:
+                    offset = meta["offset"]
+            if offset == 0:
+                meta, columns = {"header": None}, {k: np.empty(0) for k in converters}
+            elif offset == size:
+                return columns
+
+            f.seek(offset)
+            chunk = f.read(size - offset)
+
+        # Only complete lines; a half-written last row is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        lines = chunk[:end].decode("utf-8").splitlines()
+        header = meta["header"]
+        if header is None and lines:
+            header = next(csv.reader([lines.pop(0)]))
+
+        new = parse_rows(lines, header, converters) if lines else {k: [] for k in converters}
+        columns = {
+            k: np.concatenate((columns[k], np.asarray(new[k], dtype=np.float64)))
+            for k in converters
+        }
+        offset += end
+        with open(path, "rb") as f:
+            start = max(0, offset - FINGERPRINT_BYTES)
+            f.seek(start)
+            fingerprint = hashlib.sha1(f.read(offset - start)).hexdigest()
+
+        self._save(entry, {"offset": offset, "fingerprint": fingerprint, "header": header}, columns)
+        return columns
+
+    # -------------------------
+    # EVICTION
+    # -------------------------
+    def evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for sub in ("renders", "columns"):
+            d = self.root / sub
+            if d.is_dir():
+                for p in d.iterdir():
+                    try:
+                        st = p.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, p))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
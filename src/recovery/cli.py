@@ -0,0 +1,423 @@
+"""
+cli.py
+
+Single `recovery` command line entry point.
+
+    recovery detect --run test_run.json
+    recovery chart --report detector_report.csv --output margin.png
+    recovery verify --run signed_run.json
+    recovery bench -k detector
+
+Only argparse is imported at startup. Each subcommand imports what it
+needs (NumPy, matplotlib, the benchmark suite) inside its handler, so
+`recovery --help` and cheap subcommands stay fast for scripted and cron
+use. benchmarks/bench_startup.py checks the startup budget, and
+tests/test_cli_startup.py the imports.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+# -------------------------
+# DETECT
+# -------------------------
+def _detect_args(p):
+    p.add_argument("--run", required=True, help="Run JSON with step_logs (or steps)")
+    p.add_argument("--beta-base", type=float, default=1.1)
+    p.add_argument("--c-baseline", type=float, default=0.6)
+    p.add_argument("--output", default="detector_report.csv")
+    p.add_argument("--quiet", action="store_true")
+
+
+def _detect(args):
+    import csv
+    import json
+
+    import numpy as np
+
+    from .detector import RecoveryDebtDetector
+    from .series import detect_series
+
+    with open(args.run, "r", encoding="utf-8-sig") as f:
+        run = json.load(f)
+
+    steps = run.get("step_logs") or run.get("steps")
+    if not steps:
+        raise SystemExit("Run file missing 'step_logs' or 'steps'")
+
+    detector = RecoveryDebtDetector(
+        beta_base=args.beta_base,
+        c_baseline=args.c_baseline,
+    )
+
+    if any("C" not in step for step in steps):
+        raise SystemExit("Step missing required key: 'C'")
+
+    C = np.fromiter((float(step["C"]) for step in steps), dtype=np.float64, count=len(steps))
+    beta = np.fromiter(
+        (float(step.get("beta", step.get("beta_eff", args.beta_base))) for step in steps),
+        dtype=np.float64, count=len(steps),
+    )
+
+    result = detect_series(C, beta, detector=detector)
+
+    rows = []
+
+    for step, alert, margin in zip(steps, result.alert_labels().tolist(), result.margins.tolist()):
+        t = step.get("t", step.get("step"))
+
+        if not args.quiet:
+            print(t, alert, margin)
+
+        rows.append({
+            "t": t,
+            "alert": alert,
+            "recovery_margin": margin,
+        })
+
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(out, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"OK: wrote {len(rows)} rows → {out}")
+
+
+# -------------------------
+# CHART
+# -------------------------
+def _chart_args(p):
+    source = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--run", help="Run JSON: coherence per step")
+    source.add_argument("--report", help="detector_report.csv: recovery margin per step")
+    source.add_argument("--pilot", help="Sidecar pilot.csv: coherence and margin over time")
+    p.add_argument("--output", help="Save to this image file instead of opening a window")
+    p.add_argument("--width", type=int, default=2000,
+                   help="Downsample to about this many points (0 = plot every point)")
+    p.add_argument("--mode", choices=("lttb", "minmax"), default="lttb")
+    p.add_argument("--no-cache", action="store_true", help="Always re-read and re-render")
+    p.add_argument("--cache-dir", help="Render cache directory (default ~/.cache/recovery/charts)")
+
+
+def _run_columns(path):
+    import json
+    with open(path, "r", encoding="utf-8-sig") as f:
+        run = json.load(f)
+    return {"C": [float(s["C"]) for s in run["step_logs"]]}
+
+
+def _step(row):
+    t = row.get("t")
+    return float(t) if t not in (None, "", "None") else float("nan")
+
+
+def _epoch(row):
+    from datetime import datetime, timezone
+    stamp = datetime.fromisoformat(row["timestamp"])
+    # The sidecar exporter writes naive UTC (utcfromtimestamp().isoformat())
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return stamp.timestamp()
+
+
+REPORT_COLUMNS = {
+    "t": _step,
+    "margin": lambda row: float(row["recovery_margin"]),
+    "red": lambda row: float(row.get("alert") == "RED"),
+}
+
+PILOT_COLUMNS = {
+    "timestamp": _epoch,
+    "coherence": lambda row: float(row["coherence_C"]),
+    "margin": lambda row: float(row["recovery_margin"]),
+    "red": lambda row: float(row.get("alert_level") == "RED"),
+}
+
+
+def _columns(args, cache):
+    """Parsed input columns, through the cache when enabled"""
+    from .chartcache import read_csv_columns
+
+    if args.run:
+        if cache:
+            return cache.file_columns(args.run, _run_columns, "run")
+        return _run_columns(args.run)
+
+    path, converters, name = (
+        (args.report, REPORT_COLUMNS, "report") if args.report else (args.pilot, PILOT_COLUMNS, "pilot")
+    )
+    if cache:
+        return cache.csv_columns(path, converters, name)
+    return read_csv_columns(path, converters)
+
+
+def _select(args, y, x=None, red=None):
+    """Indices of the points to draw: y downsampled to args.width"""
+    import numpy as np
+
+    from .downsample import downsample_indices
+
+    if not args.width or len(y) <= args.width:
+        return np.arange(len(y))
+    return downsample_indices(y, args.width, x=x, mode=args.mode,
+                              protect=None if red is None else red.astype(bool))
+
+
+def _chart(args):
+    from .chartcache import ChartCache
+
+    cache = None if args.no_cache else ChartCache(args.cache_dir)
+    source = args.run or args.report or args.pilot
+    key = None
+    if cache and args.output:
+        key = cache.render_key(source, {
+            "kind": "run" if args.run else "report" if args.report else "pilot",
+            "width": args.width, "mode": args.mode, "format": Path(args.output).suffix,
+        })
+        if cache.fetch_render(key, args.output):
+            print(f"Chart saved to: {args.output} (cached)")
+            return
+
+    import matplotlib
+    if args.output:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    columns = {k: np.asarray(v, dtype=np.float64) for k, v in _columns(args, cache).items()}
+
+    if args.run:
+        C = columns["C"]
+        idx = _select(args, C)
+        plt.plot(idx, C[idx])
+        plt.title("Coherence over time")
+
+    elif args.report:
+        margins = columns["margin"]
+        steps = np.where(np.isnan(columns["t"]), np.arange(len(margins)), columns["t"])
+        idx = _select(args, margins, x=steps, red=columns["red"])
+        plt.figure(figsize=(10, 4))
+        plt.plot(steps[idx], margins[idx], label="Recovery Margin")
+        plt.axhline(0.0, linestyle="--", color="red", alpha=0.5)
+        plt.xlabel("Step")
+        plt.ylabel("Recovery Margin")
+        plt.title("Recovery Margin Over Time")
+        plt.legend()
+        plt.tight_layout()
+
+    else:
+        from datetime import datetime, timezone
+
+        # One selection for both panels so they stay aligned; it follows the
+        # margin, which carries the RED dips.
+        margin = columns["margin"]
+        idx = _select(args, margin, x=columns["timestamp"], red=columns["red"])
+        timestamps = [datetime.fromtimestamp(t, timezone.utc) for t in columns["timestamp"][idx].tolist()]
+        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 6), sharex=True)
+
+        ax1.plot(timestamps, columns["coherence"][idx], "b-", linewidth=2)
+        ax1.axhline(0.6, linestyle="--", color="red", alpha=0.5)
+        ax1.set_ylabel("Coherence C")
+        ax1.grid(True, alpha=0.3)
+        ax1.set_title("Recovery Watchdog - System Health")
+
+        ax2.plot(timestamps, margin[idx], "orange", linewidth=2)
+        ax2.axhline(0.0, linestyle="--", color="black", alpha=0.5)
+        ax2.set_ylabel("Recovery Margin")
+        ax2.set_xlabel("Time")
+        ax2.grid(True, alpha=0.3)
+        plt.tight_layout()
+
+    if args.output:
+        plt.savefig(args.output, dpi=150)
+        if key:
+            cache.store_render(key, args.output)
+        print(f"Chart saved to: {args.output}")
+    else:
+        plt.show()
+
+
+# -------------------------
+# INTEGRITY / SIGNING
+# -------------------------
+def _crypto(name):
+    """A signing primitive from recovery.crypto (disabled in the pilot release)"""
+    from . import crypto
+    return getattr(crypto, name, crypto.crypto_disabled)
+
+
+def _verify_args(p):
+    p.add_argument("--run", required=True, help="Signed run JSON")
+    p.add_argument("--key", help="Public key PEM file (also check the signature)")
+
+
+def _verify(args):
+    import json
+
+    from .integrity import get_run_hash, verify_hash_chain
+
+    with open(args.run, "r", encoding="utf-8-sig") as f:
+        run = json.load(f)
+
+    ok, err = verify_hash_chain(run["step_logs"])
+    if not ok:
+        raise SystemExit(f"Hash chain verification failed: {err}")
+
+    if "run_hash" not in run:
+        raise SystemExit("Run has no run_hash (not signed)")
+    computed = get_run_hash(run["step_logs"])
+    if computed != run["run_hash"]:
+        raise SystemExit("Run hash mismatch")
+
+    if args.key:
+        if "run_signature" not in run:
+            raise SystemExit("Run has no run_signature")
+        pub = Path(args.key).read_bytes()
+        if not _crypto("verify_signature")(run["run_hash"].encode(), run["run_signature"], pub):
+            raise SystemExit("Bad signature")
+
+    print("Verification OK")
+
+
+def _sign_args(p):
+    p.add_argument("--run", required=True, help="Path to experiment_result.json")
+    p.add_argument("--key", required=True, help="Private key PEM file")
+    p.add_argument("--output", required=True, help="Output signed JSON file")
+
+
+def _sign(args):
+    import json
+
+    from .integrity import get_run_hash, verify_hash_chain
+
+    # Load run JSON (BOM-safe)
+    with open(args.run, "r", encoding="utf-8-sig") as f:
+        run_data = json.load(f)
+
+    if "step_logs" not in run_data:
+        raise SystemExit("Run file missing 'step_logs'")
+
+    ok, err = verify_hash_chain(run_data["step_logs"])
+    if not ok:
+        raise SystemExit(f"Hash chain verification failed: {err}")
+
+    print(f"✓ Hash chain verified ({len(run_data['step_logs'])} steps)")
+
+    run_hash = get_run_hash(run_data["step_logs"])
+    print(f"✓ Run hash: {run_hash}")
+
+    private_key = Path(args.key).read_bytes()
+    signature = _crypto("sign_data")(run_hash.encode("utf-8"), private_key)
+
+    run_data["run_hash"] = run_hash
+    run_data["run_signature"] = signature
+    run_data["signer_key"] = Path(args.key).stem
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(run_data, f, indent=2)
+
+    print(f"✓ Signed run saved to: {args.output}")
+
+
+def _keygen_args(p):
+    p.add_argument("--output", required=True, help="Key name (no extension)")
+
+
+def _keygen(args):
+    base = Path(args.output)
+    priv = base.with_suffix(".private.pem")
+    pub = base.with_suffix(".public.pem")
+
+    if priv.exists() or pub.exists():
+        print("Keys already exist.")
+        return
+
+    private_pem, public_pem = _crypto("generate_keypair")()
+
+    priv.parent.mkdir(parents=True, exist_ok=True)
+    priv.write_bytes(private_pem)
+    priv.chmod(0o600)
+    pub.write_bytes(public_pem)
+
+    print("Keys generated:")
+    print(priv)
+    print(pub)
+
+
+# -------------------------
+# BENCH
+# -------------------------
+def _bench_args(p):
+    p.add_argument(
+        "args", nargs=argparse.REMAINDER,
+        help="[name] [options]: benchmarks/bench_<name>.py, default the run.py suite",
+    )
+
+
+def _bench(args):
+    import runpy
+
+    bench_dir = ROOT / "benchmarks"
+    if not bench_dir.is_dir():
+        raise SystemExit("benchmarks/ is only available in a source checkout")
+
+    argv = list(args.args)
+    script = bench_dir / "run.py"
+    if argv and not argv[0].startswith("-"):
+        script = bench_dir / f"bench_{argv.pop(0)}.py"
+        if not script.exists():
+            names = sorted(p.stem[len("bench_"):] for p in bench_dir.glob("bench_*.py"))
+            raise SystemExit(f"Unknown benchmark; choose from: {', '.join(names)}")
+
+    saved = sys.argv, list(sys.path)
+    sys.path.insert(0, str(bench_dir))
+    sys.argv = [str(script), *argv]
+    try:
+        runpy.run_path(str(script), run_name="__main__")
+    finally:
+        sys.argv, sys.path[:] = saved
+
+
+# -------------------------
+# ENTRY POINT
+# -------------------------
+COMMANDS = {
+    "detect": ("Replay a run through the recovery-debt detector", _detect_args, _detect),
+    "chart": ("Plot coherence / recovery margin", _chart_args, _chart),
+    "verify": ("Verify a run's hash chain (and signature)", _verify_args, _verify),
+    "sign": ("Sign a coherence-engine run", _sign_args, _sign),
+    "keygen": ("Generate signing keypair", _keygen_args, _keygen),
+    "bench": ("Run the benchmark suite or one bench_<name>.py", _bench_args, _bench),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from . import __version__
+
+    parser = argparse.ArgumentParser(prog="recovery", description="Recovery Debt Detector tools")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+    for name, (help_text, add_arguments, handler) in COMMANDS.items():
+        p = sub.add_parser(name, help=help_text, description=help_text)
+        add_arguments(p)
+        p.set_defaults(handler=handler)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except NotImplementedError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    main()
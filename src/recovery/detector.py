@@ -1,5 +1,9 @@
 from dataclasses import dataclass
 
+# Alert codes used by the array APIs; ALERT_LEVELS[code] is the label.
+GREEN, YELLOW, RED = 0, 1, 2
+ALERT_LEVELS = ("GREEN", "YELLOW", "RED")
+
 
 @dataclass
 class Metrics:
@@ -31,3 +35,22 @@ class RecoveryDebtDetector:
             alert = "GREEN"
 
         return Metrics(recovery_margin=margin), alert
+
+    def update_many(self, C, beta):
+        """
+        Array form of update() for many independent targets at once
+        (beta may be one value for all of them).
+
+        Returns (margins, alert_codes) where alert_codes index ALERT_LEVELS.
+        """
+        import numpy as np
+
+        C = np.asarray(C, dtype=np.float64)
+        beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), C.shape)
+
+        margins = np.maximum((C - self.c_baseline) / self.c_baseline, 0.0)
+
+        codes = np.where(beta > self.beta_base, YELLOW, GREEN).astype(np.uint8)
+        codes[margins == 0.0] = RED
+
+        return margins, codes
@@ -0,0 +1,116 @@
+"""
+downsample.py
+
+Reduce long series to roughly one point per pixel before plotting.
+
+Two modes, both returning sorted indices into the input so the same
+selection can be applied to every column (timestamps, C, margin, alert):
+
+- lttb:   Largest-Triangle-Three-Buckets. Keeps the point of each bucket
+          that forms the largest triangle with the previously kept point
+          and the mean of the next bucket; preserves the visual shape.
+- minmax: the minimum and maximum of each bucket; preserves the envelope
+          (every spike and dip) at two points per bucket.
+
+`protect` marks points that must not be averaged away (e.g. RED alerts):
+the lowest protected point of every bucket that contains one is added to
+the selection, so a one-step RED dip survives any reduction.
+"""
+
+import numpy as np
+
+MODES = ("lttb", "minmax")
+
+
+def _bucket_starts(n: int, buckets: int) -> np.ndarray:
+    """Start index of each of `buckets` near-equal buckets over [0, n), plus n"""
+    return (np.arange(buckets + 1, dtype=np.int64) * n) // buckets
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets selection of n_out points."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = y.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n, dtype=np.int64)
+
+    # First and last points are always kept; the n-2 in between are split
+    # into n_out-2 buckets.
+    edges = 1 + _bucket_starts(n - 2, n_out - 2)
+
+    # Mean of every bucket in one pass via prefix sums; the "next bucket"
+    # of the final bucket is the last point.
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    size = np.diff(edges)
+    mean_x = np.append((cx[edges[1:]] - cx[edges[:-1]]) / size, x[-1])
+    mean_y = np.append((cy[edges[1:]] - cy[edges[:-1]]) / size, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for j in range(n_out - 2):
+        lo, hi = edges[j], edges[j + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - mean_x[j + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[j + 1] - ay))
+        a = lo + int(area.argmax())
+        out[j + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Minimum and maximum of each of n_out // 2 buckets (plus both ends)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = y.size
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n, dtype=np.int64)
+
+    # Pad to a rectangle so argmin/argmax run over all buckets at once
+    width = -(-n // buckets)
+    lows = np.full(buckets * width, np.inf)
+    highs = np.full(buckets * width, -np.inf)
+    lows[:n] = y
+    highs[:n] = y
+
+    base = np.arange(buckets, dtype=np.int64) * width
+    picks = np.concatenate((
+        [0, n - 1],
+        base + lows.reshape(buckets, width).argmin(axis=1),
+        base + highs.reshape(buckets, width).argmax(axis=1),
+    ))
+    return np.unique(picks[picks < n])
+
+
+def protected_minima(y: np.ndarray, protect: np.ndarray, buckets: int) -> np.ndarray:
+    """Lowest protected point of each bucket that contains one."""
+    idx = np.flatnonzero(protect)
+    if not idx.size:
+        return idx
+    bucket = idx * buckets // np.asarray(y).size
+    order = np.lexsort((np.asarray(y, dtype=np.float64)[idx], bucket))
+    first = np.concatenate(([True], np.diff(bucket[order]) != 0))
+    return idx[order[first]]
+
+
+def downsample_indices(y, n_out: int, x=None, mode: str = "lttb", protect=None) -> np.ndarray:
+    """
+    Indices of at most ~n_out points of y that keep its shape.
+    x defaults to the sample index; protect is an optional boolean mask.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    y = np.asarray(y, dtype=np.float64)
+    if y.size <= n_out:
+        return np.arange(y.size, dtype=np.int64)
+
+    if mode == "lttb":
+        x = np.arange(y.size, dtype=np.float64) if x is None else x
+        idx = lttb_indices(x, y, n_out)
+    else:
+        idx = minmax_indices(y, n_out)
+
+    if protect is not None:
+        idx = np.union1d(idx, protected_minima(y, protect, n_out))
+    return idx
@@ -0,0 +1,180 @@
+"""
+forecast.py
+
+Streaming time-to-RED forecast on top of RecoveryDebtDetector.
+
+The recovery margin series is tracked with Holt's linear (level + trend)
+smoothing adapted to irregular sample spacing, plus an exponentially
+weighted variance of the one-step residual. Each update is O(1) in time
+and memory. The trend (margin per second) extrapolates to the margin
+hitting zero, i.e. the detector going RED.
+
+The confidence band propagates the residual variance over the horizon
+with the Holt / ETS(A,A,N) h-step forecast variance
+
+    var(h) = s2 * (1 + (h - 1) * (a^2 + a*b*h + b^2 * h * (2h - 1) / 6))
+
+(a = alpha, b = alpha * beta_trend, h in samples), and turns it into a
+spread on the crossing time: z * sqrt(var(point)) / |trend|.
+
+Forecast alert levels come from classify_alert() (which takes percent)
+on the optimistic end of the band, so the forecast uses the same margin
+and step thresholds as the rest of the package.
+"""
+
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+from .alerts import classify_alert
+from .detector import Metrics, RecoveryDebtDetector
+from .metrics import compute_confidence, estimate_steps_to_irreversible
+
+_SEVERITY = {"GREEN": 0, "YELLOW": 1, "RED": 2}
+
+
+@dataclass
+class ForecastMetrics(Metrics):
+    """Metrics plus the time-to-RED forecast (seconds, None = not declining)."""
+    trend: float = 0.0
+    seconds_to_red: Optional[int] = None
+    seconds_to_red_low: Optional[int] = None
+    seconds_to_red_high: Optional[int] = None
+    confidence: float = 0.0
+
+
+class ForecastingDetector:
+    """
+    Drop-in replacement for RecoveryDebtDetector: update(C, beta) returns
+    (metrics, alert) with metrics.recovery_margin as before.
+
+    The alert is the base detector's alert, escalated GREEN -> YELLOW when
+    classify_alert() rates the margin warn_horizon seconds ahead worse than
+    the margin now, even at the optimistic end of a one-sided z_alert band
+    (0.67 ~ 75% confidence; z sets the reported seconds_to_red band). A
+    forecast never downgrades an alert.
+    """
+
+    def __init__(
+        self,
+        beta_base: float = 1.1,
+        c_baseline: float = 0.6,
+        alpha: float = 0.3,
+        beta_trend: float = 0.1,
+        z: float = 1.96,
+        z_alert: float = 0.67,
+        warn_horizon: float = 900.0,
+        min_samples: int = 5,
+    ):
+        self.detector = RecoveryDebtDetector(beta_base=beta_base, c_baseline=c_baseline)
+        self.alpha = alpha
+        self.beta_trend = beta_trend
+        self.z = z
+        self.z_alert = z_alert
+        self.warn_horizon = warn_horizon
+        self.min_samples = min_samples
+
+        self.level = None
+        self.trend = 0.0
+        self.residual_var = 0.0
+        self.interval = None
+        self.samples = 0
+        self.last_time = None
+        self.recent = deque(maxlen=6)
+
+    @property
+    def beta_base(self):
+        return self.detector.beta_base
+
+    @property
+    def c_baseline(self):
+        return self.detector.c_baseline
+
+    def _smooth(self, margin: float, now: float):
+        if self.level is None:
+            self.level = margin
+            self.last_time = now
+            return
+
+        dt = now - self.last_time
+        self.last_time = now
+        if dt <= 0:
+            # Same timestamp: fold into the level only
+            self.level += self.alpha * (margin - self.level)
+            return
+
+        predicted = self.level + self.trend * dt
+        error = margin - predicted
+
+        self.level = predicted + self.alpha * error
+        self.trend += self.alpha * self.beta_trend * error / dt
+
+        a = self.alpha
+        self.residual_var = (1 - a) * self.residual_var + a * error * error
+        self.interval = dt if self.interval is None else (1 - a) * self.interval + a * dt
+
+    def forecast_var(self, seconds: float) -> float:
+        """Variance of the margin forecast `seconds` ahead"""
+        h = max(seconds / self.interval, 1.0) if self.interval else 1.0
+        a = self.alpha
+        b = self.alpha * self.beta_trend
+        return self.residual_var * (1 + (h - 1) * (a * a + a * b * h + b * b * h * (2 * h - 1) / 6))
+
+    def forecast(self):
+        """(point, low, high) seconds until margin reaches zero; None = never"""
+        if self.level is None or self.samples < self.min_samples:
+            return None, None, None
+        level = max(self.level, 0.0)
+        point = estimate_steps_to_irreversible(level, self.trend)
+        if point is None:
+            return None, None, None
+        # Margin uncertainty at the crossing, as time at the current slope
+        spread = self.z * self.forecast_var(point) ** 0.5 / -self.trend
+        return point, max(int(point - spread), 0), int(point + spread)
+
+    def forecast_alert(self) -> str:
+        """classify_alert() of the optimistic forecast warn_horizon seconds ahead"""
+        if self.level is None or self.samples < self.min_samples:
+            return "GREEN"
+        horizon = self.warn_horizon
+        # Uncertainty of the smoothed margin itself, without the noise of
+        # a new sample on top
+        spread = self.z_alert * max(self.forecast_var(horizon) - self.residual_var, 0.0) ** 0.5
+        margin = self.level + self.trend * horizon + spread
+        _, _, high = self.forecast()
+        steps = None
+        if high is not None and self.interval:
+            steps = int(high / self.interval)
+        return classify_alert(100 * max(margin, 0.0), steps)
+
+    def update(self, C: float, beta: float, now: float = None):
+        """
+        Compute recovery margin, alert level and time-to-RED forecast.
+        """
+        now = time.time() if now is None else now
+        base, alert = self.detector.update(C, beta)
+        margin = base.recovery_margin
+
+        self._smooth(margin, now)
+        self.samples += 1
+        self.recent.append(margin)
+
+        point, low, high = self.forecast()
+        confidence = compute_confidence(list(self.recent))
+
+        if alert == "GREEN" and self.level is not None:
+            # Compare against the smoothed margin now so that the margin
+            # level alone never escalates (that is the base detector's call).
+            now_level = classify_alert(100 * max(self.level, 0.0), None)
+            if _SEVERITY[self.forecast_alert()] > _SEVERITY[now_level]:
+                alert = "YELLOW"
+
+        return ForecastMetrics(
+            recovery_margin=margin,
+            trend=self.trend,
+            seconds_to_red=point,
+            seconds_to_red_low=low,
+            seconds_to_red_high=high,
+            confidence=confidence,
+        ), alert
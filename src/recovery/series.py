@@ -0,0 +1,69 @@
+"""
+series.py
+
+Whole-series detector for offline replay.
+
+detect_series() runs the recovery-debt detector over complete C / beta
+arrays in a single NumPy pass instead of one update() call per step. The
+stateful parts of the online pipeline are expressed as array operations:
+
+- slope: per-step margin change (compute_debt_slope), via a shifted diff
+- red_run: consecutive steps with margin <= red_threshold (the sidecar's
+  RED hysteresis counter), via a running maximum of the last reset index
+- trigger: first step where red_run reaches red_count_limit, or -1
+
+Results are identical to calling RecoveryDebtDetector.update step by step.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from .detector import ALERT_LEVELS, RecoveryDebtDetector
+
+
+class SeriesResult(NamedTuple):
+    margins: np.ndarray      # float64
+    alerts: np.ndarray       # uint8 codes, ALERT_LEVELS[code] is the label
+    slope: np.ndarray        # float64, 0.0 at the first step
+    red_run: np.ndarray      # int64 consecutive near-zero margin steps
+    trigger: int             # first index with red_run >= limit, or -1
+
+    def alert_labels(self) -> np.ndarray:
+        return np.asarray(ALERT_LEVELS)[self.alerts]
+
+
+def run_lengths(mask: np.ndarray) -> np.ndarray:
+    """Length of the True run ending at each position (0 where False)."""
+    mask = np.asarray(mask, dtype=bool)
+    idx = np.arange(mask.size, dtype=np.int64)
+    last_reset = np.maximum.accumulate(np.where(mask, -1, idx))
+    return np.where(mask, idx - last_reset, 0)
+
+
+def detect_series(
+    C,
+    beta,
+    detector: RecoveryDebtDetector = None,
+    red_threshold: float = 0.01,
+    red_count_limit: int = 5,
+) -> SeriesResult:
+    """
+    Compute margins, alert codes, slope and RED hysteresis for whole arrays.
+    beta may be a scalar (broadcast over C).
+    """
+    detector = detector or RecoveryDebtDetector()
+    C = np.asarray(C, dtype=np.float64)
+    beta = np.broadcast_to(np.asarray(beta, dtype=np.float64), C.shape)
+
+    margins, alerts = detector.update_many(C, beta)
+
+    slope = np.zeros_like(margins)
+    if margins.size > 1:
+        np.subtract(margins[1:], margins[:-1], out=slope[1:])
+
+    red_run = run_lengths(margins <= red_threshold)
+    hits = np.flatnonzero(red_run >= red_count_limit)
+    trigger = int(hits[0]) if hits.size else -1
+
+    return SeriesResult(margins, alerts, slope, red_run, trigger)
@@ -0,0 +1,290 @@
+"""
+timing.py
+
+Lightweight stage timing for the monitoring pipeline.
+
+    from recovery import timing
+
+    with timing.stage("collect"):
+        metrics = collector.collect()
+
+Timing is off unless RECOVERY_TIMING=1 (or enable() is called). While off,
+stage() hands back a shared no-op context manager, so the cost is one
+function call per stage. Durations go into HDR-style log-linear
+histograms (~3% relative precision), which can be dumped on SIGUSR1,
+served as JSON over HTTP, or read with snapshot().
+
+RECOVERY_PROFILE_STEPS=N additionally captures N steps with cProfile
+(every RECOVERY_PROFILE_EVERY-th step) into RECOVERY_PROFILE_OUT.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("RECOVERY_TIMING", "").lower() in ("1", "true", "yes")
+
+_SUB_BITS = 5
+_SUB = 1 << _SUB_BITS            # sub-buckets per power of two
+_MAX_SHIFT = 40                  # ~18 minutes in ns
+_BUCKETS = (_MAX_SHIFT + 2) * _SUB
+
+
+def _index(ns: int) -> int:
+    if ns < 2 * _SUB:
+        return max(ns, 0)
+    shift = min(ns.bit_length() - _SUB_BITS - 1, _MAX_SHIFT)
+    return (shift + 1) * _SUB + min((ns >> shift) - _SUB, _SUB - 1)
+
+
+def _lower_bound(index: int) -> int:
+    if index < 2 * _SUB:
+        return index
+    shift = index // _SUB - 1
+    return (index % _SUB + _SUB) << shift
+
+
+class Histogram:
+    """
+    Log-linear histogram of nanosecond durations.
+
+    Shared by every thread timing the same stage, so updates hold a lock.
+    It is reentrant because the SIGUSR1 dump runs snapshot() on the main
+    thread, possibly in the middle of that thread's own record().
+    """
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self._lock = threading.RLock()
+
+    def record(self, ns: int):
+        index = _index(ns)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += ns
+            if self.min is None or ns < self.min:
+                self.min = ns
+            if ns > self.max:
+                self.max = ns
+
+    def percentile(self, p: float) -> int:
+        if not self.count:
+            return 0
+        rank = max(1, int(round(p / 100.0 * self.count)))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_lower_bound(index), self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        us = 1e-3
+        with self._lock:
+            return {
+                "count": self.count,
+                "total_ms": self.total * 1e-6,
+                "mean_us": self.total / self.count * us if self.count else 0.0,
+                "min_us": (self.min or 0) * us,
+                "p50_us": self.percentile(50) * us,
+                "p90_us": self.percentile(90) * us,
+                "p99_us": self.percentile(99) * us,
+                "max_us": self.max * us,
+            }
+
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+def histogram(name: str) -> Histogram:
+    hist = _histograms.get(name)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+
+class _Stage:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record(time.perf_counter_ns() - self.start)
+        return False
+
+
+_NULL = contextlib.nullcontext()
+
+
+def stage(name: str):
+    """Context manager timing one pipeline stage (no-op while disabled)."""
+    if not ENABLED:
+        return _NULL
+    return _Stage(histogram(name))
+
+
+def timed(name: str = None):
+    """Decorator form of stage(); checks ENABLED on every call."""
+    def decorate(fn):
+        label = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            with _Stage(histogram(label)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+
+def snapshot() -> dict:
+    return {name: hist.snapshot() for name, hist in sorted(list(_histograms.items()))}
+
+
+def report() -> str:
+    lines = [
+        f"{'stage':<28} {'count':>9} {'mean us':>10} {'p50 us':>10} "
+        f"{'p99 us':>10} {'max us':>10} {'total ms':>10}"
+    ]
+    for name, s in snapshot().items():
+        lines.append(
+            f"{name:<28} {s['count']:>9} {s['mean_us']:>10.1f} {s['p50_us']:>10.1f} "
+            f"{s['p99_us']:>10.1f} {s['max_us']:>10.1f} {s['total_ms']:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+# -------------------------
+# EXPORT
+# -------------------------
+def install_signal_handler(sig=None, stream=None):
+    """Print report() to stderr whenever the process receives SIGUSR1."""
+    sig = sig or getattr(signal, "SIGUSR1", None)
+    if sig is None:
+        return False
+
+    def dump(signum, frame):
+        print(report(), file=stream or sys.stderr, flush=True)
+
+    signal.signal(sig, dump)
+    return True
+
+
+def serve_http(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve snapshot() as JSON on http://host:port/ from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(snapshot()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="timing-http", daemon=True).start()
+    return server
+
+
+# -------------------------
+# PROFILING
+# -------------------------
+class StepProfiler:
+    """
+    cProfile capture of `steps` loop iterations, sampling every `every`-th
+    one, written to `path` (pstats format) once enough steps were seen.
+
+    Call tick() once at the top of every loop iteration: it closes the
+    previous captured step (if any) and decides whether to capture this one.
+    """
+
+    def __init__(self, steps: int, path: str, every: int = 1):
+        self.remaining = steps
+        self.path = path
+        self.every = max(1, every)
+        self._seen = 0
+        self._active = False
+        self._profile = cProfile.Profile()
+
+    def tick(self):
+        if self._active:
+            self._profile.disable()
+            self._active = False
+            self.remaining -= 1
+            if self.remaining == 0:
+                self._profile.dump_stats(self.path)
+                print(f"[timing] profile written to {self.path}", file=sys.stderr)
+
+        self._seen += 1
+        if self.remaining > 0 and self._seen % self.every == 0:
+            self._active = True
+            self._profile.enable()
+
+
+class _NoProfiler:
+    def tick(self):
+        pass
+
+
+def profiler_from_env():
+    """StepProfiler configured by RECOVERY_PROFILE_*, or a no-op stand-in."""
+    steps = int(os.environ.get("RECOVERY_PROFILE_STEPS", "0"))
+    if steps <= 0:
+        return _NoProfiler()
+    return StepProfiler(
+        steps,
+        os.environ.get("RECOVERY_PROFILE_OUT", "recovery_profile.pstats"),
+        int(os.environ.get("RECOVERY_PROFILE_EVERY", "1")),
+    )
+
+
+def install_from_env():
+    """
+    Wire up exporters for a long-running entry point:
+    SIGUSR1 dump when timing is enabled, and an HTTP endpoint when
+    RECOVERY_TIMING_PORT is set. Returns the step profiler.
+    """
+    if ENABLED:
+        install_signal_handler()
+        port = os.environ.get("RECOVERY_TIMING_PORT")
+        if port:
+            serve_http(int(port))
+    return profiler_from_env()
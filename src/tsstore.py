@@ -0,0 +1,712 @@
+"""
+tsstore.py
+
+Compressed metrics storage (Gorilla-style) for the SaaS database.
+
+Samples are appended per agent into an in-memory block:
+
+- timestamps (epoch ms): first value raw, then delta-of-delta with
+  variable-length prefixes
+- float columns: first value raw, then XOR with the previous value,
+  storing only the meaningful bits (reusing the previous leading/trailing
+  zero window when it fits)
+- alert level: dictionary-encoded, one bit when unchanged
+
+A block is sealed into the metric_blocks table once it holds max_samples
+samples, max_bytes bytes or spans max_block_seconds; flush() seals every
+open block. Reads decode only the blocks overlapping the requested range,
+plus the open block.
+
+Open blocks live in memory. Each process also appends every sample to
+its own recovery log (<db>.open.<pid>.<n>, flock-held while in use) and,
+every checkpoint_seconds of sample time, copies the open blocks that
+changed into metric_open in the caller's transaction; log segments older
+than a committed checkpoint are deleted. Sealing a block deletes its
+metric_open row. The first append for an agent in a process rebuilds its
+open block from metric_open, after merging any log segments left by a
+process that died. The log is flushed to the OS on every append but not
+fsync'd: a crashed or killed process loses nothing, a power loss can lose
+the samples since the last checkpoint. Processes that don't hold an
+agent's open block read its unsealed samples from metric_open, so they
+can be up to one checkpoint behind.
+"""
+
+import contextlib
+import glob
+import json
+import math
+import os
+import sqlite3
+import struct
+import threading
+import time
+from itertools import count
+
+try:
+    import fcntl
+except ImportError:  # Windows: logs can't be told apart from a live process's
+    fcntl = None
+
+FLOAT_COLUMNS = ('coherence', 'recovery_margin', 'cpu_usage', 'mem_usage', 'error_rate')
+
+# metric_open rows newer than the agent's last sealed block
+_UNSEALED = "o.last_ts > COALESCE((SELECT MAX(end_ts) FROM metric_blocks b WHERE b.agent_id = o.agent_id), -1)"
+
+# Recovery log record: agent id length, agent id, then timestamp, float
+# columns and alert level length (_NO_LEVEL for None), then the level
+_LOG_HEAD = struct.Struct('>H')
+_LOG_BODY = struct.Struct(f'>q{len(FLOAT_COLUMNS)}dB')
+_NO_LEVEL = 0xFF
+_segment_ids = count()
+
+# Delta-of-delta buckets: (prefix bits, prefix length, value bits)
+_DOD_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 12),
+    (0b1110, 4, 20),
+)
+_DOD_FALLBACK = (0b1111, 4, 64)
+
+
+def _float_bits(value) -> int:
+    if value is None:
+        value = math.nan
+    return struct.unpack('>Q', struct.pack('>d', float(value)))[0]
+
+
+class BitWriter:
+    """Append-only bit stream; whole bytes are moved out of the accumulator"""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.acc = 0
+        self.pending = 0
+
+    def write(self, value: int, bits: int):
+        self.acc = (self.acc << bits) | (value & ((1 << bits) - 1))
+        self.pending += bits
+        if self.pending >= 64:
+            keep = self.pending & 7
+            nbytes = self.pending >> 3
+            self.buf += (self.acc >> keep).to_bytes(nbytes, 'big')
+            self.acc &= (1 << keep) - 1
+            self.pending = keep
+
+    def __len__(self):
+        """Bits written so far"""
+        return len(self.buf) * 8 + self.pending
+
+    def getvalue(self) -> bytes:
+        pad = -self.pending % 8
+        tail = (self.acc << pad).to_bytes((self.pending + pad) // 8, 'big')
+        return bytes(self.buf) + tail
+
+
+class _XorState:
+    __slots__ = ('prev', 'leading', 'trailing')
+
+    def __init__(self, first: int):
+        self.prev = first
+        self.leading = 65    # no window yet
+        self.trailing = 0
+
+
+class BlockEncoder:
+    """Open (unsealed) block for one agent"""
+
+    def __init__(self, timestamp_ms: int, metrics: dict):
+        self.out = BitWriter()
+        self.count = 1
+        self.start_ts = self.last_ts = timestamp_ms
+        self.delta = 0
+        self.levels = []
+        self.level = None
+
+        self.out.write(timestamp_ms, 64)
+        self.xor = []
+        for column in FLOAT_COLUMNS:
+            bits = _float_bits(metrics.get(column))
+            self.out.write(bits, 64)
+            self.xor.append(_XorState(bits))
+        self._write_level(metrics.get('alert_level'), first=True)
+
+    def _write_level(self, level, first=False):
+        if not first and level == self.level:
+            self.out.write(0, 1)
+            return
+        if level not in self.levels:
+            if len(self.levels) == 16:
+                raise ValueError("more than 16 distinct alert levels in one block")
+            self.levels.append(level)
+        if not first:
+            self.out.write(1, 1)
+        self.out.write(self.levels.index(level), 4)
+        self.level = level
+
+    def append(self, timestamp_ms: int, metrics: dict):
+        out = self.out
+
+        delta = timestamp_ms - self.last_ts
+        dod = delta - self.delta
+        self.delta = delta
+        self.last_ts = timestamp_ms
+        if dod == 0:
+            out.write(0, 1)
+        else:
+            for prefix, plen, vbits in _DOD_BUCKETS + (_DOD_FALLBACK,):
+                if vbits == 64 or -(1 << (vbits - 1)) <= dod < (1 << (vbits - 1)):
+                    out.write(prefix, plen)
+                    out.write(dod, vbits)
+                    break
+
+        for column, state in zip(FLOAT_COLUMNS, self.xor):
+            bits = _float_bits(metrics.get(column))
+            xor = bits ^ state.prev
+            state.prev = bits
+            if xor == 0:
+                out.write(0, 1)
+                continue
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if leading >= state.leading and trailing >= state.trailing:
+                out.write(0b10, 2)
+                out.write(xor >> state.trailing, 64 - state.leading - state.trailing)
+            else:
+                meaningful = 64 - leading - trailing
+                out.write(0b11, 2)
+                out.write(leading, 5)
+                out.write(meaningful - 1, 6)
+                out.write(xor >> trailing, meaningful)
+                state.leading, state.trailing = leading, trailing
+
+        self._write_level(metrics.get('alert_level'))
+        self.count += 1
+
+    def nbytes(self) -> int:
+        return (len(self.out) + 7) // 8
+
+    def getvalue(self) -> bytes:
+        return self.out.getvalue()
+
+
+def _log_head(agent_id: str) -> bytes:
+    agent = agent_id.encode()
+    return _LOG_HEAD.pack(len(agent)) + agent
+
+
+def _log_record(head: bytes, timestamp_ms: int, metrics: dict) -> bytes:
+    """Log record for a sample; head is _log_head(agent_id)"""
+    values = [metrics.get(c) for c in FLOAT_COLUMNS]
+    if None in values:
+        values = [math.nan if v is None else v for v in values]
+    level = metrics.get('alert_level')
+    if level is None:
+        return head + _LOG_BODY.pack(timestamp_ms, *values, _NO_LEVEL)
+    level = level.encode()
+    return head + _LOG_BODY.pack(timestamp_ms, *values, len(level)) + level
+
+
+def _read_log(data: bytes) -> list:
+    """(agent_id, timestamp_ms, metrics) records of a log segment; a torn tail is dropped"""
+    records = []
+    pos, end = 0, len(data)
+    while pos + _LOG_HEAD.size <= end:
+        (agent_len,) = _LOG_HEAD.unpack_from(data, pos)
+        body = pos + _LOG_HEAD.size + agent_len
+        if body + _LOG_BODY.size > end:
+            break
+        agent_id = data[pos + _LOG_HEAD.size:body].decode()
+        timestamp_ms, *values, level_len = _LOG_BODY.unpack_from(data, body)
+        pos = body + _LOG_BODY.size
+        level = None
+        if level_len != _NO_LEVEL:
+            if pos + level_len > end:
+                break
+            level = data[pos:pos + level_len].decode()
+            pos += level_len
+        metrics = {c: (None if v != v else v) for c, v in zip(FLOAT_COLUMNS, values)}
+        metrics['alert_level'] = level
+        records.append((agent_id, timestamp_ms, metrics))
+    return records
+
+
+def _rebuild(samples: list) -> BlockEncoder:
+    """Open block holding (timestamp_ms, metrics) samples, oldest first"""
+    (ts, metrics), rest = samples[0], samples[1:]
+    block = BlockEncoder(ts, metrics)
+    for ts, metrics in rest:
+        block.append(max(ts, block.last_ts), metrics)
+    return block
+
+
+def _snapshot(agent_id: str, block: BlockEncoder) -> tuple:
+    """metric_open / metric_blocks row values for a block"""
+    return (agent_id, block.start_ts, block.last_ts, block.count,
+            json.dumps(block.levels), block.getvalue())
+
+
+def decode_block(data: bytes, count: int, levels: list) -> list:
+    """Decode a block into a list of (timestamp_ms, {column: value, 'alert_level': level})"""
+    # The block is expanded into a '0'/'1' string once; slicing it is much
+    # cheaper in Python than per-read integer shifting.
+    bits = format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b')
+    pos = 64
+    ts = int(bits[:64], 2)
+    prev = []
+    for _ in FLOAT_COLUMNS:
+        prev.append(int(bits[pos:pos + 64], 2))
+        pos += 64
+    level = levels[int(bits[pos:pos + 4], 2)]
+    pos += 4
+    windows = [(0, 0)] * len(FLOAT_COLUMNS)
+    columns = range(len(FLOAT_COLUMNS))
+
+    # Raw float bits are collected and converted in one struct call at the end
+    stamps, raw, level_seq = [ts], list(prev), [level]
+    delta = 0
+    for _ in range(count - 1):
+        if bits[pos] == '1':
+            if bits[pos + 1] == '0':
+                vbits, pos = 7, pos + 2
+            elif bits[pos + 2] == '0':
+                vbits, pos = 12, pos + 3
+            elif bits[pos + 3] == '0':
+                vbits, pos = 20, pos + 4
+            else:
+                vbits, pos = 64, pos + 4
+            dod = int(bits[pos:pos + vbits], 2)
+            pos += vbits
+            if dod >= 1 << (vbits - 1):
+                dod -= 1 << vbits
+            delta += dod
+        else:
+            pos += 1
+        ts += delta
+
+        for i in columns:
+            if bits[pos] == '0':
+                pos += 1
+                continue
+            if bits[pos + 1] == '0':
+                pos += 2
+                leading, trailing = windows[i]
+            else:
+                leading = int(bits[pos + 2:pos + 7], 2)
+                meaningful = int(bits[pos + 7:pos + 13], 2) + 1
+                pos += 13
+                trailing = 64 - leading - meaningful
+                windows[i] = (leading, trailing)
+            n = 64 - leading - trailing
+            prev[i] ^= int(bits[pos:pos + n], 2) << trailing
+            pos += n
+
+        if bits[pos] == '1':
+            level = levels[int(bits[pos + 1:pos + 5], 2)]
+            pos += 5
+        else:
+            pos += 1
+
+        stamps.append(ts)
+        raw.extend(prev)
+        level_seq.append(level)
+
+    width = len(FLOAT_COLUMNS)
+    values = struct.unpack(f'>{len(raw)}d', struct.pack(f'>{len(raw)}Q', *raw))
+    samples = []
+    for k, (ts, level) in enumerate(zip(stamps, level_seq)):
+        row = {
+            c: (None if v != v else v)
+            for c, v in zip(FLOAT_COLUMNS, values[k * width:(k + 1) * width])
+        }
+        row['alert_level'] = level
+        samples.append((ts, row))
+    return samples
+
+
+class CompressedMetricsStore:
+    """
+    Gorilla-compressed metrics for a Database file (metric_blocks table).
+
+    Thread-safe; open blocks live in this process, so each agent should be
+    written by one process (saas_server routes organizations to workers).
+    agents.last_seen is refreshed at most every last_seen_interval seconds.
+    write_lock is the Database's cross-process write lock, taken when
+    orphaned recovery logs are merged.
+    """
+
+    RECOVER_CHUNK = 500     # agent ids per metric_open query (SQLite variable limit)
+
+    def __init__(self, db_path: str, max_samples: int = 1024, max_bytes: int = 16384,
+                 max_block_seconds: float = 3600.0, last_seen_interval: float = 60.0,
+                 checkpoint_seconds: float = 300.0, write_lock=None):
+        self.db_path = db_path
+        self.max_samples = max_samples
+        self.max_bytes = max_bytes
+        self.max_block_ms = int(max_block_seconds * 1000)
+        self.last_seen_interval = last_seen_interval
+        self.checkpoint_ms = int(checkpoint_seconds * 1000)
+        self.write_lock = write_lock or contextlib.nullcontext
+        self.open = {}          # agent_id -> BlockEncoder
+        self.last_seen = {}     # agent_id -> monotonic time of last agents update
+        self.log_heads = {}     # agent_id -> _log_head(agent_id)
+        self.recovered = set()  # agents whose open block this process owns
+        self.dirty = set()      # agents appended to since the last checkpoint
+        self.next_checkpoint = None     # sample time (ms) of the next checkpoint
+        self._log = None        # (path, file) of the segment being appended to
+        self._log_pid = None
+        self._retired = []      # (path, file) segments waiting for a checkpoint to commit
+        self._lock = threading.Lock()
+        self.init_db()
+        self.adopt_orphans()
+
+    def init_db(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metric_blocks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                agent_id TEXT NOT NULL,
+                start_ts INTEGER NOT NULL,
+                end_ts INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                levels TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_metric_blocks_agent_end
+            ON metric_blocks (agent_id, end_ts)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS metric_open (
+                agent_id TEXT PRIMARY KEY,
+                start_ts INTEGER NOT NULL,
+                last_ts INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                levels TEXT NOT NULL,
+                data BLOB NOT NULL
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    # Recovery log and checkpoints
+
+    def _open_segment(self):
+        path = f"{self.db_path}.open.{os.getpid()}.{next(_segment_ids)}"
+        log = open(path, 'ab')
+        if fcntl is not None:
+            fcntl.flock(log, fcntl.LOCK_EX)
+        self._log = (path, log)
+        self._log_pid = os.getpid()
+
+    def _forget_inherited(self):
+        if self._log_pid not in (None, os.getpid()):
+            # Segments inherited over fork belong to the parent
+            self._log, self._retired, self._log_pid = None, [], None
+
+    def _retire_segments(self) -> list:
+        """Close the current segment for appending; returns every segment not yet checkpointed"""
+        self._forget_inherited()
+        segments = self._retired
+        if self._log is not None:
+            segments.append(self._log)
+        self._retired = []
+        self._log = None
+        return segments
+
+    def _checkpoint(self) -> tuple:
+        snapshots = [
+            _snapshot(agent_id, self.open[agent_id])
+            for agent_id in self.dirty if agent_id in self.open
+        ]
+        self.dirty = set()
+        return snapshots, self._retire_segments()
+
+    def checkpoint_done(self, checkpoint: tuple):
+        """The checkpoint's transaction committed: its log segments are obsolete"""
+        for path, log in checkpoint[1]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            log.close()
+
+    def checkpoint_failed(self, checkpoint: tuple):
+        """The checkpoint's transaction failed: keep its segments for the next one"""
+        snapshots, segments = checkpoint
+        with self._lock:
+            self.dirty.update(row[0] for row in snapshots)
+            self._retired = segments + self._retired
+
+    def _open_rows(self, conn, agent_ids: list) -> dict:
+        """agent_id -> (last sealed end_ts or -1, unsealed (data, count, levels) or None)"""
+        found = {}
+        for i in range(0, len(agent_ids), self.RECOVER_CHUNK):
+            chunk = agent_ids[i:i + self.RECOVER_CHUNK]
+            marks = ", ".join("?" * len(chunk))
+            ends = dict(conn.execute(f"""
+                SELECT agent_id, MAX(end_ts) FROM metric_blocks
+                WHERE agent_id IN ({marks}) GROUP BY agent_id
+            """, chunk))
+            for agent_id in chunk:
+                found[agent_id] = (ends.get(agent_id, -1), None)
+            for agent_id, last_ts, data, n, levels in conn.execute(f"""
+                SELECT agent_id, last_ts, data, count, levels FROM metric_open
+                WHERE agent_id IN ({marks})
+            """, chunk):
+                end = found[agent_id][0]
+                if last_ts > end:
+                    found[agent_id] = (end, (data, n, json.loads(levels)))
+        return found
+
+    def adopt_orphans(self):
+        """
+        Merge the log segments of processes that died into metric_open.
+        A segment is orphaned once nobody holds its flock; the merging
+        process holds it until the segment is deleted.
+        """
+        own = {path for path, _ in self._retired}
+        if self._log is not None:
+            own.add(self._log[0])
+        claimed = []
+        for path in glob.glob(glob.escape(self.db_path) + ".open.*"):
+            if path in own:
+                continue
+            try:
+                log = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            if fcntl is not None:
+                try:
+                    fcntl.flock(log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    log.close()
+                    continue
+                if os.fstat(log.fileno()).st_nlink == 0:
+                    # Deleted by its owner after we opened it
+                    log.close()
+                    continue
+            claimed.append((path, log))
+        if not claimed:
+            return
+        try:
+            self._merge(claimed)
+        except Exception:
+            for _, log in claimed:
+                log.close()
+            raise
+        self.checkpoint_done(((), claimed))
+
+    def _merge(self, claimed: list):
+        by_agent = {}
+        for _, log in claimed:
+            for agent_id, ts, metrics in _read_log(log.read()):
+                by_agent.setdefault(agent_id, []).append((ts, metrics))
+        with self._lock:
+            for agent_id in self.recovered:
+                by_agent.pop(agent_id, None)
+
+        snapshots = []
+        conn = sqlite3.connect(self.db_path)
+        for agent_id, (end, current) in self._open_rows(conn, list(by_agent)).items():
+            samples = decode_block(*current) if current else []
+            last = samples[-1][0] if samples else end
+            # Records are in append order per segment; segments may come from
+            # successive owners, so order by time and keep only what's new
+            new = [r for r in sorted(by_agent[agent_id], key=lambda r: r[0]) if r[0] > last]
+            if new:
+                snapshots.append(_snapshot(agent_id, _rebuild(samples + new)))
+        conn.close()
+
+        if snapshots:
+            with self.write_lock():
+                conn = sqlite3.connect(self.db_path)
+                self._write_snapshots(conn.cursor(), snapshots)
+                conn.commit()
+                conn.close()
+
+    @staticmethod
+    def _write_snapshots(cursor, snapshots: list):
+        cursor.executemany("""
+            INSERT INTO metric_open (agent_id, start_ts, last_ts, count, levels, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (agent_id) DO UPDATE SET
+                start_ts = excluded.start_ts, last_ts = excluded.last_ts,
+                count = excluded.count, levels = excluded.levels, data = excluded.data
+            WHERE excluded.last_ts >= metric_open.last_ts
+        """, snapshots)
+
+    def _recover(self, agent_ids: list):
+        """Rebuild the open blocks of agents first seen by this process"""
+        self.adopt_orphans()
+        conn = sqlite3.connect(self.db_path)
+        rows = self._open_rows(conn, agent_ids)
+        conn.close()
+        with self._lock:
+            for agent_id in agent_ids:
+                if agent_id in self.recovered:
+                    continue
+                self.recovered.add(agent_id)
+                current = rows[agent_id][1]
+                if current is not None and agent_id not in self.open:
+                    self.open[agent_id] = _rebuild(decode_block(*current))
+
+    # Writes
+
+    def append(self, rows: list, timestamp: float = None):
+        """
+        Append (agent_id, metrics) rows; returns (sealed blocks, agents whose
+        last_seen is due, checkpoint or None) for the caller to write in its
+        transaction. A checkpoint must be passed to checkpoint_done() or
+        checkpoint_failed() once that transaction has finished.
+        """
+        new = list({agent_id for agent_id, _ in rows} - self.recovered)
+        if new:
+            self._recover(new)
+
+        ts = int((time.time() if timestamp is None else timestamp) * 1000)
+        now = time.monotonic()
+        sealed, seen, records = [], [], []
+        checkpoint = None
+        with self._lock:
+            for agent_id, metrics in rows:
+                block = self.open.get(agent_id)
+                if block is None:
+                    block_ts = ts
+                    self.open[agent_id] = BlockEncoder(ts, metrics)
+                else:
+                    block_ts = max(ts, block.last_ts)
+                    block.append(block_ts, metrics)
+                    if (block.count >= self.max_samples or block.nbytes() >= self.max_bytes
+                            or block.last_ts - block.start_ts >= self.max_block_ms):
+                        sealed.append((agent_id, self.open.pop(agent_id)))
+                head = self.log_heads.get(agent_id)
+                if head is None:
+                    head = self.log_heads[agent_id] = _log_head(agent_id)
+                records.append(_log_record(head, block_ts, metrics))
+                self.dirty.add(agent_id)
+
+                if now - self.last_seen.get(agent_id, -math.inf) >= self.last_seen_interval:
+                    self.last_seen[agent_id] = now
+                    seen.append(agent_id)
+
+            self._forget_inherited()
+            if self._log is None:
+                self._open_segment()
+            log = self._log[1]
+            log.write(b''.join(records))
+            log.flush()
+
+            if self.next_checkpoint is None:
+                self.next_checkpoint = ts + self.checkpoint_ms
+            elif ts >= self.next_checkpoint:
+                self.next_checkpoint = ts + self.checkpoint_ms
+                checkpoint = self._checkpoint()
+        return sealed, seen, checkpoint
+
+    def write_blocks(self, cursor, sealed: list, checkpoint: tuple = None):
+        """Insert sealed blocks (dropping their metric_open rows) and a checkpoint's snapshots"""
+        cursor.executemany("""
+            INSERT INTO metric_blocks (agent_id, start_ts, end_ts, count, levels, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [_snapshot(agent_id, b) for agent_id, b in sealed])
+        cursor.executemany(
+            "DELETE FROM metric_open WHERE agent_id = ? AND last_ts <= ?",
+            [(agent_id, b.last_ts) for agent_id, b in sealed],
+        )
+        if checkpoint:
+            self._write_snapshots(cursor, checkpoint[0])
+
+    def take_open(self) -> tuple:
+        """
+        Remove every open block (for flush/shutdown); returns (blocks to
+        seal, checkpoint retiring the log) like append()
+        """
+        with self._lock:
+            sealed = list(self.open.items())
+            self.open.clear()
+            self.dirty = set()
+            segments = self._retire_segments()
+        return sealed, (([], segments) if segments else None)
+
+    # Reads
+
+    def read(self, agent_id: str, start: float = None, end: float = None) -> list:
+        """Samples for an agent between start and end (epoch seconds, inclusive)"""
+        start_ms = -2 ** 63 if start is None else int(start * 1000)
+        end_ms = 2 ** 63 - 1 if end is None else int(end * 1000)
+
+        with self._lock:
+            in_memory = agent_id in self.recovered
+
+        conn = sqlite3.connect(self.db_path)
+        blocks = conn.execute("""
+            SELECT data, count, levels FROM metric_blocks
+            WHERE agent_id = ? AND end_ts >= ? AND start_ts <= ?
+            ORDER BY start_ts, id
+        """, (agent_id, start_ms, end_ms)).fetchall()
+        if not in_memory:
+            # Open block held by another process (or none since a restart)
+            blocks += conn.execute(f"""
+                SELECT data, count, levels FROM metric_open o
+                WHERE agent_id = ? AND last_ts >= ? AND start_ts <= ? AND {_UNSEALED}
+            """, (agent_id, start_ms, end_ms)).fetchall()
+        conn.close()
+
+        with self._lock:
+            block = self.open.get(agent_id)
+            if block is not None and block.last_ts >= start_ms and block.start_ts <= end_ms:
+                blocks.append((block.getvalue(), block.count, block.levels))
+
+        samples = []
+        for data, count, levels in blocks:
+            if isinstance(levels, str):
+                levels = json.loads(levels)
+            for ts, row in decode_block(data, count, levels):
+                if start_ms <= ts <= end_ms:
+                    row['timestamp'] = ts / 1000.0
+                    samples.append(row)
+        return samples
+
+    def _last_blocks(self, open_blocks: bool = True) -> list:
+        """(agent_id, data, count, levels) of each agent's newest sealed, then unsealed block"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("""
+            SELECT b.agent_id, b.data, b.count, b.levels
+            FROM metric_blocks b
+            JOIN (SELECT agent_id, MAX(id) AS id FROM metric_blocks GROUP BY agent_id) last
+              ON b.id = last.id
+        """).fetchall()
+        opened = conn.execute(f"""
+            SELECT agent_id, data, count, levels FROM metric_open o WHERE {_UNSEALED}
+        """).fetchall()
+        conn.close()
+
+        with self._lock:
+            rows.extend(row for row in opened if row[0] not in self.recovered)
+            if open_blocks:
+                rows.extend(
+                    (agent_id, block.getvalue(), block.count, block.levels)
+                    for agent_id, block in self.open.items()
+                )
+        return rows
+
+    def latest_samples(self) -> dict:
+        """Last sample per agent (sealed blocks, then metric_open, then open blocks)"""
+        latest = {}
+        for agent_id, data, count, levels in self._last_blocks():
+            if isinstance(levels, str):
+                levels = json.loads(levels)
+            ts, sample = decode_block(data, count, levels)[-1]
+            sample['timestamp'] = ts / 1000.0
+            latest[agent_id] = sample
+        return latest
+
+    def latest_levels(self) -> dict:
+        """Last alert level per agent (sealed blocks, then metric_open, then open blocks)"""
+        levels = {
+            agent_id: decode_block(data, count, json.loads(names))[-1][1]['alert_level']
+            for agent_id, data, count, names in self._last_blocks(open_blocks=False)
+        }
+        with self._lock:
+            for agent_id, block in self.open.items():
+                levels[agent_id] = block.level
+        return levels
@@ -0,0 +1,250 @@
+"""
+Alert delivery against local stand-ins: a minimal SMTP server and a
+webhook HTTP server, both on loopback ephemeral ports.
+
+Run: python -m unittest discover tests
+"""
+
+import json
+import socketserver
+import sys
+import threading
+import time
+import unittest
+from email.mime.text import MIMEText
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from alert_delivery import DeliveryChannel, SMTPTransport, WebhookTransport  # noqa: E402
+from alerts import AlertManager  # noqa: E402
+
+REJECTED = 'nobody@example.com'
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+            drop_after = server.drop_after_messages
+        self.reply('220 fake ESMTP')
+        sent = 0
+        rcpts = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode().strip()
+            verb = cmd.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 fake')
+            elif verb == 'MAIL':
+                rcpts = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                if REJECTED in cmd:
+                    self.reply('550 No such user')
+                else:
+                    rcpts.append(cmd)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b''):
+                        break
+                    body.append(data)
+                with server.lock:
+                    server.messages.append(b''.join(body))
+                sent += 1
+                self.reply('250 OK queued')
+                if drop_after is not None and sent >= drop_after:
+                    # Server-side idle timeout: hang up without a reply
+                    return
+            elif verb == 'QUIT':
+                with server.lock:
+                    server.quits += 1
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.quits = 0
+        self.messages = []
+        self.drop_after_messages = None
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def config(self, **extra) -> dict:
+        return dict({
+            'enabled': True,
+            'smtp_server': '127.0.0.1',
+            'smtp_port': self.server_address[1],
+            'sender': 'watchdog@example.com',
+            'recipients': ['ops@example.com'],
+            'starttls': False,
+            'timeout': 5,
+        }, **extra)
+
+
+class FakeWebhookServer(ThreadingHTTPServer):
+    """Records JSON bodies; answers with the queued status codes, then 200"""
+
+    def __init__(self):
+        received, statuses = self.received, self.statuses = [], []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                received.append(json.loads(body))
+                status = statuses.pop(0) if statuses else 200
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}/hook'
+
+
+def message(to: str = 'ops@example.com') -> MIMEText:
+    msg = MIMEText('test')
+    msg['From'] = 'watchdog@example.com'
+    msg['To'] = to
+    msg['Subject'] = 'test'
+    return msg
+
+
+def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class SMTPTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.smtp = FakeSMTPServer()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+
+    def test_reuses_one_connection(self):
+        transport = SMTPTransport(self.smtp.config())
+        for _ in range(3):
+            transport.send(message())
+        transport.close_thread()
+        wait_for(lambda: self.smtp.quits == 1)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 3)
+
+    def test_reconnects_when_server_hangs_up(self):
+        self.smtp.drop_after_messages = 1
+        transport = SMTPTransport(self.smtp.config())
+        transport.send(message())
+        transport.send(message())
+        transport.close_thread()
+        self.assertEqual(self.smtp.connections, 2)
+        self.assertEqual(len(self.smtp.messages), 2)
+
+    def test_rejected_recipient_is_not_resent(self):
+        transport = SMTPTransport(self.smtp.config())
+        with self.assertRaises(Exception):
+            transport.send(message(REJECTED))
+        transport.send(message())
+        transport.close_thread()
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_sync_alert_closes_connection(self):
+        manager = AlertManager({'email': self.smtp.config(), 'delivery': {'async': False}})
+        manager.send_alert('RED', 'margin exhausted', {'coherence': 0.5})
+        wait_for(lambda: self.smtp.quits == 1)
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_async_channel_delivers(self):
+        manager = AlertManager({'email': self.smtp.config()})
+        for agent in ('a', 'b', 'c'):
+            manager.send_alert('RED', 'margin exhausted', {}, org=1, agent=agent)
+        manager.close()
+        self.assertEqual(len(self.smtp.messages), 3)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(manager.delivery_stats()['email']['delivered'], 3)
+
+
+class WebhookTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.hook = FakeWebhookServer()
+        self.addCleanup(self.hook.server_close)
+        self.addCleanup(self.hook.shutdown)
+
+    def test_retries_server_errors(self):
+        self.hook.statuses.extend([500, 503])
+        channel = DeliveryChannel('slack', WebhookTransport(self.hook.url), backoff_base=0.01)
+        channel.enqueue({'text': 'RED'})
+        channel.close()
+        self.assertEqual(len(self.hook.received), 3)
+        stats = channel.stats.snapshot()
+        self.assertEqual((stats['delivered'], stats['retries']), (1, 2))
+
+    def test_slack_alert(self):
+        manager = AlertManager({'slack': {'enabled': True, 'webhook_url': self.hook.url}})
+        manager.send_alert('YELLOW', 'margin falling', {'coherence': 0.7})
+        manager.flush()
+        self.assertEqual(len(self.hook.received), 1)
+        manager.close()
+
+    def test_slack_fields_with_missing_metrics(self):
+        manager = AlertManager({'slack': {'enabled': True, 'webhook_url': self.hook.url}})
+        payload = manager._build_slack_payload('RED', 'down', {'coherence': None, 'margin': 0.0})
+        values = [f['value'] for f in payload['attachments'][0]['fields']]
+        self.assertEqual(values, ['N/A', '0.000', 'N/A%', 'N/A%'])
+        manager.close()
+
+
+class DeliveryChannelTest(unittest.TestCase):
+    def test_close_does_not_block_on_full_queue(self):
+        release = threading.Event()
+
+        class Stuck:
+            def send(self, item):
+                release.wait()
+
+            def close_thread(self):
+                pass
+
+        channel = DeliveryChannel('stuck', Stuck(), queue_size=2)
+        for i in range(3):
+            channel.enqueue(i)
+        start = time.monotonic()
+        channel.close(timeout=0.2)
+        self.assertLess(time.monotonic() - start, 1.0)
+        release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+"""
+The `recovery` command line stays cheap to start: importing it and
+building the parser loads none of the heavy dependencies.
+
+Run: python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from recovery import cli  # noqa: E402
+
+HEAVY = ("numpy", "matplotlib")
+
+PROBE = (
+    "import sys\n"
+    "import recovery.cli\n"
+    "recovery.cli.build_parser().format_help()\n"
+    f"print(' '.join(m for m in {HEAVY!r} if m in sys.modules))\n"
+)
+
+
+class StartupTest(unittest.TestCase):
+    def test_import_skips_heavy_modules(self):
+        env = dict(os.environ, PYTHONPATH=str(ROOT / "src"))
+        loaded = subprocess.run(
+            [sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        self.assertEqual(loaded, [])
+
+    def test_bench_restores_argv(self):
+        argv, path = list(sys.argv), list(sys.path)
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(SystemExit):
+            cli.main(["bench", "startup", "--help"])
+        self.assertEqual(sys.argv, argv)
+        self.assertEqual(sys.path, path)
+
+
+if __name__ == "__main__":
+    unittest.main()
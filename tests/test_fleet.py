@@ -0,0 +1,111 @@
+"""
+Organization-wide views in src/fleet.py: agents that stop reporting
+leave the rollups and rankings after their live window, and correlation
+windows close even when reporting stops.
+
+Run: python -m unittest discover tests
+"""
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.fleet import CorrelationEngine, FleetRollup, WorstAgentIndex  # noqa: E402
+
+
+class FleetRollupTest(unittest.TestCase):
+    def test_silent_agent_leaves_summary(self):
+        fleet = FleetRollup(live_seconds=100)
+        fleet.observe(1, 'quiet', 0.2, 'RED', now=0)
+        for t in range(0, 200, 30):
+            fleet.observe(1, 'busy', 0.9, 'GREEN', now=t)
+
+        summary = fleet.summary(1, now=180)
+        self.assertEqual(summary['agents'], 1)
+        self.assertEqual(summary['alert_levels']['RED'], 0)
+        self.assertAlmostEqual(summary['mean_coherence'], 0.9)
+        self.assertEqual(summary['min_coherence'], 0.9)
+        self.assertEqual(len(fleet.orgs[1].agents), 1)
+
+    def test_rebuild_skips_agents_already_gone(self):
+        fleet = FleetRollup(live_seconds=100)
+        fleet.rebuild({
+            'old': {'organization_id': 1, 'coherence': 0.3, 'alert_level': 'RED', 'timestamp': 10.0},
+            'new': {'organization_id': 1, 'coherence': 0.8, 'alert_level': 'GREEN', 'timestamp': 150.0},
+        }, now=200.0)
+        self.assertEqual(fleet.summary(1, now=200.0)['agents'], 1)
+        self.assertEqual(fleet.summary(1, now=300.0)['agents'], 0)
+
+
+class WorstAgentIndexTest(unittest.TestCase):
+    def test_silent_agent_drops_out_of_ranking(self):
+        index = WorstAgentIndex(live_seconds=100)
+        # 'dying' reports a falling margin, then goes silent
+        for t, margin in ((0, 0.2), (30, 0.1), (60, 0.05)):
+            index.observe(1, 'dying', margin, t)
+        for t in range(0, 300, 30):
+            index.observe(1, 'healthy', 0.8, t)
+            index.observe(1, 'slipping', 0.6 - t / 1000, t)
+            if t == 150:
+                for by in ('margin', 'time_to_red'):
+                    self.assertEqual(index.worst(1, 10, by, now=t)[0]['agent_id'], 'dying')
+
+        for by in ('margin', 'time_to_red'):
+            ranked = [a['agent_id'] for a in index.worst(1, 10, by, now=270)]
+            self.assertEqual(sorted(ranked), ['healthy', 'slipping'])
+
+        ranking = index.orgs[1]
+        self.assertEqual(len(ranking.by_margin), 2)
+        self.assertEqual(len(ranking.by_time_to_red), 2)
+
+        # Reporting again puts it back
+        index.observe(1, 'dying', 0.01, 300)
+        self.assertEqual(index.worst(1, 1, now=300)[0]['agent_id'], 'dying')
+
+
+class CorrelationTest(unittest.TestCase):
+    def report(self, engine, agents, start, end, drift=0.0):
+        """Every agent reports every 10 s; returns the alert events"""
+        rng = random.Random(start)
+        events = []
+        for t in range(start, end, 10):
+            for agent in agents:
+                self.levels[agent] += drift + rng.gauss(0, 0.002)
+                event = engine.observe(1, agent, self.levels[agent], t)
+                if event:
+                    events.append(event)
+        return events
+
+    def setUp(self):
+        self.engine = CorrelationEngine(window=60, min_agents=5)
+        self.agents = [f'agent-{i}' for i in range(20)]
+        self.levels = dict.fromkeys(self.agents, 0.8)
+
+    def test_decline_clears_when_reporting_stops(self):
+        self.report(self.engine, self.agents, 0, 600)
+        events = self.report(self.engine, self.agents, 600, 720, drift=-0.01)
+        self.assertEqual([e['alert_level'] for e in events], ['YELLOW'])
+        self.assertTrue(self.engine.status(1, now=725)[0]['active'])
+
+        status, event = self.engine.status(1, now=900)
+        self.assertFalse(status['active'])
+        self.assertEqual(event['alert_level'], 'GREEN')
+        self.assertIsNone(self.engine.status(1, now=905)[1])
+
+    def test_departed_agents_leave_coverage(self):
+        burst = [f'old-{i}' for i in range(200)]
+        self.levels.update(dict.fromkeys(burst, 0.8))
+        self.report(self.engine, burst, 0, 10)
+        self.report(self.engine, self.agents, 0, 600)
+        self.assertEqual(len(self.engine.orgs[1].agents), len(self.agents))
+
+        # 20 of 20 recent agents is full coverage, so the decline is caught
+        events = self.report(self.engine, self.agents, 600, 720, drift=-0.01)
+        self.assertEqual([e['alert_level'] for e in events], ['YELLOW'])
+
+
+if __name__ == '__main__':
+    unittest.main()
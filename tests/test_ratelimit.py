@@ -0,0 +1,57 @@
+"""
+Token buckets in src/ratelimit.py: unknown agent ids share one bucket per
+organization, and full buckets are dropped without a periodic scan.
+
+Run: python -m unittest discover tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.ratelimit import RateLimiter  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.limiter = RateLimiter(clock=self.clock)
+
+    def test_unknown_ids_share_one_bucket_on_every_tier(self):
+        for tier in ('trial', 'enterprise'):
+            admitted = sum(not self.limiter.acquire(tier, tier, [], unknown=1) for _ in range(100))
+            self.assertEqual(admitted, 20)
+            # Registered agents keep their own buckets
+            self.assertEqual(self.limiter.acquire(tier, tier, ['a']), 0.0)
+
+    def test_unknown_ids_count_against_the_org(self):
+        for _ in range(20):
+            self.assertEqual(self.limiter.acquire(1, 'trial', [], unknown=1), 0.0)
+        for i in range(40):
+            self.assertEqual(self.limiter.acquire(1, 'trial', [f'agent-{i}']), 0.0)
+        # The trial org burst of 60 is spent
+        self.assertGreater(self.limiter.acquire(1, 'trial', ['agent-0']), 0.0)
+
+    def test_full_buckets_are_dropped(self):
+        for i in range(1000):
+            self.limiter.acquire(i % 10, 'professional', [f'agent-{i}'])
+        self.assertEqual(len(self.limiter.agents), 1000)
+
+        self.clock.now = 30.0
+        self.limiter.acquire(1, 'professional', ['agent-1'])
+        self.assertEqual(list(self.limiter.agents), [(1, 'agent-1')])
+        self.assertEqual(list(self.limiter.orgs), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
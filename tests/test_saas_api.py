@@ -0,0 +1,87 @@
+"""
+Ingestion API: agent_ids are checked against the calling organization,
+and alert state is kept per (organization, agent).
+
+Run: python -m unittest discover tests
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+api = None
+tmp = None
+
+
+def setUpModule():
+    global api, tmp
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['RECOVERY_DB_PATH'] = str(Path(tmp.name) / 'api.db')
+    api = importlib.import_module('saas_api')
+
+
+def tearDownModule():
+    api.shutdown()
+    tmp.cleanup()
+
+
+class IngestTest(unittest.TestCase):
+    def setUp(self):
+        self.client = api.app.test_client()
+        self.orgs = []
+        for name in ('acme', 'globex'):
+            org = self.client.post('/api/v1/organizations', json={'name': name}).get_json()['organization']
+            agent = self.client.post(
+                '/api/v1/agents/register', json={'hostname': f'{name}-1'},
+                headers={'X-API-Key': org['api_key']}
+            ).get_json()['agent_id']
+            self.orgs.append((org, agent))
+
+    def submit(self, org, agent_id, **metrics):
+        return self.client.post(
+            '/api/v1/metrics', json=dict(metrics, agent_id=agent_id),
+            headers={'X-API-Key': org['api_key']}
+        )
+
+    def test_foreign_agent_id_is_rejected(self):
+        (acme, acme_agent), (globex, _) = self.orgs
+        self.assertEqual(self.submit(acme, acme_agent).status_code, 200)
+
+        response = self.submit(globex, acme_agent, cpu_usage=99, error_rate=0.9)
+        self.assertEqual(response.status_code, 403)
+        batch = self.client.post(
+            '/api/v1/metrics/batch', json={'samples': [{'agent_id': acme_agent}]},
+            headers={'X-API-Key': globex['api_key']}
+        )
+        self.assertEqual(batch.status_code, 403)
+        self.assertNotIn((globex['id'], acme_agent), api.alert_tracker.levels)
+
+        self.assertEqual(self.submit(acme, 'agent_made_up').status_code, 403)
+
+    def test_rotating_agent_ids_is_rate_limited(self):
+        (acme, acme_agent), _ = self.orgs
+        codes = [self.submit(acme, f'agent_made_up_{i}').status_code for i in range(25)]
+        self.assertEqual(codes, [403] * 20 + [429] * 5)
+        # The registered agent keeps its own bucket
+        self.assertEqual(self.submit(acme, acme_agent).status_code, 200)
+
+    def test_debug_timings_needs_api_key(self):
+        self.assertEqual(self.client.get('/api/v1/debug/timings').status_code, 401)
+        (acme, _), _ = self.orgs
+        response = self.client.get('/api/v1/debug/timings', headers={'X-API-Key': acme['api_key']})
+        self.assertIn(response.status_code, (200, 404))
+
+    def test_alert_state_is_per_organization(self):
+        (acme, acme_agent), _ = self.orgs
+        level = self.submit(acme, acme_agent).get_json()['alert_level']
+        self.assertEqual(api.alert_tracker.levels.get((acme['id'], acme_agent), 'GREEN'), level)
+        self.assertNotIn(acme_agent, api.alert_tracker.levels)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Sidecar history backfill against a fake Prometheus HTTP server that
+answers /api/v1/query_range from a synthetic coherence series.
+
+Run: python -m unittest discover tests
+"""
+
+import json
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+
+from sidecar.adapters.prometheus import PrometheusAdapter  # noqa: E402
+from sidecar.watchdog import RecoveryWatchdog  # noqa: E402
+
+
+class FakePrometheus(ThreadingHTTPServer):
+    """
+    `series(ts) -> {target: value}` is evaluated at every step of a range
+    query; queries listed in `failing` answer 503.
+    """
+
+    def __init__(self, series):
+        self.series = series
+        self.failing = set()
+        self.range_calls = []
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                if url.path != "/api/v1/query_range" or params["query"] in server.failing:
+                    self.reply(503, {"status": "error"})
+                    return
+
+                start, end, step = (float(params[k]) for k in ("start", "end", "step"))
+                server.range_calls.append((params["query"], start, end))
+                values = {}
+                ts = start
+                while ts <= end:
+                    for target, value in server.series(ts).items():
+                        values.setdefault(target, []).append([ts, str(value)])
+                    ts += step
+                result = [
+                    {"metric": {"pod": target}, "values": points}
+                    for target, points in values.items()
+                ]
+                self.reply(200, {"status": "success", "data": {"resultType": "matrix", "result": result}})
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ListExporter:
+    def __init__(self):
+        self.rows = []
+
+    def write(self, C, margin, alert, timestamp=None):
+        self.rows.append((timestamp, C, margin, alert))
+
+
+class Live:
+    """Live adapter stand-in: backfill from the fake server, then fixed samples"""
+
+    def __init__(self, adapter, live_values):
+        self.adapter = adapter
+        self.live_values = list(live_values)
+
+    def backfill_coherence(self, lookback_sec, step_sec=15.0):
+        return self.adapter.backfill_coherence(lookback_sec, step_sec)
+
+    def get_coherence(self):
+        return self.live_values.pop(0)
+
+
+class BackfillTest(unittest.TestCase):
+    def serve(self, series):
+        prom = FakePrometheus(series)
+        self.addCleanup(prom.server_close)
+        self.addCleanup(prom.shutdown)
+        return prom
+
+    def test_pages_oldest_first(self):
+        prom = self.serve(lambda ts: {"a": 1.0, "b": 0.5})
+        adapter = PrometheusAdapter(prom.url, query="up")
+        self.addCleanup(adapter.close)
+
+        samples = list(adapter.backfill(600, step_sec=15, chunk_points=10))
+        stamps = [ts for ts, _ in samples]
+
+        self.assertEqual(len(samples), 41)
+        self.assertEqual(stamps, sorted(stamps))
+        self.assertTrue(all(b - a == 15 for a, b in zip(stamps, stamps[1:])))
+        self.assertEqual(len(prom.range_calls), 5)
+        self.assertEqual(samples[0][1], {"a": {"up": 1.0}, "b": {"up": 0.5}})
+
+        coherence = [C for _, C in adapter.backfill_coherence(600, 15, 10)]
+        self.assertEqual(coherence, [0.75] * 41)
+
+    def test_failed_query_leaves_a_gap(self):
+        prom = self.serve(lambda ts: {"a": 50.0})
+        prom.failing.add("mem")
+        adapter = PrometheusAdapter(prom.url, queries={"cpu_usage": "cpu", "mem_usage": "mem"})
+        self.addCleanup(adapter.close)
+
+        self.assertEqual(list(adapter.backfill(300, 15)), [])
+
+    def test_historical_red_does_not_trigger_live_action(self):
+        # Healthy, then coherence collapses for the last ten minutes
+        now = time.time()
+        prom = self.serve(lambda ts: {"a": 1.0 if ts < now - 600 else 0.0})
+        adapter = PrometheusAdapter(prom.url, query="up")
+        self.addCleanup(adapter.close)
+
+        exporter = ListExporter()
+        live = Live(adapter, [0.0] * 6)
+        watchdog = RecoveryWatchdog(adapter=live, exporter=exporter)
+        fired = []
+        watchdog.trigger_action = lambda: fired.append(len(exporter.rows))
+
+        watchdog.backfill(3600, 15)
+        backfilled = len(exporter.rows)
+        self.assertGreater(backfilled, 200)
+        self.assertEqual(exporter.rows[-1][3], "RED")
+        self.assertEqual(fired, [])
+        self.assertEqual(watchdog.red_count, 0)
+
+        # Only RED_COUNT_LIMIT live RED samples fire the action
+        for _ in range(watchdog.RED_COUNT_LIMIT - 1):
+            watchdog.step()
+        self.assertEqual(fired, [])
+        watchdog.step()
+        self.assertEqual(fired, [backfilled + watchdog.RED_COUNT_LIMIT])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Multi-target sidecar mode scores a pod the same way as the single-target
+sidecar: same coherence, same constant stress factor, same alert level.
+
+Run: python -m unittest discover tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))
+
+from recovery.coherence import compute_coherence_from_pod_metrics, compute_stress_factor  # noqa: E402
+from sidecar.multi import MultiTargetWatchdog  # noqa: E402
+from sidecar.watchdog import RecoveryWatchdog  # noqa: E402
+
+# Busy but healthy pod: the load-based stress factor would be 1.175
+STRESSED = {
+    "cpu_usage": 45.0,
+    "mem_usage": 45.0,
+    "error_rate": 0.001,
+    "response_p95": 80.0,
+    "restart_count": 0.0,
+}
+
+
+class Adapter:
+    def get_coherence(self):
+        return compute_coherence_from_pod_metrics(STRESSED)
+
+    def get_target_metrics(self):
+        return {"pod-a": dict(STRESSED)}
+
+
+class Rows:
+    def __init__(self):
+        self.alerts = []
+
+    def write(self, C, margin, alert, timestamp=None):
+        self.alerts.append(alert)
+
+    def write_many(self, targets, C, margins, alerts, timestamp=None):
+        self.alerts.extend(alerts)
+
+
+class BetaPolicyTest(unittest.TestCase):
+    def test_same_alert_in_both_modes(self):
+        self.assertGreater(compute_stress_factor(STRESSED), 1.1)
+
+        single, multi = Rows(), Rows()
+        watchdog = RecoveryWatchdog(adapter=Adapter(), exporter=single)
+        fleet = MultiTargetWatchdog(adapter=Adapter(), exporter=multi)
+        for tick in range(10):
+            watchdog._process(watchdog.adapter.get_coherence(), timestamp=1_700_000_000 + tick)
+            fleet.step(timestamp=1_700_000_000 + tick)
+
+        self.assertEqual(single.alerts, multi.alerts)
+        self.assertEqual(set(multi.alerts), {"GREEN"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Compressed metrics backend: open blocks survive a writer process that
+dies without flushing, through its recovery log and metric_open.
+
+Run: python -m unittest discover tests
+"""
+
+import glob
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.models import Database  # noqa: E402
+
+T0 = 1_700_000_000.0
+
+
+def sample(i: int) -> dict:
+    return {
+        'coherence': 0.9 - i * 0.001,
+        'recovery_margin': 0.3,
+        'alert_level': 'GREEN' if i % 7 else 'YELLOW',
+        'cpu_usage': float(i),
+        'mem_usage': None,
+        'error_rate': 0.01,
+    }
+
+
+def write_and_die(path: str, agents: list, start: int, ticks: int):
+    """Append `ticks` samples per agent in a child process that exits without flushing"""
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {str(ROOT)!r})
+        sys.path.insert(0, {str(ROOT / 'tests')!r})
+        from src.models import Database
+        from test_tsstore_recovery import T0, sample
+        db = Database({path!r}, metrics_backend='compressed')
+        store = db.metrics_store
+        for i in range({start}, {start + ticks}):
+            rows = [(agent, sample(i)) for agent in {agents!r}]
+            db._write_blocks(*store.append(rows, timestamp=T0 + i * 30))
+        os._exit(0)
+    """)
+    subprocess.run([sys.executable, '-c', script], check=True)
+
+
+class RecoveryTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = str(Path(tmp.name) / 'metrics.db')
+        db = Database(self.path, metrics_backend='compressed')
+        self.org_id = db.create_organization('acme')['id']
+        self.agents = db.register_agents(self.org_id, ['a', 'b', 'c'])
+
+    def assert_samples(self, db, ticks: int):
+        for agent in self.agents:
+            rows = db.get_metrics(agent)
+            self.assertEqual([r['timestamp'] for r in rows], [T0 + i * 30 for i in range(ticks)])
+            self.assertEqual([r['cpu_usage'] for r in rows], [float(i) for i in range(ticks)])
+            self.assertEqual(rows[-1]['alert_level'], sample(ticks - 1)['alert_level'])
+            self.assertIsNone(rows[0]['mem_usage'])
+
+    def test_killed_writer_loses_nothing(self):
+        # 25 ticks: one checkpoint at 10 minutes of sample time, then 15 samples only in the log
+        write_and_die(self.path, self.agents, 0, 25)
+
+        db = Database(self.path, metrics_backend='compressed')
+        self.assertEqual(glob.glob(self.path + '.open.*'), [])
+        self.assert_samples(db, 25)
+        self.assertEqual(db.get_latest_alert_levels()[(self.org_id, self.agents[0])], sample(24)['alert_level'])
+
+    def test_successive_owners(self):
+        write_and_die(self.path, self.agents, 0, 25)
+        write_and_die(self.path, self.agents, 25, 15)
+
+        db = Database(self.path, metrics_backend='compressed')
+        self.assert_samples(db, 40)
+
+        # The next owner continues the recovered blocks and can seal them
+        rows = [(agent, sample(40)) for agent in self.agents]
+        db._write_blocks(*db.metrics_store.append(rows, timestamp=T0 + 40 * 30))
+        db.flush_metrics()
+        self.assertEqual(glob.glob(self.path + '.open.*'), [])
+        self.assert_samples(Database(self.path, metrics_backend='compressed'), 41)
+
+    def test_torn_log_tail_is_ignored(self):
+        write_and_die(self.path, self.agents, 0, 5)
+        (segment,) = glob.glob(self.path + '.open.*')
+        with open(segment, 'ab') as f:
+            f.write(b'\x00\x24partial')
+
+        self.assert_samples(Database(self.path, metrics_backend='compressed'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
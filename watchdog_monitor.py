@@ -13,8 +13,9 @@ import time
 from datetime import datetime, timezone
 from pathlib import Path
 
-from src.recovery.detector import RecoveryDebtDetector
+from src.recovery.forecast import ForecastingDetector
 from src.recovery.coherence import compute_coherence_from_pod_metrics, compute_stress_factor
+from src.recovery import timing
 from mock_collector import MockMetricsCollector
 
 
@@ -22,11 +23,13 @@ def main():
     """Main monitoring loop"""
     
     # Initialize components
-    detector = RecoveryDebtDetector(
+    detector = ForecastingDetector(
         beta_base=1.1,
         c_baseline=0.6
     )
     
+    profiler = timing.install_from_env()
+    
     collector = MockMetricsCollector(degradation_rate=0.02)
     
     # Output file
@@ -48,23 +51,27 @@ def main():
         step = 0
         while True:
             step += 1
+            profiler.tick()
             
             # Collect metrics
-            metrics = collector.collect()
+            with timing.stage("collect"):
+                metrics = collector.collect()
             
             # Compute coherence and stress
-            C = compute_coherence_from_pod_metrics(metrics)
-            beta = compute_stress_factor(metrics)
+            with timing.stage("coherence"):
+                C = compute_coherence_from_pod_metrics(metrics)
+                beta = compute_stress_factor(metrics)
             
             # Run detector
-            margin_result, alert_level = detector.update(C, beta)
+            with timing.stage("detect"):
+                margin_result, alert_level = detector.update(C, beta, now=time.time())
             margin = margin_result.recovery_margin
             
             # Current timestamp
             timestamp = datetime.now(timezone.utc).isoformat()
             
             # Log to CSV
-            with open(output_file, 'a', newline='') as f:
+            with timing.stage("export"), open(output_file, 'a', newline='') as f:
                 writer = csv.writer(f)
                 writer.writerow([timestamp, C, margin, alert_level])
             
@@ -75,7 +82,10 @@ def main():
                 'RED': '✗'
             }
             
-            print(f"[{step:04d}] {timestamp[:19]} | C={C:.3f} | Margin={margin:.3f} | {alert_symbol.get(alert_level, '?')} {alert_level}")
+            eta = margin_result.seconds_to_red
+            eta_str = f"RED in ~{eta}s" if eta is not None else "stable"
+            
+            print(f"[{step:04d}] {timestamp[:19]} | C={C:.3f} | Margin={margin:.3f} | {alert_symbol.get(alert_level, '?')} {alert_level} | {eta_str}")
             
             # Sleep 1 second
             time.sleep(1)
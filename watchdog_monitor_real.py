@@ -9,8 +9,9 @@ import time
 from datetime import datetime, timezone
 from pathlib import Path
 
-from src.recovery.detector import RecoveryDebtDetector
+from src.recovery.forecast import ForecastingDetector
 from src.recovery.coherence import compute_coherence_from_pod_metrics, compute_stress_factor
+from src.recovery import timing
 from real_collector import RealMetricsCollector
 
 
@@ -18,11 +19,13 @@ def main():
     """Main monitoring loop with real metrics"""
     
     # Initialize components
-    detector = RecoveryDebtDetector(
+    detector = ForecastingDetector(
         beta_base=1.1,
         c_baseline=0.6
     )
     
+    profiler = timing.install_from_env()
+    
     collector = RealMetricsCollector()
     
     # Output file
@@ -49,23 +52,27 @@ def main():
         step = 0
         while True:
             step += 1
+            profiler.tick()
             
             # Collect REAL metrics
-            metrics = collector.collect()
+            with timing.stage("collect"):
+                metrics = collector.collect()
             
             # Compute coherence and stress
-            C = compute_coherence_from_pod_metrics(metrics)
-            beta = compute_stress_factor(metrics)
+            with timing.stage("coherence"):
+                C = compute_coherence_from_pod_metrics(metrics)
+                beta = compute_stress_factor(metrics)
             
             # Run detector
-            margin_result, alert_level = detector.update(C, beta)
+            with timing.stage("detect"):
+                margin_result, alert_level = detector.update(C, beta, now=time.time())
             margin = margin_result.recovery_margin
             
             # Current timestamp
             timestamp = datetime.now(timezone.utc).isoformat()
             
             # Log to CSV
-            with open(output_file, 'a', newline='') as f:
+            with timing.stage("export"), open(output_file, 'a', newline='') as f:
                 writer = csv.writer(f)
                 writer.writerow([
                     timestamp, C, margin, alert_level,
@@ -81,9 +88,11 @@ def main():
             
             cpu_str = f"CPU={metrics['cpu_usage']:.1f}%"
             mem_str = f"MEM={metrics['mem_usage']:.1f}%"
+            eta = margin_result.seconds_to_red
+            eta_str = f"RED in ~{eta}s" if eta is not None else "stable"
             
             print(f"[{step:04d}] {timestamp[:19]} | C={C:.3f} | M={margin:.3f} | "
-                  f"{alert_symbol.get(alert_level, '?')} {alert_level} | {cpu_str} {mem_str}")
+                  f"{alert_symbol.get(alert_level, '?')} {alert_level} | {cpu_str} {mem_str} | {eta_str}")
             
             # Sleep 5 seconds (real systems don't need second-by-second monitoring)
             time.sleep(5)